@@ -1,12 +1,25 @@
 # app.py
 import streamlit as st
-import pandas as pd
-import numpy as np
-import sqlite3
-import hashlib
+import csv
+import io
 import os
 from datetime import datetime, timedelta
-import json
+
+from auth import hash_password
+from database import bootstrap, get_db
+import cache
+import config
+import grid
+import export
+import importer
+import ingest
+import jobs
+import profiling
+import rollups
+import sections
+import stats
+import tracing
+import writequeue
 
 # Konfigurasi halaman
 st.set_page_config(
@@ -22,265 +35,14 @@ if 'user_role' not in st.session_state:
     st.session_state.user_role = None
 if 'current_user' not in st.session_state:
     st.session_state.current_user = None
-if 'db_initialized' not in st.session_state:
-    st.session_state.db_initialized = False
-
-# Database setup
-def init_database():
-    """Initialize SQLite database with all tables"""
-    conn = sqlite3.connect('hr_system.db')
-    c = conn.cursor()
-    
-    # Table users (with roles)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            role TEXT NOT NULL,
-            employee_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1
-        )
-    ''')
-    
-    # Table departments
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS departments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            kode_department TEXT UNIQUE NOT NULL,
-            nama_department TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Table employees
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS employees (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nama_lengkap TEXT NOT NULL,
-            nik TEXT UNIQUE NOT NULL,
-            tempat_lahir TEXT,
-            tanggal_lahir DATE,
-            jenis_kelamin TEXT,
-            alamat TEXT,
-            telepon TEXT,
-            email TEXT UNIQUE,
-            status_pernikahan TEXT,
-            agama TEXT,
-            jabatan TEXT,
-            department_id INTEGER,
-            status_kerja TEXT,
-            foto_path TEXT,
-            tanggal_masuk DATE,
-            user_id INTEGER,
-            FOREIGN KEY (department_id) REFERENCES departments(id),
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # Table educations
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS educations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            jenjang TEXT NOT NULL,
-            nama_institusi TEXT NOT NULL,
-            jurusan TEXT,
-            tahun_masuk INTEGER,
-            tahun_lulus INTEGER,
-            file_ijazah_path TEXT,
-            FOREIGN KEY (employee_id) REFERENCES employees(id)
-        )
-    ''')
-    
-    # Table certifications
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS certifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            nama_sertifikat TEXT NOT NULL,
-            penerbit TEXT,
-            tahun INTEGER,
-            file_sertifikat_path TEXT,
-            FOREIGN KEY (employee_id) REFERENCES employees(id)
-        )
-    ''')
-    
-    # Table contracts
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS contracts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            tanggal_mulai DATE NOT NULL,
-            tanggal_berakhir DATE NOT NULL,
-            jenis_kontrak TEXT NOT NULL,
-            status_kontrak TEXT,
-            keterangan TEXT,
-            file_kontrak_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (employee_id) REFERENCES employees(id)
-        )
-    ''')
-    
-    # Table leave_submissions
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS leave_submissions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            tanggal_mulai DATE NOT NULL,
-            tanggal_selesai DATE NOT NULL,
-            jenis_cuti TEXT NOT NULL,
-            alasan TEXT,
-            file_pendukung_path TEXT,
-            status TEXT DEFAULT 'pending',
-            approved_by INTEGER,
-            approved_date DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (employee_id) REFERENCES employees(id),
-            FOREIGN KEY (approved_by) REFERENCES employees(id)
-        )
-    ''')
-    
-    # Table daily_attendances
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS daily_attendances (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            tanggal DATE NOT NULL,
-            jam_masuk TIME,
-            jam_pulang TIME,
-            status TEXT,
-            keterangan TEXT,
-            leave_submission_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (employee_id) REFERENCES employees(id),
-            FOREIGN KEY (leave_submission_id) REFERENCES leave_submissions(id)
-        )
-    ''')
-    
-    conn.commit()
-    return conn
-
-def hash_password(password):
-    """Hash password menggunakan SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def create_dummy_data(conn):
-    """Create dummy data for the system"""
-    c = conn.cursor()
-    
-    # Check if data already exists
-    c.execute("SELECT COUNT(*) FROM users")
-    if c.fetchone()[0] > 0:
-        return
-    
-    # Create departments
-    departments = [
-        ('DEPT001', 'HR Department'),
-        ('DEPT002', 'IT Department'),
-        ('DEPT003', 'Finance Department'),
-        ('DEPT004', 'Marketing Department'),
-        ('DEPT005', 'Operations Department')
-    ]
-    
-    c.executemany("INSERT INTO departments (kode_department, nama_department) VALUES (?, ?)", departments)
-    
-    # Create admin user
-    admin_password = hash_password("admin123")
-    c.execute("INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)",
-              ("admin", admin_password, "admin@hrsystem.com", "admin"))
-    
-    # Create manager users
-    managers = [
-        ("manager_hr", "manager123", "hr_manager@hrsystem.com", "manager", 1),
-        ("manager_it", "manager123", "it_manager@hrsystem.com", "manager", 2),
-        ("manager_fin", "manager123", "fin_manager@hrsystem.com", "manager", 3)
-    ]
-    
-    for manager in managers:
-        hashed_pwd = hash_password(manager[1])
-        c.execute("INSERT INTO users (username, password, email, role, employee_id) VALUES (?, ?, ?, ?, ?)",
-                  (manager[0], hashed_pwd, manager[2], manager[3], manager[4]))
-    
-    # Create employee users and employees
-    employee_data = []
-    for i in range(1, 21):
-        nama = f"Employee {i}"
-        nik = f"NIK{i:03d}"
-        dept_id = (i % 5) + 1  # Distribute across 5 departments
-        
-        # Insert employee
-        c.execute('''
-            INSERT INTO employees (
-                nama_lengkap, nik, tempat_lahir, tanggal_lahir, jenis_kelamin,
-                alamat, telepon, email, status_pernikahan, agama, jabatan,
-                department_id, status_kerja, tanggal_masuk
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            nama, nik, "Jakarta", "1990-01-01", "Laki-laki" if i % 2 == 0 else "Perempuan",
-            f"Jl. Example No.{i}", f"0812345678{i:02d}", f"employee{i}@company.com",
-            "Menikah" if i % 3 == 0 else "Belum Menikah", "Islam",
-            f"Staff {['IT', 'Finance', 'Marketing', 'HR', 'Operations'][dept_id-1]}",
-            dept_id, "aktif", "2023-01-01"
-        ))
-        
-        employee_id = c.lastrowid
-        
-        # Create user for employee
-        username = f"emp{i:03d}"
-        password = hash_password("employee123")
-        c.execute("INSERT INTO users (username, password, email, role, employee_id) VALUES (?, ?, ?, ?, ?)",
-                  (username, password, f"emp{i}@company.com", "employee", employee_id))
-        
-        # Add education data
-        if i % 2 == 0:
-            c.execute('''
-                INSERT INTO educations (employee_id, jenjang, nama_institusi, jurusan, tahun_masuk, tahun_lulus)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (employee_id, "S1", "Universitas Indonesia", "Teknik Informatika", 2010, 2014))
-        
-        # Add contract data
-        start_date = datetime(2023, 1, 1) + timedelta(days=i*30)
-        end_date = start_date + timedelta(days=365)
-        c.execute('''
-            INSERT INTO contracts (employee_id, tanggal_mulai, tanggal_berakhir, jenis_kontrak, status_kontrak)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (employee_id, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), "PKWT", "aktif"))
-    
-    # Add some leave submissions
-    for i in range(1, 6):
-        start_date = datetime.now() + timedelta(days=i)
-        end_date = start_date + timedelta(days=2)
-        c.execute('''
-            INSERT INTO leave_submissions (employee_id, tanggal_mulai, tanggal_selesai, jenis_cuti, alasan, status)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (i, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), 
-              "Cuti Tahunan", f"Liburan keluarga {i}", "pending"))
-    
-    # Add attendance data for last 7 days
-    for emp_id in range(1, 6):
-        for day in range(7):
-            date = datetime.now() - timedelta(days=day)
-            if date.weekday() < 5:  # Weekdays only
-                c.execute('''
-                    INSERT INTO daily_attendances (employee_id, tanggal, jam_masuk, jam_pulang, status)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (emp_id, date.strftime("%Y-%m-%d"), "08:00:00", "17:00:00", "hadir"))
-    
-    conn.commit()
 
 def login_user(username, password):
     """Authenticate user"""
-    conn = sqlite3.connect('hr_system.db')
-    c = conn.cursor()
-    
     hashed_password = hash_password(password)
     
-    c.execute("SELECT * FROM users WHERE username = ? AND password = ? AND is_active = 1", 
-              (username, hashed_password))
-    user = c.fetchone()
+    with get_db().reader() as conn:
+        user = conn.execute("SELECT * FROM users WHERE username = ? AND password = ? AND is_active = 1", 
+                            (username, hashed_password)).fetchone()
     
     if user:
         st.session_state.logged_in = True
@@ -293,406 +55,718 @@ def admin_dashboard():
     """Admin dashboard"""
     st.title("🏢 Admin Dashboard")
     
-    conn = sqlite3.connect('hr_system.db')
+    with get_db().reader() as conn:
+        # Statistics
+        with profiling.section("counters"):
+            counters = stats.get_counters(conn, stats.GLOBAL)
+        col1, col2, col3, col4 = st.columns(4)
     
-    # Statistics
-    col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total Karyawan", counters['employees'])
     
-    with col1:
-        total_emps = pd.read_sql("SELECT COUNT(*) as count FROM employees", conn)['count'][0]
-        st.metric("Total Karyawan", total_emps)
+        with col2:
+            st.metric("Total Department", counters['departments'])
     
-    with col2:
-        total_depts = pd.read_sql("SELECT COUNT(*) as count FROM departments", conn)['count'][0]
-        st.metric("Total Department", total_depts)
-    
-    with col3:
-        pending_leaves = pd.read_sql("SELECT COUNT(*) as count FROM leave_submissions WHERE status = 'pending'", conn)['count'][0]
-        st.metric("Cuti Pending", pending_leaves)
-    
-    with col4:
-        active_contracts = pd.read_sql("SELECT COUNT(*) as count FROM contracts WHERE status_kontrak = 'aktif'", conn)['count'][0]
-        st.metric("Kontrak Aktif", active_contracts)
-    
-    # Tabs for different sections
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "📋 Karyawan", "🏢 Department", "📝 Kontrak", "🏖️ Cuti", 
-        "📊 Attendance", "👥 User Management"
-    ])
-    
-    with tab1:
-        st.subheader("Data Karyawan")
-        employees = pd.read_sql("""
-            SELECT e.*, d.nama_department 
-            FROM employees e 
-            LEFT JOIN departments d ON e.department_id = d.id
-        """, conn)
-        st.dataframe(employees, use_container_width=True)
-        
-        # Add new employee
-        with st.expander("➕ Tambah Karyawan Baru"):
-            with st.form("add_employee_form"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    nama = st.text_input("Nama Lengkap")
-                    nik = st.text_input("NIK")
-                    tempat_lahir = st.text_input("Tempat Lahir")
-                    tanggal_lahir = st.date_input("Tanggal Lahir")
-                    jenis_kelamin = st.selectbox("Jenis Kelamin", ["Laki-laki", "Perempuan"])
-                
-                with col2:
-                    departments = pd.read_sql("SELECT id, nama_department FROM departments", conn)
-                    dept_options = {row['nama_department']: row['id'] for _, row in departments.iterrows()}
-                    selected_dept = st.selectbox("Department", list(dept_options.keys()))
-                    dept_id = dept_options[selected_dept]
-                    
-                    jabatan = st.text_input("Jabatan")
-                    status_kerja = st.selectbox("Status Kerja", ["aktif", "tidak aktif", "resign"])
+        with col3:
+            st.metric("Cuti Pending", counters['pending_leaves'])
+    
+        with col4:
+            st.metric("Kontrak Aktif", counters['active_contracts'])
+    
+        # Tabs for different sections (only the selected tab is rendered)
+        sections.render_tabs("admin_tabs", [
+            ("📋 Karyawan", lambda: admin_employees_tab(conn)),
+            ("🏢 Department", lambda: admin_departments_tab(conn)),
+            ("📝 Kontrak", lambda: admin_contracts_tab(conn)),
+            ("🏖️ Cuti", lambda: admin_leaves_tab(conn)),
+            ("📊 Attendance", lambda: admin_attendance_tab(conn)),
+            ("📈 Analitik", admin_analytics_tab),
+            ("👥 User Management", lambda: admin_users_tab(conn)),
+        ])
+
+def admin_employees_tab(conn):
+    """Admin tab: employee list and new employee form"""
+    st.subheader("Data Karyawan")
+    grid.paginated_table("admin_employees", grid.EMPLOYEES, conn)
+    
+    # Add new employee
+    with st.expander("➕ Tambah Karyawan Baru"):
+        with st.form("add_employee_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                nama = st.text_input("Nama Lengkap")
+                nik = st.text_input("NIK")
+                tempat_lahir = st.text_input("Tempat Lahir")
+                tanggal_lahir = st.date_input("Tanggal Lahir")
+                jenis_kelamin = st.selectbox("Jenis Kelamin", ["Laki-laki", "Perempuan"])
+            
+            with col2:
+                departments = cache.read_sql(conn, "SELECT id, nama_department FROM departments",
+                                             tables=("departments",))
+                dept_options = dict(zip(departments['nama_department'], departments['id']))
+                selected_dept = st.selectbox("Department", list(dept_options.keys()))
+                dept_id = dept_options[selected_dept]
                 
-                if st.form_submit_button("Simpan"):
-                    c = conn.cursor()
-                    c.execute('''
+                jabatan = st.text_input("Jabatan")
+                status_kerja = st.selectbox("Status Kerja", ["aktif", "tidak aktif", "resign"])
+            
+            if st.form_submit_button("Simpan"):
+                params = (nama, nik, tempat_lahir, tanggal_lahir.strftime("%Y-%m-%d"),
+                          jenis_kelamin, dept_id, jabatan, status_kerja, datetime.now().strftime("%Y-%m-%d"))
+                try:
+                    writequeue.run(lambda wconn: wconn.execute('''
                         INSERT INTO employees (
                             nama_lengkap, nik, tempat_lahir, tanggal_lahir, jenis_kelamin,
                             department_id, jabatan, status_kerja, tanggal_masuk
                         ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (nama, nik, tempat_lahir, tanggal_lahir.strftime("%Y-%m-%d"), 
-                          jenis_kelamin, dept_id, jabatan, status_kerja, datetime.now().strftime("%Y-%m-%d")))
-                    conn.commit()
-                    st.success("Karyawan berhasil ditambahkan!")
-                    st.rerun()
-    
-    with tab2:
-        st.subheader("Data Department")
-        departments = pd.read_sql("SELECT * FROM departments", conn)
-        st.dataframe(departments, use_container_width=True)
-        
-        with st.expander("➕ Tambah Department"):
-            with st.form("add_department_form"):
-                kode = st.text_input("Kode Department")
-                nama = st.text_input("Nama Department")
-                
-                if st.form_submit_button("Simpan"):
-                    c = conn.cursor()
-                    c.execute("INSERT INTO departments (kode_department, nama_department) VALUES (?, ?)", 
-                              (kode, nama))
-                    conn.commit()
-                    st.success("Department berhasil ditambahkan!")
-                    st.rerun()
-    
-    with tab3:
-        st.subheader("Data Kontrak")
-        contracts = pd.read_sql("""
-            SELECT c.*, e.nama_lengkap 
-            FROM contracts c 
-            JOIN employees e ON c.employee_id = e.id
-        """, conn)
-        st.dataframe(contracts, use_container_width=True)
-    
-    with tab4:
-        st.subheader("Pengajuan Cuti")
-        leaves = pd.read_sql("""
-            SELECT l.*, e.nama_lengkap 
-            FROM leave_submissions l 
-            JOIN employees e ON l.employee_id = e.id
-            ORDER BY l.created_at DESC
-        """, conn)
-        st.dataframe(leaves, use_container_width=True)
-        
-        # Approve/reject leave
-        st.subheader("Approval Cuti")
-        pending_leaves = pd.read_sql("""
-            SELECT l.*, e.nama_lengkap 
-            FROM leave_submissions l 
-            JOIN employees e ON l.employee_id = e.id
-            WHERE l.status = 'pending'
-        """, conn)
-        
-        if not pending_leaves.empty:
-            for _, leave in pending_leaves.iterrows():
-                with st.container():
-                    col1, col2, col3 = st.columns([3, 1, 1])
-                    with col1:
-                        st.write(f"**{leave['nama_lengkap']}** - {leave['jenis_cuti']}")
-                        st.write(f"{leave['tanggal_mulai']} s/d {leave['tanggal_selesai']}")
-                        st.write(f"Alasan: {leave['alasan']}")
-                    
-                    with col2:
-                        if st.button("✓ Approve", key=f"approve_{leave['id']}"):
-                            c = conn.cursor()
-                            c.execute("UPDATE leave_submissions SET status = 'approved', approved_date = ? WHERE id = ?",
-                                      (datetime.now().strftime("%Y-%m-%d"), leave['id']))
-                            conn.commit()
-                            st.rerun()
-                    
-                    with col3:
-                        if st.button("✗ Reject", key=f"reject_{leave['id']}"):
-                            c = conn.cursor()
-                            c.execute("UPDATE leave_submissions SET status = 'rejected' WHERE id = ?",
-                                      (leave['id'],))
-                            conn.commit()
-                            st.rerun()
+                    ''', params), "employees")
+                except Exception as e:
+                    st.error(f"Karyawan gagal disimpan: {e}")
+                    return
+                st.success("Karyawan berhasil ditambahkan!")
+                st.rerun()
+
+    # Bulk import: employees and their user accounts in one transaction
+    with st.expander("📥 Import Karyawan (CSV/XLSX)"):
+        st.caption("Kolom wajib: " + ", ".join(importer.REQUIRED_COLUMNS)
+                   + ". Opsional: " + ", ".join(importer.OPTIONAL_COLUMNS)
+                   + ". Username default ke NIK; akun tanpa password mendapat password acak.")
+        uploaded = st.file_uploader("File karyawan", type=["csv", "xlsx"], key="import_employees_file")
+        col1, col2 = st.columns(2)
+        with col1:
+            validate = st.button("Validasi", key="import_employees_validate", disabled=uploaded is None)
+        with col2:
+            submit = st.button("Import", key="import_employees_submit", type="primary",
+                               disabled=uploaded is None)
+
+        if uploaded is not None and (validate or submit):
+            import pandas as pd
+
+            uploaded.seek(0)
+            try:
+                # Validation only reads, so it need not hold the writer lock
+                db = get_db()
+                with (db.reader() if validate else db.writer("employees", "users")) as import_conn:
+                    report = importer.import_employees(import_conn, uploaded, uploaded.name, dry_run=validate)
+            except Exception as e:
+                st.error(f"Import gagal, tidak ada data yang disimpan: {e}")
+            else:
+                if validate:
+                    st.info(f"{report['valid']} dari {report['rows']} baris valid")
+                else:
+                    st.success(f"{report['inserted']} dari {report['rows']} baris diimpor "
+                               f"dalam {report['seconds']:.1f} detik")
+                if report["credentials"]:
+                    credentials = io.StringIO()
+                    csv.writer(credentials).writerows([("nik", "username", "password"), *report["credentials"]])
+                    st.warning(f"{len(report['credentials'])} akun mendapat password acak. Unduh daftarnya "
+                               "sekarang; password ini tidak ditampilkan lagi.")
+                    st.download_button("⬇️ Unduh password awal", credentials.getvalue(),
+                                       file_name="kredensial_import.csv", mime="text/csv")
+                if report["errors"]:
+                    st.warning(f"{len(report['errors'])} baris dilewati")
+                    st.dataframe(pd.DataFrame(report["errors"], columns=["Baris", "NIK", "Kesalahan"]),
+                                 use_container_width=True, hide_index=True)
+
+    with st.expander("📤 Export Data (CSV/XLSX/Parquet)"):
+        export_panel()
+
+def export_panel():
+    """Stream a full table export to a file, then offer it for download"""
+    name = st.selectbox("Data", list(export.SOURCES), format_func=lambda n: export.SOURCES[n].label,
+                        key="export_source")
+    source = export.SOURCES[name]
+    columns = st.multiselect("Kolom", list(source.columns), default=source.default_columns,
+                             key=f"export_columns_{name}")
+    start = end = None
+    if st.checkbox(f"Filter {source.date_column.split('.')[-1]}", key="export_use_range"):
+        col1, col2 = st.columns(2)
+        start = col1.date_input("Dari", key="export_start")
+        end = col2.date_input("Sampai", key="export_end")
+    fmt = st.radio("Format", export.FORMATS, horizontal=True, key="export_format")
+
+    if st.button("Buat File Export", key="export_run", disabled=not columns):
+        os.makedirs(config.EXPORT_DIR, exist_ok=True)
+        path = os.path.join(config.EXPORT_DIR, f"{name}_{datetime.now():%Y%m%d_%H%M%S}.{fmt}")
+        status = st.empty()
+        try:
+            with get_db().reader() as export_conn, open(path, "wb") as f:
+                report = export.export(export_conn, name, f, fmt, columns, start, end,
+                                       progress=lambda rows: status.caption(f"{rows:,} baris ditulis..."))
+        except Exception as e:
+            if os.path.exists(path):
+                os.remove(path)
+            status.error(f"Export gagal: {e}")
         else:
-            st.info("Tidak ada pengajuan cuti pending")
-    
-    with tab5:
-        st.subheader("Attendance Report")
-        attendances = pd.read_sql("""
-            SELECT a.*, e.nama_lengkap 
-            FROM daily_attendances a 
-            JOIN employees e ON a.employee_id = e.id
-            ORDER BY a.tanggal DESC
-            LIMIT 100
-        """, conn)
-        st.dataframe(attendances, use_container_width=True)
-    
-    with tab6:
-        st.subheader("User Management")
-        users = pd.read_sql("SELECT * FROM users", conn)
-        st.dataframe(users, use_container_width=True)
+            status.success(f"{report['rows']:,} baris diekspor dalam {report['seconds']:.1f} detik")
+            previous = st.session_state.get("export_file")
+            if previous and os.path.exists(previous):
+                os.remove(previous)
+            st.session_state["export_file"] = path
+
+    path = st.session_state.get("export_file")
+    if path and os.path.exists(path):
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        # Streamlit buffers the whole download in memory, so large files stay on disk
+        if size_mb > config.EXPORT_DOWNLOAD_MAX_MB:
+            st.warning(f"File {size_mb:.1f} MB melebihi batas unduhan {config.EXPORT_DOWNLOAD_MAX_MB} MB. "
+                       f"Ambil langsung dari {path} atau jalankan `python export.py`.")
+            return
+
+        def read_export():
+            with open(path, "rb") as f:
+                return f.read()
+
+        st.download_button(f"⬇️ Unduh {os.path.basename(path)} ({size_mb:.1f} MB)",
+                           data=read_export, file_name=os.path.basename(path), on_click="ignore",
+                           key="export_download")
+        st.caption(f"File tersimpan di {path}; untuk file sangat besar gunakan `python export.py`.")
+
+def admin_departments_tab(conn):
+    """Admin tab: department list and new department form"""
+    st.subheader("Data Department")
+    departments = cache.read_sql(conn, "SELECT * FROM departments", tables=("departments",))
+    st.dataframe(departments, use_container_width=True)
+    
+    with st.expander("➕ Tambah Department"):
+        with st.form("add_department_form"):
+            kode = st.text_input("Kode Department")
+            nama = st.text_input("Nama Department")
+            
+            if st.form_submit_button("Simpan"):
+                try:
+                    writequeue.run(lambda wconn: wconn.execute(
+                        "INSERT INTO departments (kode_department, nama_department) VALUES (?, ?)", (kode, nama)),
+                        "departments")
+                except Exception as e:
+                    st.error(f"Department gagal disimpan: {e}")
+                    return
+                st.success("Department berhasil ditambahkan!")
+                st.rerun()
+
+def admin_contracts_tab(conn):
+    """Admin tab: contracts ending soon and contract list"""
+    with profiling.section("expiring"):
+        expiring_contracts(conn)
+        last = jobs.last_runs(conn).get("contracts.expire")
+        col1, col2 = st.columns([3, 1])
+        if last:
+            col1.caption(f"Pemeriksaan kontrak terakhir {last[1]}: {last[2]} kontrak diakhiri ({last[3]:.2f} detik)")
+        # The job is not registered when HR_JOB_CONTRACT_EXPIRY_INTERVAL is 0
+        if (config.JOBS_ENABLED and "contracts.expire" in jobs.get_scheduler().status()
+                and col2.button("🔄 Periksa sekarang")):
+            jobs.get_scheduler().run_now("contracts.expire")
+            st.toast("Pemeriksaan kontrak dijalankan di latar belakang")
+
+    st.subheader("Data Kontrak")
+    grid.paginated_table("admin_contracts", grid.CONTRACTS, conn)
+
+def expiring_contracts(conn, dept_id=None):
+    """Contracts ending within the warning window, as refreshed by the expiry job"""
+    days = config.CONTRACT_EXPIRY_WARNING_DAYS
+    st.subheader(f"Kontrak Berakhir ≤ {days} Hari")
+    where, params, scope = "", (), cache.GLOBAL_SCOPE
+    if dept_id is not None:
+        where, params, scope = "WHERE department_id = ?", (dept_id,), ("department", dept_id)
+    expiring = cache.read_sql(conn, f"""
+        SELECT nama_lengkap, jenis_kontrak, tanggal_berakhir,
+               CAST(julianday(tanggal_berakhir) - julianday('now', 'localtime', 'start of day') AS INTEGER) AS sisa_hari
+        FROM expiring_contracts
+        {where}
+        ORDER BY tanggal_berakhir
+    """, params, tables=("expiring_contracts",), scope=scope)
+    if expiring.empty:
+        st.info("Tidak ada kontrak yang akan berakhir")
+    else:
+        st.dataframe(expiring, use_container_width=True, hide_index=True)
+
+def admin_leaves_tab(conn):
+    """Admin tab: leave history and approval"""
+    st.subheader("Pengajuan Cuti")
+    grid.paginated_table("admin_leaves", grid.LEAVES, conn)
+    
+    # Approve/reject leave
+    st.subheader("Approval Cuti")
+    pending_leaves = cache.read_sql(conn, """
+        SELECT l.*, e.nama_lengkap 
+        FROM leave_submissions l 
+        JOIN employees e ON l.employee_id = e.id
+        WHERE l.status = 'pending'
+        ORDER BY l.created_at, l.id
+    """, tables=("leave_submissions", "employees"))
+    
+    with profiling.section("approval"):
+        leave_approval_form("admin_approval", pending_leaves, st.session_state.current_user[5])
+
+def leave_approval_form(key, pending_leaves, approver_id, dept_id=None):
+    """Selectable list of pending leave requests, approved or rejected in one batch
+
+    The selection lives inside a form, so ticking rows does not rerun the
+    page; only the Approve/Reject click does, once for the whole batch.
+    """
+    message = st.session_state.pop(f"{key}_result", None)
+    if message:
+        st.success(message)
+    if pending_leaves.empty:
+        st.info("Tidak ada pengajuan cuti pending" + (" di department Anda" if dept_id is not None else ""))
+        return
+
+    table = pending_leaves.assign(pilih=False)
+    with st.form(f"{key}_form"):
+        edited = st.data_editor(
+            table, key=f"{key}_rows", hide_index=True, use_container_width=True,
+            column_order=("pilih", "nama_lengkap", "jenis_cuti", "tanggal_mulai", "tanggal_selesai", "alasan"),
+            column_config={"pilih": st.column_config.CheckboxColumn("Pilih")},
+            disabled=[c for c in table.columns if c != "pilih"],
+        )
+        select_all = st.checkbox(f"Pilih semua ({len(table)} pengajuan)", key=f"{key}_all")
+        col1, col2 = st.columns(2)
+        approve = col1.form_submit_button("✓ Approve")
+        reject = col2.form_submit_button("✗ Reject")
+
+    if approve or reject:
+        ids = edited["id"] if select_all else edited.loc[edited["pilih"], "id"]
+        if ids.empty:
+            st.warning("Pilih minimal satu pengajuan")
+            return
+        status = "approved" if approve else "rejected"
+        updated = decide_leaves([int(i) for i in ids], status, approver_id, dept_id)
+        st.session_state[f"{key}_result"] = f"{updated} pengajuan cuti {'disetujui' if approve else 'ditolak'}"
+        # Ticked rows are stored by position, which the next list no longer matches
+        for state in (f"{key}_rows", f"{key}_all"):
+            st.session_state.pop(state, None)
+        st.rerun()
+
+def decide_leaves(ids, status, approver_id, dept_id=None):
+    """Approve or reject pending leave requests in one transaction
+
+    Requests already decided by someone else, or outside ``dept_id`` when
+    given, are left alone. Returns the number of requests updated.
+    """
+    sql = """
+        UPDATE leave_submissions SET status = ?, approved_by = ?, approved_date = ?
+        WHERE id = ? AND status = 'pending'
+    """
+    if dept_id is not None:
+        sql += " AND employee_id IN (SELECT id FROM employees WHERE department_id = ?)"
+    today = datetime.now().strftime("%Y-%m-%d")
+    params = [(status, approver_id, today, leave_id) + ((dept_id,) if dept_id is not None else ())
+              for leave_id in ids]
+    return writequeue.run(lambda wconn: wconn.executemany(sql, params).rowcount, "leave_submissions")
+
+def admin_attendance_tab(conn):
+    """Admin tab: monthly recap per department and latest attendance records"""
+    import pandas as pd
+
+    st.subheader("Attendance Report")
+    current_month = datetime.now().strftime("%Y-%m")
+    since = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+
+    # The three reads are independent, so they run side by side
+    with profiling.section("recap"):
+        data = sections.gather({
+            "recap": lambda c: cache.read_sql(c, """
+                SELECT d.nama_department AS department, r.status, r.days AS hari,
+                       r.late AS terlambat, ROUND(r.minutes / 60.0, 1) AS jam_kerja
+                FROM attendance_monthly r
+                JOIN departments d ON r.scope_key = CAST(d.id AS TEXT)
+                WHERE r.scope = ? AND r.period = ? AND r.days > 0
+                ORDER BY d.nama_department, r.status
+            """, (rollups.DEPARTMENT, current_month),
+                tables=rollups.SOURCES + rollups.TABLES + ("departments",)),
+            "trend": lambda c: cache.read_sql(c, """
+                SELECT period AS tanggal, status, SUM(days) AS hari
+                FROM attendance_daily
+                WHERE scope = ? AND period >= ?
+                GROUP BY period, status
+            """, (rollups.DEPARTMENT, since), tables=rollups.SOURCES + rollups.TABLES),
+            "latest": lambda c: cache.read_sql(c, """
+                SELECT a.*, e.nama_lengkap 
+                FROM daily_attendances a 
+                JOIN employees e ON a.employee_id = e.id
+                ORDER BY a.tanggal DESC
+                LIMIT 100
+            """, tables=("daily_attendances", "employees")),
+        }, defaults={"recap": pd.DataFrame(), "trend": pd.DataFrame(), "latest": pd.DataFrame()})
+
+        st.caption(f"Rekap per department bulan {current_month}")
+        st.dataframe(data["recap"], use_container_width=True)
+
+        trend = data["trend"]
+        if not trend.empty:
+            st.caption("Kehadiran 30 hari terakhir")
+            st.bar_chart(pd.pivot_table(trend, index="tanggal", columns="status", values="hari", fill_value=0))
+
+    st.dataframe(data["latest"], use_container_width=True)
+
+def admin_analytics_tab():
+    """Admin tab: headcount and mix reports from the columnar snapshot"""
+    import snapshot
+
+    st.subheader("Analitik Headcount")
+    snap = snapshot.load()
+    col1, col2 = st.columns([3, 1])
+    if snap is not None:
+        col1.caption(f"Snapshot {snap.built_at} · data di tab ini tidak real-time")
+    if (config.JOBS_ENABLED and "snapshot.build" in jobs.get_scheduler().status()
+            and col2.button("🔄 Perbarui snapshot")):
+        jobs.get_scheduler().run_now("snapshot.build")
+        st.toast("Snapshot dibangun ulang di latar belakang")
+    if snap is None:
+        st.info("Snapshot analitik belum tersedia. Jalankan `python snapshot.py` atau aktifkan job snapshot.")
+        return
+
+    def report(name, fn, *args):
+        # Results are fixed for a snapshot, so they are cached under its name
+        return cache.get_cache().get_or_load(("analytics", snap.path, name) + args, (), lambda: fn(snap, *args))
+
+    with profiling.section("analytics"):
+        months = st.slider("Periode (bulan)", 3, 24, 12, key="analytics_months")
+        headcount = report("headcount", snapshot.headcount_by_month, months)
+        st.caption("Karyawan dengan kontrak aktif di akhir bulan, per department")
+        st.area_chart(headcount)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.caption("Tingkat kehadiran per department")
+            rate = report("attendance_rate", snapshot.attendance_rate, min(months, 12))
+            st.dataframe(rate.T.style.format("{:.1%}", na_rep="-"), use_container_width=True)
+        with col2:
+            year = datetime.now().year
+            st.caption(f"Pengajuan cuti {year} per jenis")
+            st.dataframe(report("leave_by_type", snapshot.leave_by_type, year), use_container_width=True)
+
+        st.caption("Komposisi kontrak per department")
+        mix = report("contract_mix", snapshot.contract_mix)
+        st.dataframe(mix.set_axis([" / ".join(c) for c in mix.columns], axis=1), use_container_width=True)
+
+def admin_users_tab(conn):
+    """Admin tab: user list and new user form"""
+    st.subheader("User Management")
+    grid.paginated_table("admin_users", grid.USERS, conn)
+    
+    with st.expander("➕ Tambah User Baru"):
+        # Role and employee sit outside the form so the search reacts while typing
+        role = st.selectbox("Role", ["admin", "manager", "employee"], key="add_user_role")
+        emp_id = grid.employee_picker(conn, "Karyawan", "add_user_employee") if role == "employee" else None
         
-        with st.expander("➕ Tambah User Baru"):
-            with st.form("add_user_form"):
-                username = st.text_input("Username")
-                password = st.text_input("Password", type="password")
-                email = st.text_input("Email")
-                role = st.selectbox("Role", ["admin", "manager", "employee"])
-                
-                if role == "employee":
-                    employees = pd.read_sql("SELECT id, nama_lengkap FROM employees", conn)
-                    emp_options = {row['nama_lengkap']: row['id'] for _, row in employees.iterrows()}
-                    selected_emp = st.selectbox("Karyawan", list(emp_options.keys()))
-                    emp_id = emp_options[selected_emp]
-                else:
-                    emp_id = None
-                
-                if st.form_submit_button("Simpan"):
-                    c = conn.cursor()
-                    hashed_pwd = hash_password(password)
-                    c.execute("INSERT INTO users (username, password, email, role, employee_id) VALUES (?, ?, ?, ?, ?)",
-                              (username, hashed_pwd, email, role, emp_id))
-                    conn.commit()
-                    st.success("User berhasil ditambahkan!")
-                    st.rerun()
+        with st.form("add_user_form"):
+            username = st.text_input("Username")
+            password = st.text_input("Password", type="password")
+            email = st.text_input("Email")
+            
+            if st.form_submit_button("Simpan"):
+                if role == "employee" and emp_id is None:
+                    st.error("Pilih karyawan untuk user dengan role employee")
+                    return
+                # Hash outside the write so the writer thread is not held up
+                hashed_pwd = hash_password(password)
+                try:
+                    writequeue.run(lambda wconn: wconn.execute(
+                        "INSERT INTO users (username, password, email, role, employee_id) VALUES (?, ?, ?, ?, ?)",
+                        (username, hashed_pwd, email, role, emp_id)), "users")
+                except Exception as e:
+                    st.error(f"User gagal disimpan: {e}")
+                    return
+                st.success("User berhasil ditambahkan!")
+                st.rerun()
 
 def manager_dashboard():
     """Manager dashboard"""
     st.title("👨‍💼 Manager Dashboard")
     
-    conn = sqlite3.connect('hr_system.db')
     user = st.session_state.current_user
     
-    # Get manager's department
-    c = conn.cursor()
-    c.execute("SELECT department_id FROM employees WHERE id = ?", (user[5],))
-    result = c.fetchone()
+    with get_db().reader() as conn:
+        # Get manager's department
+        c = conn.cursor()
+        c.execute("SELECT department_id FROM employees WHERE id = ?", (user[5],))
+        result = c.fetchone()
     
-    if result:
-        dept_id = result[0]
+        if result:
+            dept_id = result[0]
         
-        # Department statistics
-        col1, col2, col3 = st.columns(3)
+            # Department statistics
+            with profiling.section("counters"):
+                counters = stats.get_counters(conn, stats.DEPARTMENT, dept_id)
+            col1, col2, col3 = st.columns(3)
         
-        with col1:
-            c.execute("SELECT COUNT(*) FROM employees WHERE department_id = ?", (dept_id,))
-            total_emps = c.fetchone()[0]
-            st.metric("Karyawan di Department", total_emps)
+            with col1:
+                st.metric("Karyawan di Department", counters['employees'])
         
-        with col2:
-            c.execute("SELECT COUNT(*) FROM leave_submissions l JOIN employees e ON l.employee_id = e.id WHERE e.department_id = ? AND l.status = 'pending'", 
-                      (dept_id,))
-            pending_leaves = c.fetchone()[0]
-            st.metric("Cuti Pending", pending_leaves)
+            with col2:
+                st.metric("Cuti Pending", counters['pending_leaves'])
         
-        with col3:
-            c.execute("SELECT COUNT(*) FROM employees WHERE department_id = ? AND status_kerja = 'aktif'", 
-                      (dept_id,))
-            active_emps = c.fetchone()[0]
-            st.metric("Karyawan Aktif", active_emps)
+            with col3:
+                st.metric("Karyawan Aktif", counters['active_employees'])
         
-        # Tabs
-        tab1, tab2, tab3 = st.tabs(["📋 Karyawan", "🏖️ Cuti", "📊 Attendance"])
-        
-        with tab1:
-            st.subheader("Karyawan di Department")
-            employees = pd.read_sql("""
-                SELECT * FROM employees WHERE department_id = ?
-            """, conn, params=(dept_id,))
-            st.dataframe(employees, use_container_width=True)
-        
-        with tab2:
-            st.subheader("Pengajuan Cuti Department")
-            leaves = pd.read_sql("""
-                SELECT l.*, e.nama_lengkap 
-                FROM leave_submissions l 
-                JOIN employees e ON l.employee_id = e.id
-                WHERE e.department_id = ?
-                ORDER BY l.created_at DESC
-            """, conn, params=(dept_id,))
-            st.dataframe(leaves, use_container_width=True)
-            
-            # Approve/reject leave for department
-            st.subheader("Approval Cuti Department")
-            pending_leaves = pd.read_sql("""
-                SELECT l.*, e.nama_lengkap 
-                FROM leave_submissions l 
-                JOIN employees e ON l.employee_id = e.id
-                WHERE e.department_id = ? AND l.status = 'pending'
-            """, conn, params=(dept_id,))
-            
-            if not pending_leaves.empty:
-                for _, leave in pending_leaves.iterrows():
-                    with st.container():
-                        col1, col2, col3 = st.columns([3, 1, 1])
-                        with col1:
-                            st.write(f"**{leave['nama_lengkap']}** - {leave['jenis_cuti']}")
-                            st.write(f"{leave['tanggal_mulai']} s/d {leave['tanggal_selesai']}")
-                            st.write(f"Alasan: {leave['alasan']}")
-                        
-                        with col2:
-                            if st.button("✓ Approve", key=f"m_approve_{leave['id']}"):
-                                c = conn.cursor()
-                                c.execute("UPDATE leave_submissions SET status = 'approved', approved_by = ?, approved_date = ? WHERE id = ?",
-                                          (user[5], datetime.now().strftime("%Y-%m-%d"), leave['id']))
-                                conn.commit()
-                                st.rerun()
-                        
-                        with col3:
-                            if st.button("✗ Reject", key=f"m_reject_{leave['id']}"):
-                                c = conn.cursor()
-                                c.execute("UPDATE leave_submissions SET status = 'rejected', approved_by = ?, approved_date = ? WHERE id = ?",
-                                          (user[5], datetime.now().strftime("%Y-%m-%d"), leave['id']))
-                                conn.commit()
-                                st.rerun()
-            else:
-                st.info("Tidak ada pengajuan cuti pending di department Anda")
-        
-        with tab3:
-            st.subheader("Attendance Department")
-            attendances = pd.read_sql("""
-                SELECT a.*, e.nama_lengkap 
-                FROM daily_attendances a 
-                JOIN employees e ON a.employee_id = e.id
-                WHERE e.department_id = ?
-                ORDER BY a.tanggal DESC
-                LIMIT 50
-            """, conn, params=(dept_id,))
-            st.dataframe(attendances, use_container_width=True)
+            # Tabs (only the selected tab is rendered)
+            sections.render_tabs("manager_tabs", [
+                ("📋 Karyawan", lambda: manager_employees_tab(conn, dept_id)),
+                ("🏖️ Cuti", lambda: manager_leaves_tab(conn, dept_id, user)),
+                ("📊 Attendance", lambda: manager_attendance_tab(conn, dept_id)),
+            ])
+
+def manager_employees_tab(conn, dept_id):
+    """Manager tab: employees of the manager's department"""
+    st.subheader("Karyawan di Department")
+    grid.paginated_table("manager_employees", grid.EMPLOYEES, conn,
+                         where=("e.department_id = ?", [dept_id]), scope=("department", dept_id))
+    
+    with profiling.section("expiring"):
+        expiring_contracts(conn, dept_id)
+
+def manager_leaves_tab(conn, dept_id, user):
+    """Manager tab: department leave history and approval"""
+    st.subheader("Pengajuan Cuti Department")
+    grid.paginated_table("manager_leaves", grid.LEAVES, conn,
+                         where=("e.department_id = ?", [dept_id]), scope=("department", dept_id))
+    
+    # Approve/reject leave for department
+    st.subheader("Approval Cuti Department")
+    pending_leaves = cache.read_sql(conn, """
+        SELECT l.*, e.nama_lengkap 
+        FROM leave_submissions l 
+        JOIN employees e ON l.employee_id = e.id
+        WHERE e.department_id = ? AND l.status = 'pending'
+        ORDER BY l.created_at, l.id
+    """, (dept_id,), tables=("leave_submissions", "employees"), scope=("department", dept_id))
+    
+    with profiling.section("approval"):
+        leave_approval_form("manager_approval", pending_leaves, user[5], dept_id)
+
+def manager_attendance_tab(conn, dept_id):
+    """Manager tab: monthly recap and latest attendance of the department"""
+    import pandas as pd
+
+    st.subheader("Attendance Department")
+    current_month = datetime.now().strftime("%Y-%m")
+
+    # The daily rollup tells how far back the latest 50 rows reach, so only
+    # that range is read and sorted
+    def latest(c):
+        return cache.read_sql(c, """
+            SELECT a.*, e.nama_lengkap 
+            FROM daily_attendances a 
+            JOIN employees e ON a.employee_id = e.id
+            WHERE e.department_id = ? AND a.tanggal >= ?
+            ORDER BY a.tanggal DESC
+            LIMIT 50
+        """, (dept_id, rollups.recent_cutoff(c, dept_id, 50)),
+            tables=("daily_attendances", "employees"), scope=("department", dept_id))
+
+    data = sections.gather({
+        "totals": lambda c: rollups.month_totals(c, rollups.DEPARTMENT, dept_id, current_month),
+        "latest": latest,
+    }, defaults={"totals": {}, "latest": pd.DataFrame()})
+
+    totals = data["totals"]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Hari Hadir Bulan Ini", totals.get("hadir", {}).get("days", 0))
+    col2.metric("Terlambat", sum(t["late"] for t in totals.values()))
+    col3.metric("Jam Kerja", round(sum(t["minutes"] for t in totals.values()) / 60))
+
+    st.dataframe(data["latest"], use_container_width=True)
 
 def employee_dashboard():
     """Employee dashboard"""
     st.title("👤 Employee Dashboard")
     
-    conn = sqlite3.connect('hr_system.db')
     user = st.session_state.current_user
     emp_id = user[5]  # employee_id
     
-    # Personal information
-    col1, col2, col3 = st.columns(3)
+    with get_db().reader() as conn:
+        # Personal information
+        with profiling.section("summary"):
+            summary = sections.gather(employee_summary(emp_id), defaults={
+                'employee': None, 'department': "-", 'approved_leaves': 0,
+                'active_contracts': 0, 'attendance_days': 0,
+            })
+        col1, col2, col3 = st.columns(3)
     
-    with col1:
-        c = conn.cursor()
-        c.execute("SELECT * FROM employees WHERE id = ?", (emp_id,))
-        emp_info = c.fetchone()
-        
-        if emp_info:
-            st.metric("Nama", emp_info[1])
-            st.metric("NIK", emp_info[2])
-            st.metric("Jabatan", emp_info[11])
+        with col1:
+            emp_info = summary['employee']
+            if emp_info:
+                st.metric("Nama", emp_info[1])
+                st.metric("NIK", emp_info[2])
+                st.metric("Jabatan", emp_info[11])
     
-    with col2:
-        # Get department name
-        c.execute("""
+        with col2:
+            st.metric("Department", summary['department'])
+            st.metric("Cuti Disetujui", summary['approved_leaves'])
+    
+        with col3:
+            st.metric("Kontrak Aktif", summary['active_contracts'])
+            st.metric("Hari Hadir", summary['attendance_days'])
+    
+        # Tabs (only the selected tab is rendered)
+        sections.render_tabs("employee_tabs", [
+            ("📋 Profil", lambda: employee_profile_tab(conn, emp_id)),
+            ("📝 Kontrak", lambda: employee_contracts_tab(conn, emp_id)),
+            ("🏖️ Cuti", lambda: employee_leaves_tab(conn, emp_id)),
+            ("📊 Attendance", lambda: employee_attendance_tab(conn, emp_id)),
+        ])
+
+def employee_summary(emp_id):
+    """Loaders of the header figures of the employee dashboard, for sections.gather"""
+    scope = ("employee", emp_id)
+
+    def first(sql, params, tables, column=None):
+        def load(conn):
+            rows = cache.query(conn, sql, params, tables=tables, scope=scope)
+            row = rows[0] if rows else None
+            return row if row is None or column is None else row[column]
+        return load
+
+    return {
+        'employee': first("SELECT * FROM employees WHERE id = ?", (emp_id,), ("employees",)),
+        'department': first("""
             SELECT d.nama_department 
             FROM employees e 
             JOIN departments d ON e.department_id = d.id 
             WHERE e.id = ?
-        """, (emp_id,))
-        dept_name = c.fetchone()[0]
-        st.metric("Department", dept_name)
-        
-        c.execute("SELECT COUNT(*) FROM leave_submissions WHERE employee_id = ? AND status = 'approved'", (emp_id,))
-        approved_leaves = c.fetchone()[0]
-        st.metric("Cuti Disetujui", approved_leaves)
-    
-    with col3:
-        c.execute("SELECT COUNT(*) FROM contracts WHERE employee_id = ? AND status_kontrak = 'aktif'", (emp_id,))
-        active_contracts = c.fetchone()[0]
-        st.metric("Kontrak Aktif", active_contracts)
-        
-        c.execute("SELECT COUNT(*) FROM daily_attendances WHERE employee_id = ? AND status = 'hadir'", (emp_id,))
-        attendance_days = c.fetchone()[0]
-        st.metric("Hari Hadir", attendance_days)
+        """, (emp_id,), ("employees", "departments"), 0),
+        'approved_leaves': first("SELECT COUNT(*) FROM leave_submissions WHERE employee_id = ? AND status = 'approved'",
+                                 (emp_id,), ("leave_submissions",), 0),
+        'active_contracts': first("SELECT COUNT(*) FROM contracts WHERE employee_id = ? AND status_kontrak = 'aktif'",
+                                  (emp_id,), ("contracts",), 0),
+        'attendance_days': first("SELECT COALESCE(SUM(days), 0) FROM attendance_monthly WHERE scope = ? AND scope_key = ? AND status = 'hadir'",
+                                 (rollups.EMPLOYEE, str(emp_id)), rollups.SOURCES + rollups.TABLES, 0),
+    }
+
+def employee_profile_tab(conn, emp_id):
+    """Employee tab: profile, education and certificates"""
+    import pandas as pd
+
+    # Profile, education and certificates are fetched together
+    scope = ("employee", emp_id)
+    data = sections.gather({
+        "employee": lambda c: cache.read_sql(c, "SELECT * FROM employees WHERE id = ?", (emp_id,),
+                                             tables=("employees",), scope=scope),
+        "educations": lambda c: cache.read_sql(c, "SELECT * FROM educations WHERE employee_id = ?", (emp_id,),
+                                               tables=("educations",), scope=scope),
+        "certifications": lambda c: cache.read_sql(c, "SELECT * FROM certifications WHERE employee_id = ?", (emp_id,),
+                                                   tables=("certifications",), scope=scope),
+    }, defaults={"employee": pd.DataFrame(), "educations": pd.DataFrame(), "certifications": pd.DataFrame()})
+
+    st.subheader("Profil Saya")
+    st.dataframe(data["employee"], use_container_width=True)
     
-    # Tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["📋 Profil", "📝 Kontrak", "🏖️ Cuti", "📊 Attendance"])
+    # Education
+    st.subheader("Riwayat Pendidikan")
+    st.dataframe(data["educations"], use_container_width=True)
     
-    with tab1:
-        st.subheader("Profil Saya")
-        employee = pd.read_sql("SELECT * FROM employees WHERE id = ?", conn, params=(emp_id,))
-        st.dataframe(employee, use_container_width=True)
-        
-        # Education
-        st.subheader("Riwayat Pendidikan")
-        educations = pd.read_sql("SELECT * FROM educations WHERE employee_id = ?", conn, params=(emp_id,))
-        st.dataframe(educations, use_container_width=True)
-        
-        # Certifications
-        st.subheader("Sertifikat")
-        certifications = pd.read_sql("SELECT * FROM certifications WHERE employee_id = ?", conn, params=(emp_id,))
-        st.dataframe(certifications, use_container_width=True)
-    
-    with tab2:
-        st.subheader("Kontrak Saya")
-        contracts = pd.read_sql("SELECT * FROM contracts WHERE employee_id = ?", conn, params=(emp_id,))
-        st.dataframe(contracts, use_container_width=True)
-    
-    with tab3:
-        col1, col2 = st.columns([2, 1])
-        
-        with col1:
-            st.subheader("Riwayat Cuti")
-            leaves = pd.read_sql("SELECT * FROM leave_submissions WHERE employee_id = ?", conn, params=(emp_id,))
-            st.dataframe(leaves, use_container_width=True)
-        
-        with col2:
-            st.subheader("Ajukan Cuti")
-            with st.form("leave_request_form"):
-                jenis_cuti = st.selectbox("Jenis Cuti", ["Cuti Tahunan", "Cuti Sakit", "Cuti Melahirkan", "Cuti Lainnya"])
-                tanggal_mulai = st.date_input("Tanggal Mulai")
-                tanggal_selesai = st.date_input("Tanggal Selesai")
-                alasan = st.text_area("Alasan")
-                file_pendukung = st.file_uploader("File Pendukung (opsional)")
-                
-                if st.form_submit_button("Ajukan Cuti"):
-                    c = conn.cursor()
-                    c.execute('''
+    # Certifications
+    st.subheader("Sertifikat")
+    st.dataframe(data["certifications"], use_container_width=True)
+
+def employee_contracts_tab(conn, emp_id):
+    """Employee tab: own contracts"""
+    st.subheader("Kontrak Saya")
+    contracts = cache.read_sql(conn, "SELECT * FROM contracts WHERE employee_id = ?", (emp_id,),
+                               tables=("contracts",), scope=("employee", emp_id))
+    st.dataframe(contracts, use_container_width=True)
+
+def employee_leaves_tab(conn, emp_id):
+    """Employee tab: leave history and leave request form"""
+    import leave_balance
+
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        st.subheader("Riwayat Cuti")
+        leaves = cache.read_sql(conn, "SELECT * FROM leave_submissions WHERE employee_id = ?", (emp_id,),
+                                tables=("leave_submissions",), scope=("employee", emp_id))
+        st.dataframe(leaves, use_container_width=True)
+    
+    with col2:
+        st.subheader(f"Saldo Cuti Tahunan {datetime.now().year}")
+        with profiling.section("balance"):
+            balance = leave_balance.balance(conn, emp_id)
+        bcol1, bcol2, bcol3 = st.columns(3)
+        bcol1.metric("Jatah", balance["entitlement"])
+        bcol2.metric("Terpakai", balance["used"], help=f"{balance['pending']} hari kerja masih pending")
+        bcol3.metric("Sisa", balance["remaining"])
+
+        st.subheader("Ajukan Cuti")
+        with st.form("leave_request_form"):
+            jenis_cuti = st.selectbox("Jenis Cuti", ["Cuti Tahunan", "Cuti Sakit", "Cuti Melahirkan", "Cuti Lainnya"])
+            tanggal_mulai = st.date_input("Tanggal Mulai")
+            tanggal_selesai = st.date_input("Tanggal Selesai")
+            alasan = st.text_area("Alasan")
+            file_pendukung = st.file_uploader("File Pendukung (opsional)")
+            
+            if st.form_submit_button("Ajukan Cuti"):
+                days, error = leave_balance.check_request(conn, emp_id, jenis_cuti, tanggal_mulai, tanggal_selesai)
+                if error:
+                    st.error(error)
+                    return
+                params = (emp_id, tanggal_mulai.strftime("%Y-%m-%d"), tanggal_selesai.strftime("%Y-%m-%d"),
+                          jenis_cuti, alasan, "pending")
+                try:
+                    writequeue.run(lambda wconn: wconn.execute('''
                         INSERT INTO leave_submissions (employee_id, tanggal_mulai, tanggal_selesai, jenis_cuti, alasan, status)
                         VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (emp_id, tanggal_mulai.strftime("%Y-%m-%d"), tanggal_selesai.strftime("%Y-%m-%d"), 
-                          jenis_cuti, alasan, "pending"))
-                    conn.commit()
-                    st.success("Pengajuan cuti berhasil dikirim!")
-                    st.rerun()
-    
-    with tab4:
-        st.subheader("Riwayat Kehadiran")
-        attendances = pd.read_sql("SELECT * FROM daily_attendances WHERE employee_id = ? ORDER BY tanggal DESC LIMIT 30", 
-                                  conn, params=(emp_id,))
-        st.dataframe(attendances, use_container_width=True)
-        
-        # Attendance chart
-        st.subheader("Chart Kehadiran Bulan Ini")
-        current_month = datetime.now().strftime("%Y-%m")
+                    ''', params), "leave_submissions")
+                except Exception as e:
+                    st.error(f"Pengajuan cuti gagal dikirim: {e}")
+                    return
+                st.success(f"Pengajuan cuti {days} hari kerja berhasil dikirim!")
+                st.rerun()
+
+def employee_attendance_tab(conn, emp_id):
+    """Employee tab: attendance history and monthly chart"""
+    import pandas as pd
+    
+    # Same merge as the check-in service: earliest in, latest out
+    col1, col2, _ = st.columns([1, 1, 3])
+    for col, direction, label in [(col1, "in", "🕗 Absen Masuk"), (col2, "out", "🕔 Absen Pulang")]:
+        if col.button(label, key=f"punch_{direction}"):
+            now = datetime.now()
+            clock = now.strftime("%H:%M:%S")
+            params = (emp_id, now.strftime("%Y-%m-%d"),
+                      clock if direction == "in" else None, clock if direction == "out" else None)
+            try:
+                writequeue.run(lambda wconn: wconn.execute(ingest.UPSERT_SQL, params), "daily_attendances")
+            except Exception as e:
+                st.error(f"{label.split(' ', 1)[1]} gagal dicatat: {e}")
+            else:
+                st.toast(f"{label.split(' ', 1)[1]} tercatat pukul {now:%H:%M}")
+
+    st.subheader("Riwayat Kehadiran")
+    attendances = cache.read_sql(conn, "SELECT * FROM daily_attendances WHERE employee_id = ? ORDER BY tanggal DESC LIMIT 30", (emp_id,),
+                                 tables=("daily_attendances",), scope=("employee", emp_id))
+    st.dataframe(attendances, use_container_width=True)
+    
+    # Attendance chart
+    st.subheader("Chart Kehadiran Bulan Ini")
+    today = datetime.now()
+    current_month = today.strftime("%Y-%m")
+    month_start = today.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    
+    def load_chart():
+        # A date range on (employee_id, tanggal) reads only this month's rows
         monthly_attendance = pd.read_sql("""
             SELECT tanggal, status, COUNT(*) as count 
             FROM daily_attendances 
-            WHERE employee_id = ? AND strftime('%Y-%m', tanggal) = ?
+            WHERE employee_id = ? AND tanggal >= ? AND tanggal < ?
             GROUP BY tanggal, status
-        """, conn, params=(emp_id, current_month))
-        
-        if not monthly_attendance.empty:
-            st.bar_chart(monthly_attendance.pivot_table(index='tanggal', columns='status', values='count', fill_value=0))
+        """, conn, params=(emp_id, month_start.strftime("%Y-%m-%d"), next_month.strftime("%Y-%m-%d")))
+        if monthly_attendance.empty:
+            return None
+        return monthly_attendance.pivot_table(index='tanggal', columns='status', values='count', fill_value=0)
+    
+    with profiling.section("chart"):
+        totals = rollups.month_totals(conn, rollups.EMPLOYEE, emp_id, current_month)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Hadir", totals.get("hadir", {}).get("days", 0))
+        col2.metric("Terlambat", sum(t["late"] for t in totals.values()))
+        col3.metric("Jam Kerja", round(sum(t["minutes"] for t in totals.values()) / 60, 1))
+        chart_data = sections.memo(("attendance_chart", emp_id, current_month), ("daily_attendances",), load_chart,
+                                   scope=("employee", emp_id))
+        if chart_data is not None:
+            st.bar_chart(chart_data)
 
 def login_page():
     """Login page"""
@@ -713,17 +787,81 @@ def login_page():
             else:
                 st.error("Username atau password salah!")
 
+def query_trace_panel():
+    """Admin-only sidebar panel: queries of this rerun and the slowest statements"""
+    import pandas as pd
+
+    with st.expander("🔍 Query Trace"):
+        if not config.DB_TRACE:
+            st.caption("Tracing nonaktif; aktifkan dengan HR_DB_TRACE=1")
+            return
+
+        run = tracing.current_run()
+        if run is not None:
+            st.write(f"Rerun ini: {run.queries} query · {run.rows} baris · {run.ms:.0f} ms "
+                     f"· {run.statements} statement SQLite")
+            st.dataframe(pd.DataFrame([(name, *totals) for name, totals in run.sections.items()],
+                                      columns=["Bagian", "Query", "Baris", "ms"]),
+                         use_container_width=True, hide_index=True)
+
+        st.caption("Rerun terakhir")
+        st.dataframe(pd.DataFrame(
+            [(r.started.strftime("%H:%M:%S"), r.queries, r.rows, round(r.ms, 1))
+             for r in reversed(tracing.recent_runs())],
+            columns=["Waktu", "Query", "Baris", "ms"]), use_container_width=True, hide_index=True)
+
+        top_n = st.number_input("Top N statement", min_value=1, max_value=50, value=10, key="trace_top_n")
+        top = pd.DataFrame(tracing.top_statements(top_n))
+        if not top.empty:
+            top["sql"] = top["sql"].map(lambda sql: " ".join(sql.split()))
+        st.dataframe(top.round(1), use_container_width=True, hide_index=True)
+
+        slow = tracing.slow_queries()[:top_n]
+        st.caption(f"Slow query (≥ {config.TRACE_SLOW_QUERY_MS} ms): {len(tracing.slow_queries())}")
+        for entry in slow:
+            st.write(f"**{entry['ms']:.0f} ms** · {entry['rows']} baris · {entry['section'] or '-'} "
+                     f"· {entry['time']:%H:%M:%S}")
+            st.code(entry['sql'].strip() + ("\n\n-- QUERY PLAN\n" + entry['plan'] if entry['plan'] else ""),
+                    language="sql")
+
+def profiling_panel():
+    """Admin-only sidebar panel: section timing toggle, p50/p95 and cProfile capture"""
+    import pandas as pd
+
+    with st.expander("⏱️ Profiling"):
+        enabled = st.toggle("Ukur waktu per bagian (semua sesi)", value=profiling.is_enabled(),
+                            key="profiling_enabled")
+        if enabled != profiling.is_enabled():
+            profiling.set_enabled(enabled)
+        if st.button("cProfile rerun berikutnya", key="profile_next"):
+            st.session_state.profile_next_rerun = True
+            st.rerun()
+
+        summary = pd.DataFrame(profiling.latency_summary())
+        if summary.empty:
+            st.caption("Belum ada sampel")
+        else:
+            st.dataframe(summary.round(1), use_container_width=True, hide_index=True)
+        if st.button("Reset sampel", key="profiling_reset"):
+            profiling.reset()
+            st.rerun()
+
+        profiles = profiling.saved_profiles(5)
+        if profiles:
+            st.caption("Profil tersimpan (.prof untuk snakeviz/flameprof, .txt ringkasan)")
+            for path in profiles:
+                st.code(path, language=None)
+
 def main():
     """Main application"""
-    # Initialize database
-    if not st.session_state.db_initialized:
-        conn = init_database()
-        create_dummy_data(conn)
-        st.session_state.db_initialized = True
+    # Initialize database and background jobs (once per server process)
+    bootstrap()
+    jobs.start()
     
     # Check login status
     if not st.session_state.logged_in:
-        login_page()
+        with profiling.section("login_page"):
+            login_page()
     else:
         # Sidebar with user info and logout
         with st.sidebar:
@@ -741,23 +879,35 @@ def main():
             
             # Quick stats
             if st.session_state.user_role == "admin":
-                conn = sqlite3.connect('hr_system.db')
                 today = datetime.now().strftime("%Y-%m-%d")
-                leaves_today = pd.read_sql("""
-                    SELECT COUNT(*) as count FROM leave_submissions 
-                    WHERE DATE(created_at) = ?
-                """, conn, params=(today,))['count'][0]
+                with get_db().reader() as conn:
+                    leaves_today = stats.get_counters(conn, stats.DAY, today)['submissions']
                 st.metric("Pengajuan Hari Ini", leaves_today)
+                
+                with st.expander("⚡ Query Cache"):
+                    cache_stats = cache.get_cache().stats()
+                    st.write(f"Hit rate: {cache_stats['hit_rate']:.0%} "
+                             f"({cache_stats['hits']} hit / {cache_stats['misses']} miss)")
+                    st.write(f"Entri: {cache_stats['entries']} · "
+                             f"{cache_stats['bytes'] / 1024 / 1024:.1f} / {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+                    st.write(f"Eviction: {cache_stats['evictions']}")
         
         # Show appropriate dashboard based on role
         if st.session_state.user_role == "admin":
-            admin_dashboard()
+            with profiling.section("admin_dashboard"):
+                admin_dashboard()
+            with st.sidebar:
+                query_trace_panel()
+                profiling_panel()
         elif st.session_state.user_role == "manager":
-            manager_dashboard()
+            with profiling.section("manager_dashboard"):
+                manager_dashboard()
         elif st.session_state.user_role == "employee":
-            employee_dashboard()
+            with profiling.section("employee_dashboard"):
+                employee_dashboard()
         else:
             st.error("Role tidak dikenali!")
 
 if __name__ == "__main__":
-    main()
+    with tracing.run(), profiling.run(profile=st.session_state.pop("profile_next_rerun", False)):
+        main()
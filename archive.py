@@ -0,0 +1,443 @@
+# archive.py
+"""Yearly archive partitions for daily_attendances
+
+``daily_attendances`` in the main database is the hot partition. It holds
+the last ``HR_ARCHIVE_KEEP_YEARS`` years (default 2, the current year and
+the one before it). Every older year can be moved into its own SQLite file,
+``HR_ARCHIVE_DIR/attendance_<year>.db``. The file has the same table and
+indexes but no foreign keys, since those cannot cross database files. The
+registry table ``attendance_archives`` in the main database lists the
+archived years.
+
+Every pooled connection ATTACHes the archived files, read-only unless
+``HR_ARCHIVE_READONLY=0``. Each connection also gets a TEMP view
+``attendance_history``, the UNION ALL of the archives (oldest first) and
+the hot table. SQLite only allows a view across attached files as a TEMP
+view, so it lives on each connection. The dashboards keep querying
+``daily_attendances``, so their "latest N" and current-month queries only
+touch the hot partition. Export and snapshot.py read ``attendance_history``.
+
+Archiving a year first registers it as ``pending``. From then on, triggers
+refuse inserts and updates for that year, and the copy sees its final rows.
+The copy is then written to a temporary file, indexed, VACUUMed and renamed
+into place. A last transaction checks that the copy matches, deletes the
+year from the hot table and marks it ``archived``. The rollups keep
+counting archived rows; their delete trigger is suspended for that
+transaction. From then on the year's rollups are frozen: an employee who
+moves department only carries the hot years along, and ``rollups.py
+--rebuild`` leaves archived years alone. Restoring a year counts its rows
+again from scratch. Archived files never change, so a
+backup only copies new archives next to the (now smaller) main database.
+
+SQLite attaches at most 10 files per connection, so at most 10 years can be
+archived.
+
+Usage:
+    python archive.py status
+    python archive.py archive [--year 2023]   # default: every closed year
+    python archive.py restore 2023
+    python archive.py backup /mnt/backup/hr
+"""
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date
+from urllib.parse import quote
+
+import config
+import rollups
+
+TABLE = "attendance_archives"
+VIEW = "attendance_history"
+SOURCE = "daily_attendances"
+PENDING = "pending"
+ARCHIVED = "archived"
+
+_SCHEMA_PREFIX = "attendance_"
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVED_YEAR = f"CAST(substr({{row}}.tanggal, 1, 4) AS INTEGER) IN (SELECT year FROM {TABLE})"
+_REFUSE = "BEGIN SELECT RAISE(ABORT, 'tahun absensi sudah diarsipkan'); END"
+
+_TRIGGERS = {
+    "trg_attendance_archived_insert": f"""
+        CREATE TRIGGER trg_attendance_archived_insert BEFORE INSERT ON {SOURCE}
+        WHEN {_ARCHIVED_YEAR.format(row="NEW")}
+        {_REFUSE}
+    """,
+    "trg_attendance_archived_update": f"""
+        CREATE TRIGGER trg_attendance_archived_update BEFORE UPDATE ON {SOURCE}
+        WHEN {_ARCHIVED_YEAR.format(row="OLD")} OR {_ARCHIVED_YEAR.format(row="NEW")}
+        {_REFUSE}
+    """,
+}
+
+
+def install(conn):
+    """Create the archive registry and the triggers that close archived years"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            status TEXT NOT NULL,
+            rows INTEGER,
+            bytes INTEGER,
+            archived_at TIMESTAMP
+        )
+    """)
+    for name, sql in _TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(sql)
+
+
+def schema_name(year):
+    return f"{_SCHEMA_PREFIX}{int(year)}"
+
+
+def _path(file):
+    return os.path.join(config.ARCHIVE_DIR, file)
+
+
+def _bounds(year):
+    return f"{int(year):04d}-01-01", f"{int(year) + 1:04d}-01-01"
+
+
+def archived(conn):
+    """Return [(year, file)] of the archived years, oldest first"""
+    exists = conn.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                          (TABLE,)).fetchone()
+    if not exists:
+        return []
+    return conn.execute(f"SELECT year, file FROM main.{TABLE} WHERE status = ? ORDER BY year",
+                        (ARCHIVED,)).fetchall()
+
+
+def closed_years(conn):
+    """Return the years whose attendance can no longer be written
+
+    Archived years and the one being archived; the triggers refuse both.
+    """
+    exists = conn.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                          (TABLE,)).fetchone()
+    if not exists:
+        return set()
+    return {row[0] for row in conn.execute(f"SELECT year FROM main.{TABLE}")}
+
+
+def history(conn):
+    """Return what to read every attendance year from on ``conn``
+
+    ``attendance_history`` on connections from the manager, the hot table
+    on any other connection.
+    """
+    exists = conn.execute("SELECT 1 FROM temp.sqlite_master WHERE type = 'view' AND name = ?",
+                          (VIEW,)).fetchone()
+    return VIEW if exists else SOURCE
+
+
+def _columns(conn, schema):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({SOURCE})")]
+
+
+def _view_sql(conn, schemas):
+    columns = _columns(conn, "main")
+    if not columns:
+        # Fresh database: the table is created after the first connection
+        return f"SELECT * FROM main.{SOURCE}"
+    parts = []
+    for schema in schemas:
+        present = set(_columns(conn, schema))
+        # Columns added to the hot table after a year was archived read as NULL
+        select = ", ".join(c if c in present else f"NULL AS {c}" for c in columns)
+        parts.append(f"SELECT {select} FROM {schema}.{SOURCE}")
+    parts.append(f"SELECT {', '.join(columns)} FROM main.{SOURCE}")
+    return "\nUNION ALL\n".join(parts)
+
+
+def attach(conn):
+    """Attach the archived years to ``conn`` and recreate ``attendance_history``
+
+    Must run outside a transaction. Archives are always reattached, since a
+    year restored and archived again is a new file under the same name.
+    Returns the archived (year, file) pairs.
+    """
+    query_only = conn.execute("PRAGMA query_only").fetchone()[0]
+    if query_only:
+        conn.execute("PRAGMA query_only = 0")
+    try:
+        for _seq, name, _file in conn.execute("PRAGMA database_list").fetchall():
+            if name.startswith(_SCHEMA_PREFIX):
+                conn.execute(f"DETACH DATABASE {name}")
+        archives = archived(conn)
+        schemas = []
+        for year, file in archives:
+            path = os.path.abspath(_path(file))
+            if not os.path.exists(path):
+                logger.warning("Arsip absensi %s tidak ditemukan di %s", year, path)
+                continue
+            mode = "ro" if config.ARCHIVE_READONLY else "rw"
+            conn.execute(f"ATTACH DATABASE ? AS {schema_name(year)}", (f"file:{quote(path)}?mode={mode}",))
+            schemas.append(schema_name(year))
+        conn.execute(f"DROP VIEW IF EXISTS temp.{VIEW}")
+        conn.execute(f"CREATE TEMP VIEW {VIEW} AS {_view_sql(conn, schemas)}")
+    finally:
+        if query_only:
+            conn.execute("PRAGMA query_only = 1")
+    return archives
+
+
+def partitions(conn, start=None, end=None):
+    """Return the ``schema.daily_attendances`` tables overlapping [start, end], oldest first"""
+    attached = {name for _seq, name, _file in conn.execute("PRAGMA database_list")}
+    tables = []
+    for year, _file in archived(conn):
+        first, after = _bounds(year)
+        if (end is not None and str(end) < first) or (start is not None and str(start) >= after):
+            continue
+        if schema_name(year) in attached:
+            tables.append(f"{schema_name(year)}.{SOURCE}")
+    tables.append(f"main.{SOURCE}")
+    return tables
+
+
+@contextmanager
+def _without_trigger(conn, name):
+    """Drop trigger ``name`` for the rest of the block, inside the caller's transaction"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                       (name,)).fetchone()
+    if row:
+        conn.execute(f"DROP TRIGGER {name}")
+    try:
+        yield
+    finally:
+        if row:
+            conn.execute(row[0])
+
+
+def _copy_year(year, path):
+    """Write the year's hot rows into a new archive file; returns (rows, id sum)"""
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    first, after = _bounds(year)
+    conn = sqlite3.connect(tmp)
+    try:
+        # Nothing to recover from if this fails halfway; the file is rebuilt
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        source = f"file:{quote(os.path.abspath(config.DB_PATH))}?mode=ro"
+        conn.execute("ATTACH DATABASE ? AS hot", (source,))
+        columns = conn.execute(f"PRAGMA hot.table_info({SOURCE})").fetchall()
+        definitions = ["id INTEGER PRIMARY KEY"] + [
+            f"{name} {type_}" + (" NOT NULL" if notnull else "")
+            for _cid, name, type_, notnull, _default, _pk in columns if name != "id"
+        ]
+        names = ", ".join(column[1] for column in columns)
+        conn.execute(f"CREATE TABLE {SOURCE} ({', '.join(definitions)})")
+        conn.execute(f"""
+            INSERT INTO main.{SOURCE} ({names})
+            SELECT {names} FROM hot.{SOURCE} WHERE tanggal >= ? AND tanggal < ? ORDER BY id
+        """, (first, after))
+        conn.commit()
+        conn.execute("DETACH DATABASE hot")
+        conn.execute(f"CREATE UNIQUE INDEX ux_{SOURCE}_employee_tanggal ON {SOURCE} (employee_id, tanggal)")
+        conn.execute(f"CREATE INDEX idx_{SOURCE}_tanggal ON {SOURCE} (tanggal)")
+        conn.execute("ANALYZE")
+        conn.commit()
+        checksum = conn.execute(f"SELECT COUNT(*), TOTAL(id) FROM {SOURCE}").fetchone()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return tuple(checksum)
+
+
+def closed_before():
+    """First year that stays in the hot table"""
+    # The current year is never archived
+    return date.today().year - max(config.ARCHIVE_KEEP_YEARS, 1) + 1
+
+
+def archive_year(year):
+    """Move one closed year out of the hot table into its archive file
+
+    Returns {year, rows, bytes, seconds}. Raises ValueError when the year
+    is still open, already archived or has no rows.
+    """
+    from database import get_db
+
+    year = int(year)
+    if year >= closed_before():
+        raise ValueError(f"Tahun {year} belum ditutup; arsip hanya untuk tahun sebelum {closed_before()}")
+    db = get_db()
+    started = time.perf_counter()
+    first, after = _bounds(year)
+    file = f"{schema_name(year)}.db"
+    path = _path(file)
+    with db.writer(TABLE) as conn:
+        status = conn.execute(f"SELECT status FROM {TABLE} WHERE year = ?", (year,)).fetchone()
+        if status and status[0] == ARCHIVED:
+            raise ValueError(f"Tahun {year} sudah diarsipkan")
+        if len(archived(conn)) >= conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED):
+            raise ValueError("Batas jumlah file arsip yang dapat di-ATTACH sudah tercapai")
+        if not conn.execute(f"SELECT 1 FROM {SOURCE} WHERE tanggal >= ? AND tanggal < ? LIMIT 1",
+                            (first, after)).fetchone():
+            raise ValueError(f"Tidak ada data absensi tahun {year}")
+        conn.execute(f"INSERT OR REPLACE INTO {TABLE} (year, file, status) VALUES (?, ?, ?)",
+                     (year, file, PENDING))
+    # Writes to the year are refused from here on, so the copy is final
+    try:
+        os.makedirs(config.ARCHIVE_DIR, exist_ok=True)
+        rows, id_sum = _copy_year(year, path)
+        with db.writer(SOURCE, TABLE) as conn:
+            hot = conn.execute(f"SELECT COUNT(*), TOTAL(id) FROM {SOURCE} WHERE tanggal >= ? AND tanggal < ?",
+                               (first, after)).fetchone()
+            if tuple(hot) != (rows, id_sum):
+                raise RuntimeError(f"Data tahun {year} berubah selama penyalinan; jalankan ulang")
+            # The rollups keep counting archived rows
+            with _without_trigger(conn, "trg_rollups_attendance_delete"):
+                conn.execute(f"DELETE FROM {SOURCE} WHERE tanggal >= ? AND tanggal < ?", (first, after))
+            conn.execute(f"""
+                UPDATE {TABLE} SET status = ?, rows = ?, bytes = ?, archived_at = CURRENT_TIMESTAMP
+                WHERE year = ?
+            """, (ARCHIVED, rows, os.path.getsize(path), year))
+    except BaseException:
+        with db.writer(TABLE) as conn:
+            conn.execute(f"DELETE FROM {TABLE} WHERE year = ? AND status = ?", (year, PENDING))
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    db.refresh_archives()
+    return {"year": year, "rows": rows, "bytes": os.path.getsize(path),
+            "seconds": time.perf_counter() - started}
+
+
+def archive_closed(progress=None):
+    """Archive every closed year still in the hot table, oldest first"""
+    from database import get_db
+
+    with get_db().reader() as conn:
+        oldest = conn.execute(f"SELECT MIN(tanggal) FROM {SOURCE}").fetchone()[0]
+    reports = []
+    if oldest is None:
+        return reports
+    for year in range(int(oldest[:4]), closed_before()):
+        try:
+            report = archive_year(year)
+        except ValueError as e:
+            logger.info("Arsip %s dilewati: %s", year, e)
+            continue
+        reports.append(report)
+        if progress:
+            progress(report)
+    return reports
+
+
+def restore_year(year):
+    """Move an archived year back into the hot table, e.g. to correct it
+
+    Returns the number of rows restored.
+    """
+    from database import get_db
+
+    year = int(year)
+    db = get_db()
+    with db.writer(SOURCE, TABLE) as conn:
+        row = conn.execute(f"SELECT file FROM {TABLE} WHERE year = ? AND status = ?",
+                           (year, ARCHIVED)).fetchone()
+        if row is None:
+            raise ValueError(f"Tahun {year} tidak ada di arsip")
+        schema = schema_name(year)
+        if schema not in {name for _seq, name, _file in conn.execute("PRAGMA database_list")}:
+            raise RuntimeError(f"File arsip {_path(row[0])} tidak ter-ATTACH")
+        present = set(_columns(conn, schema))
+        names = ", ".join(c for c in _columns(conn, "main") if c in present)
+        # Unregister first, otherwise the guard trigger refuses the rows
+        conn.execute(f"DELETE FROM {TABLE} WHERE year = ?", (year,))
+        # The insert trigger recounts the frozen rollups under today's departments
+        rollups.forget_year(conn, year)
+        restored = conn.execute(f"INSERT INTO main.{SOURCE} ({names}) SELECT {names} FROM {schema}.{SOURCE}"
+                                ).rowcount
+    db.refresh_archives()
+    os.remove(_path(row[0]))
+    return restored
+
+
+def backup(directory):
+    """Back up the main database and any archive file not yet in ``directory``
+
+    Returns {database, copied, unchanged}.
+    """
+    from database import get_db
+
+    os.makedirs(directory, exist_ok=True)
+    target_path = os.path.join(directory, os.path.basename(config.DB_PATH))
+    with get_db().reader() as conn:
+        target = sqlite3.connect(target_path)
+        try:
+            conn.backup(target)
+        finally:
+            target.close()
+        archives = archived(conn)
+    copied, unchanged = [], []
+    for _year, file in archives:
+        source, target_file = _path(file), os.path.join(directory, file)
+        if os.path.exists(target_file) and os.path.getsize(target_file) == os.path.getsize(source):
+            unchanged.append(file)
+            continue
+        shutil.copy2(source, target_file)
+        copied.append(file)
+    return {"database": target_path, "copied": copied, "unchanged": unchanged}
+
+
+def status(conn):
+    """Return (year, file, status, rows, bytes, archived_at) of every registered year"""
+    return conn.execute(f"SELECT year, file, status, rows, bytes, archived_at FROM {TABLE} ORDER BY year"
+                        ).fetchall()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import bootstrap, get_db
+
+    parser = argparse.ArgumentParser(description="Arsip absensi per tahun")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="daftar tahun yang diarsipkan")
+    archive_parser = commands.add_parser("archive", help="pindahkan tahun yang sudah ditutup ke file arsip")
+    archive_parser.add_argument("--year", type=int, default=None)
+    archive_parser.add_argument("--vacuum", action="store_true", help="VACUUM database utama sesudahnya")
+    restore_parser = commands.add_parser("restore", help="kembalikan satu tahun ke tabel utama")
+    restore_parser.add_argument("year", type=int)
+    backup_parser = commands.add_parser("backup", help="backup database utama dan arsip yang baru")
+    backup_parser.add_argument("directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    bootstrap(seed=False)
+    if args.command == "status":
+        with get_db().reader() as conn:
+            for year, file, state, rows, size, archived_at in status(conn):
+                print(f"{year}  {state:<8} {rows or 0:>10} baris  {(size or 0) / 2**20:8.1f} MB  {file}  {archived_at or '-'}")
+        print(f"Tabel utama menyimpan absensi sejak {closed_before()}")
+    elif args.command == "archive":
+        show = lambda r: print(f"{r['year']}: {r['rows']} baris, {r['bytes'] / 2**20:.1f} MB, {r['seconds']:.1f} detik")
+        if args.year is not None:
+            show(archive_year(args.year))
+        elif not archive_closed(progress=show):
+            print(f"Tidak ada tahun sebelum {closed_before()} yang perlu diarsipkan")
+        if args.vacuum:
+            with get_db().writer() as conn:
+                conn.commit()
+                conn.execute("VACUUM")
+    elif args.command == "restore":
+        print(f"{restore_year(args.year)} baris dikembalikan ke tabel utama")
+    else:
+        report = backup(args.directory)
+        print(f"Database disalin ke {report['database']}; arsip baru: {len(report['copied'])}, "
+              f"tidak berubah: {len(report['unchanged'])}")
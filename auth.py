@@ -0,0 +1,8 @@
+# auth.py
+"""Password hashing helpers"""
+import hashlib
+
+
+def hash_password(password):
+    """Hash password menggunakan SHA-256"""
+    return hashlib.sha256(password.encode()).hexdigest()
@@ -0,0 +1,408 @@
+# benchmark.py
+"""Headless page-render benchmarks across data scales
+
+Every page and a few write interactions are driven through Streamlit's
+AppTest harness against generated databases (see datagen.py) of several
+sizes. For each step the suite records wall time, the number of SQL
+statements, rows fetched and peak Python memory, and writes everything to
+a JSON file that a later run can be compared against.
+
+Each step runs ``--repeat`` times on a cold query cache and the median is
+kept. Pages are also re-run once to show the warm-cache cost. Memory is measured in a separate pass because
+tracemalloc slows everything it watches.
+
+Usage:
+    python benchmark.py --scales 1000 10000 100000 --output baseline.json
+    python benchmark.py --scales 1000 --compare baseline.json
+"""
+import json
+import os
+import platform
+import sqlite3
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DEFAULT_SCALES = [1000, 10000, 100000]
+# Fixed so generated databases, and therefore baselines, are reproducible
+END_DATE = date(2026, 1, 1)
+
+ADMIN_TABS = ["📋 Karyawan", "🏢 Department", "📝 Kontrak", "🏖️ Cuti", "📊 Attendance", "📈 Analitik", "👥 User Management"]
+MANAGER_TABS = ["📋 Karyawan", "🏖️ Cuti", "📊 Attendance"]
+EMPLOYEE_TABS = ["📋 Profil", "📝 Kontrak", "🏖️ Cuti", "📊 Attendance"]
+
+
+class _Counters:
+    lock = threading.Lock()
+    queries = 0
+    rows = 0
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.queries = cls.rows = 0
+
+    @classmethod
+    def add(cls, queries=0, rows=0):
+        with cls.lock:
+            cls.queries += queries
+            cls.rows += rows
+
+
+def _is_query(sql):
+    # PRAGMAs are connection setup and the time-based external write check;
+    # leaving them out keeps the query count deterministic
+    return not sql.lstrip()[:6].upper() == "PRAGMA"
+
+
+class CountingCursor(sqlite3.Cursor):
+    """Cursor that counts executed statements and fetched rows"""
+
+    def execute(self, sql, *args):
+        _Counters.add(queries=_is_query(sql))
+        return super().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        _Counters.add(queries=_is_query(sql))
+        return super().executemany(sql, *args)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _Counters.add(rows=1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = super().fetchmany(*args)
+        _Counters.add(rows=len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _Counters.add(rows=len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        _Counters.add(rows=1)
+        return row
+
+
+class CountingConnection(sqlite3.Connection):
+    """Connection whose cursors are CountingCursors"""
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+
+def prepare_database(path, employees, attendance_fraction):
+    """Generate the database for one scale unless it already exists"""
+    import config
+    import datagen
+    import database
+    import rollups
+    import search
+
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    config.DB_PATH = path
+    database.close_db()
+    database.bootstrap(seed=False)
+    with database.get_db().writer(*datagen.TABLES, "dashboard_stats", *rollups.TABLES, search.TABLE) as conn:
+        datagen.generate(conn, departments=max(5, employees // 1000), employees=employees,
+                         years=3, attendance_fraction=attendance_fraction, end_date=END_DATE)
+    database.close_db()
+
+
+def _user(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchone()
+    finally:
+        conn.close()
+
+
+class Session:
+    """A logged-in (or anonymous) AppTest session"""
+
+    def __init__(self, user, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP, default_timeout=timeout)
+        self.tab_key = self.tab = None
+        if user is not None:
+            self.at.session_state["logged_in"] = True
+            self.at.session_state["user_role"] = user[4]
+            self.at.session_state["current_user"] = user
+
+    def open(self, tab_key=None, tab=None):
+        # AppTest forgets the open tab between runs, so set it before each one
+        if tab_key:
+            self.tab_key, self.tab = tab_key, tab
+        if self.tab_key:
+            self.at.session_state[self.tab_key] = self.tab
+        return self
+
+    def run(self):
+        self.at.run()
+        if self.at.exception:
+            raise RuntimeError("; ".join(str(e.value) for e in self.at.exception))
+        # A rejected form renders fine but measures nothing
+        if self.at.error:
+            raise RuntimeError("; ".join(str(e.value) for e in self.at.error))
+        return self.at
+
+
+def _submit(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def _input(at, label):
+    return next(w for w in list(at.text_input) + list(at.text_area) if w.label == label)
+
+
+def _date_input(at, label):
+    return next(w for w in at.date_input if w.label == label)
+
+
+def _next_working_day(path):
+    """First day after today that counts as a working day for leave requests"""
+    import config
+
+    conn = sqlite3.connect(path)
+    try:
+        holidays = {row[0] for row in conn.execute("SELECT tanggal FROM holidays")}
+    finally:
+        conn.close()
+    day = date.today() + timedelta(days=1)
+    while config.LEAVE_WEEKMASK[day.weekday()] != "1" or day.isoformat() in holidays:
+        day += timedelta(days=1)
+    return day
+
+
+def scenarios(path):
+    """Return [(name, kind, setup, action)]; setup(timeout) returns a Session"""
+    admin = _user(path, "SELECT * FROM users WHERE role = 'admin' ORDER BY id LIMIT 1")
+    manager = _user(path, """
+        SELECT u.* FROM users u JOIN employees e ON u.employee_id = e.id
+        WHERE u.role = 'manager' ORDER BY u.id LIMIT 1
+    """)
+    employee = _user(path, """
+        SELECT u.* FROM users u JOIN employees e ON u.employee_id = e.id
+        WHERE u.role = 'employee' ORDER BY u.id LIMIT 1
+    """)
+    stamp = datetime.now().strftime("%H%M%S%f")
+    leave_day = _next_working_day(path)
+
+    def page(user, tab_key=None, tab=None):
+        return lambda timeout: Session(user, timeout).open(tab_key, tab)
+
+    def ready(user, tab_key=None, tab=None):
+        def setup(timeout):
+            session = Session(user, timeout).open(tab_key, tab)
+            session.run()
+            return session.open()
+        return setup
+
+    def login(session, i):
+        at = session.at
+        at.text_input[0].input(admin[1])
+        at.text_input[1].input("admin123")
+        _submit(at, "Login").click()
+        session.run()
+
+    def approve_leave(session, i):
+        if not any(b.label == "✓ Approve" for b in session.at.button):
+            raise RuntimeError("tidak ada cuti pending untuk di-approve")
+        # Tick the first pending request in the approval grid
+        session.at.session_state["admin_approval_rows"] = {
+            "edited_rows": {0: {"pilih": True}}, "added_rows": [], "deleted_rows": []}
+        _submit(session.at, "✓ Approve").click()
+        session.run()
+
+    def submit_leave(session, i):
+        # The form defaults to today, which is no working day on weekends
+        _date_input(session.at, "Tanggal Mulai").set_value(leave_day)
+        _date_input(session.at, "Tanggal Selesai").set_value(leave_day)
+        _input(session.at, "Alasan").input(f"Benchmark {stamp}-{i}")
+        _submit(session.at, "Ajukan Cuti").click()
+        session.run()
+
+    def add_employee(session, i):
+        _input(session.at, "Nama Lengkap").input(f"Benchmark {stamp}-{i}")
+        _input(session.at, "NIK").input(f"BENCH{stamp}{i}")
+        _submit(session.at, "Simpan").click()
+        session.run()
+
+    items = [("login_page", "page", page(None), None)]
+    for role, user, tab_key, tabs in [("admin_dashboard", admin, "admin_tabs", ADMIN_TABS),
+                                      ("manager_dashboard", manager, "manager_tabs", MANAGER_TABS),
+                                      ("employee_dashboard", employee, "employee_tabs", EMPLOYEE_TABS)]:
+        if user is None:
+            continue
+        for tab in tabs:
+            items.append((f"{role} / {tab}", "page", page(user, tab_key, tab), None))
+    items += [
+        ("login", "interaction", ready(None), login),
+        ("approve_leave", "interaction", ready(admin, "admin_tabs", "🏖️ Cuti"), approve_leave),
+        ("add_employee", "interaction", ready(admin, "admin_tabs", "📋 Karyawan"), add_employee),
+    ]
+    if employee is not None:
+        items.append(("submit_leave", "interaction", ready(employee, "employee_tabs", "🏖️ Cuti"), submit_leave))
+    return items
+
+
+def _measure(fn):
+    _Counters.reset()
+    started = time.perf_counter()
+    fn()
+    return {"wall_ms": round((time.perf_counter() - started) * 1000, 1),
+            "queries": _Counters.queries, "rows": _Counters.rows}
+
+
+def run_scale(path, timeout, repeat):
+    import cache
+
+    results = {}
+    for i, (name, kind, setup, action) in enumerate(scenarios(path)):
+        def step(session, attempt):
+            return (lambda: session.run()) if action is None else (lambda: action(session, attempt))
+
+        attempt = i * (repeat + 1)
+        try:
+            # Cold runs: a fresh session on an empty query cache, median wall time
+            runs = []
+            for _ in range(repeat):
+                cache.get_cache().clear()
+                session = setup(timeout)
+                runs.append(_measure(step(session, attempt)))
+                attempt += 1
+            result = {"kind": kind, **sorted(runs, key=lambda r: r["wall_ms"])[len(runs) // 2]}
+            if action is None:
+                warm = _measure(step(session.open(), attempt))
+                result.update(warm_ms=warm["wall_ms"], warm_queries=warm["queries"])
+
+            cache.get_cache().clear()
+            session = setup(timeout)
+            tracemalloc.start()
+            try:
+                step(session, attempt)()
+                result["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024)
+            finally:
+                tracemalloc.stop()
+        except Exception as e:
+            result = {"kind": kind, "error": str(e)}
+        results[name] = result
+        print(f"  {name:<45} " + (f"{result['wall_ms']:>9.1f} ms {result['queries']:>5} q "
+                                  f"{result['rows']:>8} rows {result.get('peak_kb', 0):>8} KB"
+                                  if "error" not in result else f"GAGAL: {result['error']}"))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print every step against ``baseline`` and return the number of regressions
+
+    A step regresses when its wall time grows by more than ``tolerance`` or
+    it runs more queries or fetches more rows than before. Query and row
+    counts are exact, so they catch N+1 patterns that timing noise hides.
+    """
+    regressions = 0
+    for scale, steps in results["scales"].items():
+        for name, current in steps.items():
+            previous = baseline.get("scales", {}).get(scale, {}).get(name)
+            if not previous or "error" in previous or "error" in current:
+                continue
+            ratio = current["wall_ms"] / previous["wall_ms"] if previous["wall_ms"] else 1.0
+            reasons = []
+            if ratio > 1 + tolerance:
+                reasons.append("waktu")
+            if current["queries"] > previous["queries"]:
+                reasons.append("query")
+            if current["rows"] > previous["rows"] * (1 + tolerance):
+                reasons.append("baris")
+            regressions += bool(reasons)
+            print(f"{scale:>7} {name:<45} {previous['wall_ms']:>9.1f} -> {current['wall_ms']:>9.1f} ms "
+                  f"({ratio:.2f}x) {previous['queries']:>4} -> {current['queries']:<4} q"
+                  + (f"  <-- regresi ({', '.join(reasons)})" if reasons else ""))
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark render halaman per skala data")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--data-dir", default=".bench", help="lokasi database hasil datagen")
+    parser.add_argument("--attendance-fraction", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3, help="jumlah run dingin per langkah (median)")
+    parser.add_argument("--timeout", type=float, default=600, help="batas detik per run AppTest")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="baseline JSON untuk dibandingkan")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="kenaikan relatif waktu/baris yang masih diterima")
+    args = parser.parse_args(argv)
+    # AppTest runs the script outside a server; silence the bare-mode warnings
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+    import config
+    import database
+
+    # Background jobs would write and query in the middle of measurements
+    config.JOBS_ENABLED = False
+
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "attendance_fraction": args.attendance_fraction,
+            "end_date": END_DATE.isoformat(),
+            "repeat": args.repeat,
+        },
+        "scales": {},
+    }
+    for scale in args.scales:
+        path = os.path.join(args.data_dir, f"hr_{scale}.db")
+        print(f"{scale} karyawan ({path})")
+        prepare_database(path, scale, args.attendance_fraction)
+        # Work on a copy so the write interactions do not drift the dataset
+        work = path + ".run"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(work + suffix):
+                os.remove(work + suffix)
+        source, target = sqlite3.connect(path), sqlite3.connect(work)
+        source.backup(target)
+        source.close()
+        target.close()
+
+        config.DB_PATH = work
+        database.set_connection_factory(CountingConnection)
+        try:
+            results["scales"][str(scale)] = run_scale(work, args.timeout, max(1, args.repeat))
+        finally:
+            database.set_connection_factory()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"hasil ditulis ke {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        return 1 if compare(results, baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+# cache.py
+"""Process-wide read-through cache for query results
+
+Entries are keyed by (scope, key) and remember the write versions of the
+tables they were read from. A lookup whose table versions moved on since the
+entry was stored counts as a miss and reloads, so any write through
+``ConnectionManager.writer(*tables)`` invalidates exactly the results that
+depend on those tables. The cache is bounded by an estimate of the memory
+held by its values and evicts least recently used entries first.
+
+Scopes keep sessions apart: an employee's lookups use ("employee", id), a
+manager's use ("department", id), so a result loaded for one of them is
+never served under another scope even if the cache key happens to match.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import config
+from database import get_db
+
+GLOBAL_SCOPE = ("global",)
+
+
+def _sizeof(value):
+    """Rough memory footprint of a cached value in bytes"""
+    memory_usage = getattr(value, "memory_usage", None)
+    if memory_usage is not None:
+        try:
+            usage = memory_usage(deep=True)
+            return int(usage.sum() if hasattr(usage, "sum") else usage)
+        except TypeError:
+            pass
+    if isinstance(value, (list, tuple)):
+        sample = value[:100]
+        if not sample:
+            return sys.getsizeof(value)
+        per_item = sum(_sizeof(item) for item in sample) / len(sample)
+        return sys.getsizeof(value) + int(per_item * len(value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """Thread-safe LRU cache bounded by the estimated size of its values"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = {}
+        self._misses = {}
+        self._evictions = 0
+
+    def _count(self, counter, scope):
+        counter[scope[0]] = counter.get(scope[0], 0) + 1
+
+    def _drop(self, full_key):
+        _versions, _value, size = self._entries.pop(full_key)
+        self._bytes -= size
+
+    def get_or_load(self, key, tables, loader, scope=GLOBAL_SCOPE):
+        """Return the cached value for ``key`` or store ``loader()``"""
+        full_key = (scope, key)
+        versions = get_db().versions(*tables)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(full_key)
+                self._count(self._hits, scope)
+                return entry[1]
+            self._count(self._misses, scope)
+
+        value = loader()
+        size = _sizeof(value)
+        with self._lock:
+            if full_key in self._entries:
+                self._drop(full_key)
+            if size <= self.max_bytes:
+                self._entries[full_key] = (versions, value, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+                    self._evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and current memory use"""
+        with self._lock:
+            hits = sum(self._hits.values())
+            misses = sum(self._misses.values())
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "evictions": self._evictions,
+                "hits_by_scope": dict(self._hits),
+                "misses_by_scope": dict(self._misses),
+            }
+
+
+_cache = QueryCache(config.QUERY_CACHE_MAX_MB * 1024 * 1024)
+
+
+def get_cache():
+    """Return the process-wide query cache"""
+    return _cache
+
+
+def read_sql(conn, sql, params=(), tables=(), scope=GLOBAL_SCOPE):
+    """Cached ``pd.read_sql``; the returned DataFrame must not be modified"""
+    import pandas as pd
+
+    return _cache.get_or_load(("read_sql", sql, tuple(params)), tables,
+                              lambda: pd.read_sql(sql, conn, params=tuple(params)), scope)
+
+
+def query(conn, sql, params=(), tables=(), scope=GLOBAL_SCOPE):
+    """Cached ``conn.execute(...).fetchall()``"""
+    return _cache.get_or_load(("query", sql, tuple(params)), tables,
+                              lambda: conn.execute(sql, tuple(params)).fetchall(), scope)
@@ -0,0 +1,331 @@
+# checkin_server.py
+"""HTTP clock-in/clock-out service with group commit
+
+Runs as its own process next to the Streamlit app, on the same database:
+
+    POST /punch   {"nik": "...", "direction": "in"}       (or "employee_id")
+                  optional "timestamp" (ISO); defaults to the server clock
+    GET  /health  queue and flush statistics
+
+Each request is validated and folded into an in-memory batch keyed by
+(employee_id, tanggal), the same way ingest.py folds a punch file. One
+flusher thread writes the whole batch with a single ``executemany`` in one
+transaction. Punches that arrive while a batch is being written form the
+next one, so batches grow with the load and a burst of thousands of punches
+costs a handful of commits instead of one each. ``HR_CHECKIN_FLUSH_MS``
+can hold each batch open a little longer to make it bigger.
+
+A request is answered once the batch holding its punch has committed, so
+an acknowledged punch is on disk. If the commit is not done within
+``HR_CHECKIN_ACK_TIMEOUT_MS`` the answer is 202 (accepted, still queued).
+
+A repeated tap in the same direction within ``HR_CHECKIN_DEBOUNCE_SECONDS``
+is answered as a duplicate without being queued. Taps from a batch that
+failed to commit do not count, so the retry after a 503 is written. Replays that slip through
+are harmless anyway, since the upsert keeps the earliest in and latest out.
+The app notices the new rows through its external-write check.
+
+Punches for an archived year (archive.py), or the one being archived, are
+refused with 400. A year archived while a batch was open is dropped from
+the batch, and only its own punches get the 400; the rest still commit.
+
+Usage: python checkin_server.py [--host 0.0.0.0] [--port 8502]
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import archive
+import config
+import ingest
+from database import get_db
+
+MAX_BODY_BYTES = 4096
+# Employees unknown at startup are looked up again at most this often
+EMPLOYEE_REFRESH_SECONDS = 30
+
+logger = logging.getLogger(__name__)
+
+
+class PunchQueue:
+    """Fold punches in memory and write them in group-committed batches"""
+
+    def __init__(self, batch_size=None, flush_ms=None, debounce_seconds=None):
+        self.batch_size = batch_size or config.CHECKIN_BATCH_SIZE
+        self.flush_interval = (config.CHECKIN_FLUSH_MS if flush_ms is None else flush_ms) / 1000
+        self.debounce = config.CHECKIN_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self._lock = threading.Lock()
+        # Wakes the flusher / wakes requests waiting for their commit
+        self._work = threading.Condition(self._lock)
+        self._done = threading.Condition(self._lock)
+        self._days = {}
+        self._pending = 0
+        # Batches are numbered; a punch waits until its batch is committed
+        self._batch = 0
+        self._committed = 0
+        # batch -> error, for the last few failed batches
+        self._failed = {}
+        # (employee_id, direction) -> monotonic time of the last accepted tap
+        self._last_tap = {}
+        # The taps of the open batch, forgotten again if it fails to commit
+        self._taps = {}
+        # batch -> {(employee_id, tanggal)} dropped for a closed year
+        self._rejected = {}
+        # Years that can no longer be written, refreshed by every flush
+        self.closed = set()
+        self._stopped = False
+        self._thread = None
+        self.stats = {"accepted": 0, "duplicates": 0, "batches": 0, "rows": 0,
+                      "last_batch_ms": 0.0, "errors": 0}
+
+    def start(self):
+        with get_db().reader() as conn:
+            self.closed = archive.closed_years(conn)
+        self._thread = threading.Thread(target=self._loop, name="hr-checkin-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Flush what is queued and stop the flusher"""
+        with self._lock:
+            self._stopped = True
+            self._work.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def snapshot(self):
+        """Return the statistics plus the number of queued punches"""
+        with self._lock:
+            return dict(self.stats, queued=self._pending)
+
+    def put(self, employee_id, tanggal, clock, direction, now=None):
+        """Queue a punch; returns its batch number, or None for a duplicate tap"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last = self._last_tap.get((employee_id, direction))
+            if last is not None and now - last < self.debounce:
+                self.stats["duplicates"] += 1
+                return None
+            self._last_tap[(employee_id, direction)] = self._taps[(employee_id, direction)] = now
+            ingest.fold(self._days, employee_id, tanggal, clock, direction)
+            self._pending += 1
+            self.stats["accepted"] += 1
+            if self._pending == 1 or self._pending >= self.batch_size:
+                self._work.notify()
+            return self._batch
+
+    def wait(self, batch, timeout, punch=None):
+        """Wait for ``batch`` to commit; True once it has, False on timeout
+
+        Raises RuntimeError if writing the batch failed, and ValueError if
+        ``punch`` (employee_id, tanggal) was dropped for a closed year.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._committed <= batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._done.wait(remaining)
+            if batch in self._failed:
+                raise RuntimeError(self._failed[batch])
+            if punch in self._rejected.get(batch, ()):
+                raise ValueError(f"tahun {punch[1][:4]} sudah diarsipkan")
+            return True
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._stopped:
+                    self._work.wait()
+                if not self._pending:
+                    return
+                # Let more punches join for one flush interval, or less when
+                # the batch fills up
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopped and self._pending < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._work.wait(remaining)
+                days, taps, batch = self._days, self._taps, self._batch
+                self._days, self._taps, self._pending = {}, {}, 0
+                self._batch += 1
+                self._prune_taps()
+            self._flush(days, taps, batch)
+
+    def _flush(self, days, taps, batch):
+        started = time.perf_counter()
+        error = None
+        rejected = set()
+        try:
+            with get_db().writer("daily_attendances") as conn:
+                # A year archived while the batch was open would abort it
+                closed = archive.closed_years(conn)
+                rejected = {key for key in days if int(key[1][:4]) in closed}
+                for key in rejected:
+                    del days[key]
+                conn.executemany(ingest.UPSERT_SQL, [(emp, day, first_in, last_out)
+                                                     for (emp, day), (first_in, last_out) in days.items()])
+        except Exception as e:
+            logger.exception("Batch presensi %s gagal ditulis", batch)
+            error = f"{type(e).__name__}: {e}"
+        with self._lock:
+            self._committed = batch + 1
+            self._failed.pop(batch - 100, None)
+            self._rejected.pop(batch - 100, None)
+            if rejected:
+                self._rejected[batch] = rejected
+            if error is None:
+                self.closed = closed
+                self.stats["batches"] += 1
+                self.stats["rows"] += len(days)
+                self.stats["last_batch_ms"] = (time.perf_counter() - started) * 1000
+            else:
+                self._failed[batch] = error
+                self.stats["errors"] += 1
+                # The client retries a failed punch; do not debounce the retry
+                for key, at in taps.items():
+                    if self._last_tap.get(key) == at:
+                        del self._last_tap[key]
+            self._done.notify_all()
+
+    def _prune_taps(self):
+        if len(self._last_tap) > 10 * self.batch_size:
+            cutoff = time.monotonic() - self.debounce
+            self._last_tap = {key: at for key, at in self._last_tap.items() if at >= cutoff}
+
+
+class Employees:
+    """NIK -> id lookup, reloaded when an unknown employee shows up"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self.by_nik, self.ids = {}, set()
+        self.reload()
+
+    def reload(self):
+        with get_db().reader() as conn:
+            by_nik = dict(conn.execute("SELECT nik, id FROM employees"))
+        with self._lock:
+            self.by_nik, self.ids = by_nik, set(by_nik.values())
+            self._loaded_at = time.monotonic()
+
+    def maybe_reload(self):
+        """Reload once per EMPLOYEE_REFRESH_SECONDS; True if it did"""
+        with self._lock:
+            # Claim the reload so concurrent requests do not all run it
+            if time.monotonic() - self._loaded_at < EMPLOYEE_REFRESH_SECONDS:
+                return False
+            self._loaded_at = time.monotonic()
+        self.reload()
+        return True
+
+    def resolve(self, record, closed=()):
+        """Return (employee_id, tanggal, time, direction) or raise ValueError
+
+        ``closed`` holds the years that can no longer be written.
+        """
+        record = dict(record)
+        record.setdefault("timestamp", datetime.now().isoformat(timespec="seconds"))
+        try:
+            punch = ingest.parse_punch(record, self.by_nik)
+        except ValueError:
+            if not self.maybe_reload():
+                raise
+            punch = ingest.parse_punch(record, self.by_nik)
+        if punch[0] not in self.ids and not (self.maybe_reload() and punch[0] in self.ids):
+            raise ValueError(f"employee_id {punch[0]} tidak dikenal")
+        if int(punch[1][:4]) in closed:
+            raise ValueError(f"tahun {punch[1][:4]} sudah diarsipkan")
+        return punch
+
+
+class CheckinHandler(BaseHTTPRequestHandler):
+    # Keep-alive lets a terminal reuse its connection between taps
+    protocol_version = "HTTP/1.1"
+    server_version = "HRCheckin/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._reply(404, {"error": "not found"})
+        self._reply(200, self.server.queue.snapshot())
+
+    def do_POST(self):
+        if self.path != "/punch":
+            return self._reply(404, {"error": "not found"})
+        queue = self.server.queue
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_BYTES:
+            return self._reply(400, {"error": "body JSON wajib diisi"})
+        try:
+            record = json.loads(self.rfile.read(length))
+            employee_id, tanggal, clock, direction = self.server.employees.resolve(record, queue.closed)
+        except (KeyError, TypeError, ValueError) as e:
+            return self._reply(400, {"error": str(e) or type(e).__name__})
+
+        batch = queue.put(employee_id, tanggal, clock, direction)
+        punch = {"employee_id": employee_id, "tanggal": tanggal, "jam": clock, "direction": direction}
+        if batch is None:
+            return self._reply(200, dict(punch, status="duplicate"))
+        try:
+            committed = queue.wait(batch, config.CHECKIN_ACK_TIMEOUT_MS / 1000, (employee_id, tanggal))
+        except ValueError as e:
+            return self._reply(400, dict(punch, status="error", error=str(e)))
+        except RuntimeError as e:
+            return self._reply(503, dict(punch, status="error", error=str(e)))
+        self._reply(200 if committed else 202, dict(punch, status="ok" if committed else "queued"))
+
+
+class CheckinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for the 08:00 burst of connections
+    request_queue_size = 1024
+
+    def __init__(self, address, queue=None):
+        self.queue = queue or PunchQueue()
+        self.employees = Employees()
+        super().__init__(address, CheckinHandler)
+
+    def serve_forever(self, poll_interval=0.5):
+        self.queue.start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self.queue.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import bootstrap
+
+    parser = argparse.ArgumentParser(description="Layanan HTTP presensi masuk/pulang")
+    parser.add_argument("--host", default=config.CHECKIN_HOST)
+    parser.add_argument("--port", type=int, default=config.CHECKIN_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    bootstrap(seed=False)
+    server = CheckinServer((args.host, args.port))
+    logger.info("Check-in server di http://%s:%s", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,90 @@
+# config.py
+"""Runtime settings, overridable through environment variables"""
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Database
+DB_PATH = os.environ.get("HR_DB_PATH", "hr_system.db")
+DB_READER_POOL_SIZE = _env_int("HR_DB_READER_POOL_SIZE", 8)
+DB_BUSY_TIMEOUT_MS = _env_int("HR_DB_BUSY_TIMEOUT_MS", 5000)
+DB_CACHE_SIZE_KB = _env_int("HR_DB_CACHE_SIZE_KB", 32768)
+DB_MMAP_SIZE = _env_int("HR_DB_MMAP_SIZE", 256 * 1024 * 1024)
+# Seconds between checks for writes made by other processes
+DB_EXTERNAL_CHECK_INTERVAL = _env_int("HR_DB_EXTERNAL_CHECK_INTERVAL", 1)
+# Parallel dashboard queries (fanout.py): threads shared by all sessions,
+# each with its own reader connection outside DB_READER_POOL_SIZE, and the
+# time limit of one batch
+FANOUT_WORKERS = _env_int("HR_FANOUT_WORKERS", 4)
+FANOUT_TIMEOUT_MS = _env_int("HR_FANOUT_TIMEOUT_MS", 10000)
+# Interactive writes (writequeue.py): commands sent within the coalesce
+# window share one transaction; a sender waits at most WRITE_TIMEOUT_MS
+WRITE_COALESCE_MS = _env_int("HR_WRITE_COALESCE_MS", 5)
+WRITE_MAX_BATCH = _env_int("HR_WRITE_MAX_BATCH", 200)
+WRITE_TIMEOUT_MS = _env_int("HR_WRITE_TIMEOUT_MS", 15000)
+
+# Query tracing (tracing.py), opt-in since it wraps every connection;
+# statements slower than the threshold are logged
+DB_TRACE = _env_bool("HR_DB_TRACE")
+TRACE_SLOW_QUERY_MS = _env_int("HR_TRACE_SLOW_QUERY_MS", 100)
+TRACE_SLOW_LOG_SIZE = _env_int("HR_TRACE_SLOW_LOG_SIZE", 200)
+
+# Section timing (profiling.py), also switchable by admins at runtime
+PROFILE_ENABLED = _env_bool("HR_PROFILE")
+PROFILE_DIR = os.environ.get("HR_PROFILE_DIR", "profiles")
+
+# Background jobs (jobs.py); intervals in seconds, 0 disables a job
+JOBS_ENABLED = _env_bool("HR_JOBS", True)
+JOB_CONTRACT_EXPIRY_INTERVAL = _env_int("HR_JOB_CONTRACT_EXPIRY_INTERVAL", 3600)
+JOB_RECONCILE_INTERVAL = _env_int("HR_JOB_RECONCILE_INTERVAL", 0)
+CONTRACT_EXPIRY_WARNING_DAYS = _env_int("HR_CONTRACT_EXPIRY_WARNING_DAYS", 30)
+JOB_SNAPSHOT_INTERVAL = _env_int("HR_JOB_SNAPSHOT_INTERVAL", 6 * 3600)
+JOB_ARCHIVE_INTERVAL = _env_int("HR_JOB_ARCHIVE_INTERVAL", 0)
+
+# Check-in service (checkin_server.py): punches are written in one
+# transaction per batch; CHECKIN_FLUSH_MS delays each batch to let it grow
+CHECKIN_HOST = os.environ.get("HR_CHECKIN_HOST", "127.0.0.1")
+CHECKIN_PORT = _env_int("HR_CHECKIN_PORT", 8502)
+CHECKIN_BATCH_SIZE = _env_int("HR_CHECKIN_BATCH_SIZE", 2000)
+CHECKIN_FLUSH_MS = _env_int("HR_CHECKIN_FLUSH_MS", 0)
+CHECKIN_ACK_TIMEOUT_MS = _env_int("HR_CHECKIN_ACK_TIMEOUT_MS", 2000)
+CHECKIN_DEBOUNCE_SECONDS = _env_int("HR_CHECKIN_DEBOUNCE_SECONDS", 60)
+
+# Directory for files written by the export panel (export.py). Streamlit
+# holds a download in memory, so bigger files are only left on disk
+EXPORT_DIR = os.environ.get("HR_EXPORT_DIR", "exports")
+EXPORT_DOWNLOAD_MAX_MB = _env_int("HR_EXPORT_DOWNLOAD_MAX_MB", 100)
+
+# Directory for the columnar analytics snapshots (snapshot.py)
+SNAPSHOT_DIR = os.environ.get("HR_SNAPSHOT_DIR", "snapshots")
+
+# Yearly attendance archives (archive.py): the hot table keeps the last
+# ARCHIVE_KEEP_YEARS years; archive files are attached read-only by default
+ARCHIVE_DIR = os.environ.get("HR_ARCHIVE_DIR", "archive")
+ARCHIVE_KEEP_YEARS = _env_int("HR_ARCHIVE_KEEP_YEARS", 2)
+ARCHIVE_READONLY = _env_bool("HR_ARCHIVE_READONLY", True)
+
+# Shared query result cache
+QUERY_CACHE_MAX_MB = _env_int("HR_QUERY_CACHE_MAX_MB", 128)
+
+# Annual leave entitlement in working days, and the working week as a
+# Monday-first mask for np.busday_count (leave_balance.py)
+ANNUAL_LEAVE_DAYS = _env_int("HR_ANNUAL_LEAVE_DAYS", 12)
+LEAVE_WEEKMASK = os.environ.get("HR_LEAVE_WEEKMASK", "1111100")
+
+# Clock-in time after which an attendance counts as late (rollups.py)
+ATTENDANCE_LATE_AFTER = os.environ.get("HR_ATTENDANCE_LATE_AFTER", "08:00:00")
+
+# Seed the demo accounts and sample data into an empty database
+SEED_DEMO_DATA = _env_bool("HR_SEED_DEMO_DATA")
@@ -0,0 +1,269 @@
+# database.py
+"""Shared SQLite connection manager (pooled readers + one writer, WAL mode)"""
+import atexit
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import archive
+import config
+import schema
+
+
+_generations = itertools.count()
+
+
+class PoolTimeout(Exception):
+    """Raised when no reader connection becomes available in time"""
+
+
+class _Pool:
+    """Idle reader connections, and how many may be opened in total"""
+
+    def __init__(self, size):
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+
+
+class ConnectionManager:
+    """Hand out pooled reader connections and a single serialised writer"""
+
+    def __init__(self, path, pool_size=config.DB_READER_POOL_SIZE, factory=sqlite3.Connection):
+        self.path = path
+        self.pool_size = pool_size
+        # sqlite3.Connection subclass used for every connection (instrumentation)
+        self.factory = factory
+        self._pool = _Pool(pool_size)
+        # Separate budget for fanout.py, whose tasks run while the page that
+        # started them still holds a reader; one connection per fan-out thread
+        self._fanout_pool = _Pool(config.FANOUT_WORKERS)
+        self._lock = threading.Lock()
+        self._writer_lock = threading.RLock()
+        self._all = []
+        self._closed = False
+        # table name -> number of committed writes in this process
+        self._versions = {}
+        # Bumped when another process commits, which invalidates every table
+        self._epoch = 0
+        self._generation = next(_generations)
+        self._checked_at = 0.0
+        # Bumped when the archived attendance years change; each connection
+        # remembers the layout it last attached (archive.py)
+        self._layout = 0
+        self._attached = {}
+        self._archives = None
+        # The writer is opened first so WAL mode is set before any reader exists
+        self._writer = self._connect()
+        # Baseline, so a commit by another process before the first check counts
+        self._data_version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+
+    def _connect(self, readonly=False):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=self.factory,
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{config.DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {config.DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA busy_timeout = {config.DB_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        self._attach(conn)
+        if readonly:
+            conn.execute("PRAGMA query_only = 1")
+        self._all.append(conn)
+        return conn
+
+    def _attach(self, conn):
+        layout = self._layout
+        self._archives = archive.attach(conn)
+        self._attached[conn] = layout
+
+    def refresh_archives(self):
+        """Reattach the archived attendance years on every connection
+
+        Connections pick up the change the next time they are handed out.
+        Cached results are dropped as well.
+        """
+        with self._lock:
+            self._layout += 1
+            self._epoch += 1
+
+    def _acquire(self, pool, timeout):
+        try:
+            return pool.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if pool.created < pool.size:
+                pool.created += 1
+                try:
+                    return self._connect(readonly=True)
+                except Exception:
+                    pool.created -= 1
+                    raise
+        try:
+            return pool.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"No reader connection available after {timeout}s")
+
+    @contextmanager
+    def reader(self, timeout=30, fanout=False):
+        """Borrow a read-only connection from the pool
+
+        ``fanout`` borrows from the fan-out pool instead (fanout.py).
+        """
+        pool = self._fanout_pool if fanout else self._pool
+        conn = self._acquire(pool, timeout)
+        try:
+            if self._attached.get(conn) != self._layout:
+                self._attach(conn)
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            pool.idle.put(conn)
+
+    @contextmanager
+    def writer(self, *tables):
+        """Run a block on the writer connection inside one transaction
+
+        ``tables`` names the tables the block modifies; their versions are
+        bumped once the transaction commits so memoised reads are refreshed.
+        """
+        with self._writer_lock:
+            if self._attached.get(self._writer) != self._layout and not self._writer.in_transaction:
+                self._attach(self._writer)
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.rollback()
+                raise
+            else:
+                self._writer.commit()
+                self._bump(tables)
+
+    def _bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def versions(self, *tables):
+        """Return the current write versions of ``tables``"""
+        self._check_external_writes()
+        return (self._generation, self._epoch) + tuple(self._versions.get(table, 0) for table in tables)
+
+    def _check_external_writes(self):
+        """Notice commits made by other processes (ingestion jobs, scripts)
+
+        PRAGMA data_version on the writer only changes when a connection
+        other than the writer itself commits. The check is rate limited and
+        skipped while a write is in progress, so reads never wait on writes.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < config.DB_EXTERNAL_CHECK_INTERVAL:
+            return
+        if not self._writer_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            data_version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+            if self._data_version is not None and data_version != self._data_version:
+                with self._lock:
+                    self._epoch += 1
+                if archive.archived(self._writer) != self._archives:
+                    self.refresh_archives()
+            self._data_version = data_version
+        finally:
+            self._writer_lock.release()
+
+    def close(self):
+        """Close every connection opened by this manager"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all.clear()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+# None means the default: traced connections when HR_DB_TRACE is on
+_factory = None
+_bootstrapped = False
+_bootstrap_lock = threading.Lock()
+
+
+def get_db():
+    """Return the process-wide connection manager, creating it once"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager(config.DB_PATH, factory=_factory or _default_factory())
+    return _manager
+
+
+def close_db():
+    """Close the process-wide connection manager"""
+    global _manager, _bootstrapped
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+            _manager = None
+        _bootstrapped = False
+
+
+def _default_factory():
+    if config.DB_TRACE:
+        import tracing
+
+        return tracing.TracedConnection
+    return sqlite3.Connection
+
+
+def set_connection_factory(factory=None):
+    """Open future connections with ``factory`` (a sqlite3.Connection subclass)
+
+    The current manager is closed so the next ``get_db()`` uses the new
+    factory; ``None`` restores the default. Meant for benchmarks and
+    diagnostics, not for request handling.
+    """
+    global _factory
+    close_db()
+    _factory = factory
+
+
+def bootstrap(seed=None):
+    """Create and migrate the schema once per process
+
+    Demo data is only seeded when ``seed`` is true, or when it is left as
+    None and HR_SEED_DEMO_DATA is enabled.
+    """
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _bootstrap_lock:
+        if _bootstrapped:
+            return
+        if seed is None:
+            seed = config.SEED_DEMO_DATA
+        with get_db().writer() as conn:
+            schema.init_database(conn)
+            if seed:
+                schema.create_dummy_data(conn)
+        _bootstrapped = True
+
+
+atexit.register(close_db)
@@ -0,0 +1,227 @@
+# datagen.py
+"""Synthetic data generator for load and capacity testing
+
+Builds departments, employees with user accounts, contracts, leave
+submissions and daily attendance as NumPy column arrays and bulk inserts
+them with ``executemany`` in a single transaction. The output depends only
+on the parameters, the seed and the end date.
+
+Secondary indexes and triggers on the generated tables are dropped for the
+load and recreated afterwards, then the dashboard counters, attendance
+rollups and employee search index are rebuilt.
+
+Usage: python datagen.py --employees 100000 --years 3 [--attendance-fraction 0.1]
+"""
+import itertools
+import time
+from datetime import date
+
+import numpy as np
+
+import rollups
+import search
+import stats
+from auth import hash_password
+
+TABLES = ("departments", "users", "employees", "contracts", "leave_submissions", "daily_attendances")
+ATTENDANCE_BLOCK = 2000
+
+JENIS_CUTI = np.array(["Cuti Tahunan", "Cuti Sakit", "Cuti Melahirkan", "Cuti Lainnya"])
+AGAMA = np.array(["Islam", "Kristen", "Katolik", "Hindu", "Buddha"])
+
+
+def _dates(days):
+    """datetime64[D] array -> array of 'YYYY-MM-DD' strings"""
+    return np.datetime_as_string(days, unit="D")
+
+
+def _rows(*columns):
+    """Zip column arrays/lists/scalars into row tuples for executemany"""
+    return zip(*(c.tolist() if isinstance(c, np.ndarray) else
+                 c if isinstance(c, list) else itertools.repeat(c) for c in columns))
+
+
+def _clock(start_minute, minutes):
+    """Lookup table of 'HH:MM:SS' strings for minute offsets"""
+    return np.array([f"{(start_minute + m) // 60:02d}:{(start_minute + m) % 60:02d}:00"
+                     for m in range(minutes)])
+
+
+def generate(conn, departments=10, employees=1000, years=1.0, leave_rate=2.0,
+             contract_churn=0.3, attendance_fraction=1.0, seed=0, end_date=None):
+    """Fill an empty database with synthetic data
+
+    ``leave_rate`` is leave submissions per employee per year,
+    ``contract_churn`` the share of employees on yearly renewed fixed-term
+    (PKWT) contracts, ``attendance_fraction`` the share of active employees
+    that get a daily attendance history. Nothing is committed here; the
+    caller's transaction covers the whole load. Returns row counts per table.
+    """
+    if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]:
+        raise ValueError("Generator membutuhkan database kosong")
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    end = np.datetime64(end_date or date.today(), "D")
+    start = end - int(round(365 * years))
+    counts = {}
+
+    deferred = conn.execute(f"""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+          AND tbl_name IN ({', '.join('?' * len(TABLES))})
+    """, TABLES).fetchall()
+    for kind, name, _sql in deferred:
+        conn.execute(f"DROP {kind.upper()} {name}")
+
+    # Departments
+    dept_ids = np.arange(1, departments + 1)
+    # created_at is always set explicitly so the output is reproducible
+    conn.executemany("INSERT INTO departments (id, kode_department, nama_department, created_at) VALUES (?, ?, ?, ?)",
+                     _rows(dept_ids, [f"DEPT{d:03d}" for d in dept_ids], [f"Department {d}" for d in dept_ids],
+                           str(start)))
+    counts["departments"] = departments
+
+    # Employees and their accounts: user id 1 is the admin, employee i has
+    # user id i + 1. Users go in first because employees.user_id refers to them.
+    emp_ids = np.arange(1, employees + 1)
+    emp_dept = rng.integers(1, departments + 1, employees)
+    masuk = end - rng.integers(30, 365 * (int(years) + 5), employees)
+    lahir = masuk - rng.integers(20 * 365, 45 * 365, employees)
+    status_kerja = np.where(rng.random(employees) < 0.95, "aktif",
+                            np.where(rng.random(employees) < 0.5, "resign", "tidak aktif"))
+    niks = [f"NIK{i:06d}" for i in emp_ids]
+    emails = [f"emp{i}@company.com" for i in emp_ids]
+    # The first employee of every department is its manager
+    _, first = np.unique(emp_dept, return_index=True)
+    managers = np.zeros(departments + 1, dtype=np.int64)
+    managers[emp_dept[first]] = emp_ids[first]
+    roles = np.full(employees, "employee", dtype=object)
+    roles[first] = "manager"
+    passwords = {"employee": hash_password("employee123"), "manager": hash_password("manager123")}
+    conn.execute("INSERT INTO users (id, username, password, email, role, created_at) VALUES (1, ?, ?, ?, 'admin', ?)",
+                 ("admin", hash_password("admin123"), "admin@hrsystem.com", str(start)))
+    conn.executemany("""
+        INSERT INTO users (id, username, password, email, role, employee_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, _rows(emp_ids + 1, [f"emp{i:06d}" for i in emp_ids],
+               [passwords[r] for r in roles.tolist()], emails, roles, emp_ids, _dates(masuk)))
+    counts["users"] = employees + 1
+
+    conn.executemany("""
+        INSERT INTO employees (
+            id, nama_lengkap, nik, tempat_lahir, tanggal_lahir, jenis_kelamin, alamat, telepon,
+            email, status_pernikahan, agama, jabatan, department_id, status_kerja, tanggal_masuk, user_id
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, _rows(emp_ids, [f"Karyawan {i}" for i in emp_ids], niks, "Jakarta", _dates(lahir),
+               np.where(rng.random(employees) < 0.5, "Laki-laki", "Perempuan"),
+               [f"Jl. Contoh No.{i}" for i in emp_ids], [f"08{i:010d}" for i in emp_ids], emails,
+               np.where(rng.random(employees) < 0.6, "Menikah", "Belum Menikah"),
+               AGAMA[rng.integers(0, len(AGAMA), employees)],
+               [f"Staff Department {d}" for d in emp_dept.tolist()],
+               emp_dept, status_kerja, _dates(masuk), emp_ids + 1))
+    counts["employees"] = employees
+
+    # Contracts: permanent staff get one PKWTT contract, the rest a chain of
+    # one-year PKWT contracts from their first day, the last one still active
+    fixed_term = rng.random(employees) < contract_churn
+    span = (end - masuk).astype(np.int64)
+    n_contracts = np.where(fixed_term, span // 365 + 1, 1)
+    owner = np.repeat(np.arange(employees), n_contracts)
+    seq = np.arange(len(owner)) - np.repeat(np.cumsum(n_contracts) - n_contracts, n_contracts)
+    c_start = masuk[owner] + seq * 365
+    c_end = np.where(fixed_term[owner], c_start + 364, c_start + 365 * 30)
+    last = seq == n_contracts[owner] - 1
+    conn.executemany("""
+        INSERT INTO contracts (employee_id, tanggal_mulai, tanggal_berakhir, jenis_kontrak, status_kontrak, created_at)
+        VALUES (?1, ?2, ?3, ?4, ?5, ?2)
+    """, _rows(emp_ids[owner], _dates(c_start), _dates(c_end),
+               np.where(fixed_term[owner], "PKWT", "PKWTT"),
+               np.where(last & (status_kerja[owner] == "aktif"), "aktif", "berakhir")))
+    counts["contracts"] = len(owner)
+
+    # Leave submissions spread over the window plus the coming month
+    n_leaves = rng.poisson(leave_rate * years, employees)
+    owner = np.repeat(np.arange(employees), n_leaves)
+    total = len(owner)
+    l_start = start + rng.integers(0, (end - start).astype(np.int64) + 30, total)
+    l_end = l_start + rng.integers(0, 5, total)
+    created = l_start - rng.integers(1, 15, total)
+    created_at = np.char.add(_dates(created), np.char.add(" ", _clock(8 * 60, 9 * 60)[rng.integers(0, 9 * 60, total)]))
+    decided = (created < end - 3) & (rng.random(total) < 0.95)
+    status = np.where(decided, np.where(rng.random(total) < 0.9, "approved", "rejected"), "pending")
+    approver = managers[emp_dept[owner]]
+    approved_date = _dates(created + rng.integers(1, 4, total))
+    conn.executemany("""
+        INSERT INTO leave_submissions (
+            employee_id, tanggal_mulai, tanggal_selesai, jenis_cuti, alasan, status,
+            approved_by, approved_date, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, _rows(emp_ids[owner], _dates(l_start), _dates(l_end),
+               JENIS_CUTI[rng.choice(len(JENIS_CUTI), total, p=[0.7, 0.2, 0.02, 0.08])], "Keperluan pribadi",
+               status, [a if d else None for a, d in zip(approver.tolist(), decided.tolist())],
+               [a if d else None for a, d in zip(approved_date.tolist(), decided.tolist())], created_at))
+    counts["leave_submissions"] = total
+
+    # Attendance on working days for a sample of active employees, in blocks
+    # so the expanded (employee x day) arrays stay small
+    days = np.arange(start, end + 1)
+    days = days[np.is_busday(days)]
+    day_strings = _dates(days)
+    clock_in, clock_out = _clock(7 * 60, 120), _clock(17 * 60, 120)
+    sample = np.flatnonzero((status_kerja == "aktif") & (rng.random(employees) < attendance_fraction))
+    counts["daily_attendances"] = 0
+    for block in np.array_split(sample, max(1, len(sample) // ATTENDANCE_BLOCK)):
+        who = np.repeat(block, len(days))
+        day = np.tile(np.arange(len(days)), len(block))
+        present = (days[day] >= masuk[who]) & (rng.random(len(who)) < 0.95)
+        who, day = who[present], day[present]
+        n = len(who)
+        conn.executemany("""
+            INSERT INTO daily_attendances (employee_id, tanggal, jam_masuk, jam_pulang, status, created_at)
+            VALUES (?1, ?2, ?3, ?4, 'hadir', ?2 || ' ' || ?4)
+        """, _rows(emp_ids[who], day_strings[day],
+                   clock_in[np.clip(rng.normal(55, 15, n), 0, 119).astype(np.int64)],
+                   clock_out[rng.integers(0, 120, n)]))
+        counts["daily_attendances"] += n
+
+    for _kind, _name, sql in deferred:
+        conn.execute(sql)
+    stats.rebuild_stats(conn)
+    rollups.rebuild_rollups(conn)
+    search.rebuild_index(conn)
+    # Sampled statistics are plenty for the planner and much faster on big tables
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA analysis_limit = 0")
+    counts["seconds"] = time.perf_counter() - started
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import bootstrap, get_db
+
+    parser = argparse.ArgumentParser(description="Buat data sintetis untuk uji beban")
+    parser.add_argument("--departments", type=int, default=10)
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--leave-rate", type=float, default=2.0, help="pengajuan cuti per karyawan per tahun")
+    parser.add_argument("--contract-churn", type=float, default=0.3, help="porsi karyawan dengan kontrak PKWT tahunan")
+    parser.add_argument("--attendance-fraction", type=float, default=1.0,
+                        help="porsi karyawan aktif yang mendapat riwayat absensi")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    bootstrap(seed=False)
+    with get_db().writer(*TABLES, "dashboard_stats", *rollups.TABLES, search.TABLE) as conn:
+        counts = generate(conn, args.departments, args.employees, args.years, args.leave_rate,
+                          args.contract_churn, args.attendance_fraction, args.seed, args.end_date)
+    seconds = counts.pop("seconds")
+    for table, count in counts.items():
+        print(f"{table:>20}: {count}")
+    print(f"selesai dalam {seconds:.1f} detik")
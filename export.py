@@ -0,0 +1,246 @@
+# export.py
+"""Chunked streaming export of large tables to CSV, XLSX and Parquet
+
+Rows are fetched with ``fetchmany(chunksize)`` and written out chunk by
+chunk, so memory depends on the chunk size and not on the row count. Each
+source is ordered by something an index or the rowid already provides,
+which keeps SQLite from building a temporary sort of the whole result.
+
+Attendance is read partition by partition, oldest archived year first
+(archive.py). Each partition follows its own tanggal index, so the output
+stays in date order without sorting the UNION of all years.
+
+XLSX is written with openpyxl's write-only mode and spills to extra sheets
+past Excel's row limit. Parquet needs ``pyarrow`` and writes one row group
+per chunk.
+
+Usage: python export.py daily_attendances absensi.parquet --from 2026-01-01 --to 2026-01-31
+"""
+import csv
+import io
+import itertools
+import time
+
+import archive
+
+DEFAULT_CHUNKSIZE = 50000
+FORMATS = ("csv", "xlsx", "parquet")
+XLSX_MAX_ROWS = 1048575
+
+
+class ExportSource:
+    """Describe a table (or join) that can be exported"""
+
+    def __init__(self, label, from_sql, columns, order_by, date_column=None,
+                 integer_columns=(), default_columns=None, department_column="e.department_id",
+                 partitioned=False):
+        self.label = label
+        # ``{table}`` is replaced by each attendance partition when partitioned
+        self.from_sql = from_sql
+        self.partitioned = partitioned
+        # label -> SQL expression
+        self.columns = columns
+        # must follow an index or the rowid so no temporary sort is needed
+        self.order_by = order_by
+        # filtered by the date range, if any
+        self.date_column = date_column
+        # typed as int64 in Parquet; every other column is a string
+        self.integer_columns = set(integer_columns)
+        self.default_columns = default_columns or list(columns)
+        self.department_column = department_column
+
+
+_DEPARTMENT_JOIN = "LEFT JOIN departments d ON e.department_id = d.id"
+
+SOURCES = {
+    "employees": ExportSource(
+        "Karyawan",
+        from_sql=f"employees e {_DEPARTMENT_JOIN}",
+        columns={
+            "id": "e.id", "nik": "e.nik", "nama_lengkap": "e.nama_lengkap",
+            "tempat_lahir": "e.tempat_lahir", "tanggal_lahir": "e.tanggal_lahir",
+            "jenis_kelamin": "e.jenis_kelamin", "alamat": "e.alamat", "telepon": "e.telepon",
+            "email": "e.email", "status_pernikahan": "e.status_pernikahan", "agama": "e.agama",
+            "jabatan": "e.jabatan", "department_id": "e.department_id",
+            "kode_department": "d.kode_department", "nama_department": "d.nama_department",
+            "status_kerja": "e.status_kerja", "tanggal_masuk": "e.tanggal_masuk",
+        },
+        order_by="e.id",
+        date_column="e.tanggal_masuk",
+        integer_columns=("id", "department_id"),
+    ),
+    "leave_submissions": ExportSource(
+        "Pengajuan Cuti",
+        from_sql=f"leave_submissions l JOIN employees e ON l.employee_id = e.id {_DEPARTMENT_JOIN}",
+        columns={
+            "id": "l.id", "employee_id": "l.employee_id", "nik": "e.nik",
+            "nama_lengkap": "e.nama_lengkap", "nama_department": "d.nama_department",
+            "jenis_cuti": "l.jenis_cuti", "tanggal_mulai": "l.tanggal_mulai",
+            "tanggal_selesai": "l.tanggal_selesai", "alasan": "l.alasan", "status": "l.status",
+            "approved_by": "l.approved_by", "approved_date": "l.approved_date",
+            "created_at": "l.created_at",
+        },
+        order_by="l.id",
+        date_column="l.tanggal_mulai",
+        integer_columns=("id", "employee_id", "approved_by"),
+    ),
+    "daily_attendances": ExportSource(
+        "Absensi Harian",
+        from_sql=f"{{table}} a JOIN employees e ON a.employee_id = e.id {_DEPARTMENT_JOIN}",
+        columns={
+            "id": "a.id", "employee_id": "a.employee_id", "nik": "e.nik",
+            "nama_lengkap": "e.nama_lengkap", "nama_department": "d.nama_department",
+            "tanggal": "a.tanggal", "jam_masuk": "a.jam_masuk", "jam_pulang": "a.jam_pulang",
+            "status": "a.status", "keterangan": "a.keterangan",
+            "leave_submission_id": "a.leave_submission_id",
+        },
+        # idx_daily_attendances_tanggal holds the rowid, so this is index order
+        order_by="a.tanggal, a.id",
+        date_column="a.tanggal",
+        integer_columns=("id", "employee_id", "leave_submission_id"),
+        partitioned=True,
+    ),
+}
+
+
+def build_query(source, columns=None, start=None, end=None, dept_id=None, table=archive.SOURCE):
+    """Return (sql, params) selecting ``columns`` of ``source``, from partition ``table``"""
+    columns = columns or source.default_columns
+    unknown = [c for c in columns if c not in source.columns]
+    if unknown:
+        raise ValueError(f"Kolom tidak dikenal: {', '.join(unknown)}")
+    clauses, params = [], []
+    if start is not None:
+        clauses.append(f"{source.date_column} >= ?")
+        params.append(str(start))
+    if end is not None:
+        clauses.append(f"{source.date_column} <= ?")
+        params.append(str(end))
+    if dept_id is not None:
+        clauses.append(f"{source.department_column} = ?")
+        params.append(dept_id)
+    select = ", ".join(f"{source.columns[c]} AS \"{c}\"" for c in columns)
+    from_sql = source.from_sql.format(table=table) if source.partitioned else source.from_sql
+    sql = (f"SELECT {select} FROM {from_sql}"
+           + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+           + f" ORDER BY {source.order_by}")
+    return sql, params
+
+
+def _chunks(cursor, chunksize):
+    while True:
+        rows = cursor.fetchmany(chunksize)
+        if not rows:
+            return
+        yield rows
+
+
+def _write_csv(chunks, columns, fileobj):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    try:
+        writer = csv.writer(text)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+        text.flush()
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+
+def _write_xlsx(chunks, columns, fileobj, title):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("Export XLSX membutuhkan paket 'openpyxl'") from None
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet, sheet_rows, sheets = None, XLSX_MAX_ROWS, 0
+    for rows in chunks:
+        for row in rows:
+            if sheet_rows >= XLSX_MAX_ROWS:
+                sheets += 1
+                sheet = workbook.create_sheet(title[:28] if sheets == 1 else f"{title[:24]} ({sheets})")
+                sheet.append(columns)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet(title[:28]).append(columns)
+    workbook.save(fileobj)
+
+
+def _write_parquet(chunks, columns, fileobj, integer_columns):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Export Parquet membutuhkan paket 'pyarrow'") from None
+    schema = pa.schema([(c, pa.int64() if c in integer_columns else pa.string()) for c in columns])
+    with pq.ParquetWriter(fileobj, schema, compression="zstd") as writer:
+        for rows in chunks:
+            arrays = [pa.array([row[i] for row in rows], type=schema.field(i).type) if c in integer_columns
+                      else pa.array([None if row[i] is None else str(row[i]) for row in rows], type=pa.string())
+                      for i, c in enumerate(columns)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+
+def export(conn, name, fileobj, fmt, columns=None, start=None, end=None, dept_id=None,
+           chunksize=DEFAULT_CHUNKSIZE, progress=None):
+    """Stream source ``name`` into the binary file ``fileobj`` as ``fmt``
+
+    ``progress(rows)`` is called after every chunk. Returns {rows, seconds}.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format tidak didukung: {fmt}")
+    source = SOURCES[name]
+    columns = list(columns or source.default_columns)
+    tables = archive.partitions(conn, start, end) if source.partitioned else [None]
+    started = time.perf_counter()
+    counted = {"rows": 0}
+
+    def counting(chunks):
+        for rows in chunks:
+            yield rows
+            counted["rows"] += len(rows)
+            if progress:
+                progress(counted["rows"])
+
+    def partition_chunks(table):
+        sql, params = build_query(source, columns, start, end, dept_id, table)
+        return _chunks(conn.execute(sql, params), chunksize)
+
+    chunks = counting(itertools.chain.from_iterable(partition_chunks(table) for table in tables))
+    if fmt == "csv":
+        _write_csv(chunks, columns, fileobj)
+    elif fmt == "xlsx":
+        _write_xlsx(chunks, columns, fileobj, source.label)
+    else:
+        _write_parquet(chunks, columns, fileobj, source.integer_columns & set(columns))
+    return {"rows": counted["rows"], "seconds": time.perf_counter() - started}
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    from datetime import date
+
+    from database import bootstrap, get_db
+
+    parser = argparse.ArgumentParser(description="Export tabel besar ke CSV/XLSX/Parquet")
+    parser.add_argument("source", choices=list(SOURCES))
+    parser.add_argument("output", help="file tujuan; format dari ekstensi (.csv, .xlsx, .parquet)")
+    parser.add_argument("--columns", nargs="+", default=None)
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, default=None)
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, default=None)
+    parser.add_argument("--department", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    fmt = os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        parser.error(f"ekstensi harus salah satu dari: {', '.join(FORMATS)}")
+    bootstrap(seed=False)
+    with get_db().reader() as conn, open(args.output, "wb") as f:
+        report = export(conn, args.source, f, fmt, args.columns, args.start, args.end, args.department,
+                        args.chunksize, progress=lambda rows: print(f"\r{rows} baris", end="", flush=True))
+    print(f"\r{report['rows']} baris ditulis ke {args.output} dalam {report['seconds']:.1f} detik")
@@ -0,0 +1,111 @@
+# fanout.py
+"""Run independent read queries in parallel on pooled reader connections
+
+``gather`` hands each task to a small process-wide thread pool. Each task
+borrows its own connection from a reader pool kept for fan-out, one
+connection per thread, so tasks never wait behind the page readers that
+sessions hold while they render. The results are returned together. sqlite3 releases the GIL while a statement runs, so
+page latency drops from the sum of the queries to roughly the slowest one.
+
+A task that has not finished within the timeout is interrupted with
+``sqlite3.Connection.interrupt()``. A task that is still queued is
+cancelled. Failures come back as a Result carrying the error, so one slow
+or broken query never holds up the others. Each task runs in a copy of the
+caller's context, so its queries are attributed to the caller's run and
+section in tracing.py.
+
+Tasks must not call ``gather`` themselves: the pool is bounded and shared by
+every session.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, NamedTuple
+
+import config
+from database import get_db
+
+
+class Result(NamedTuple):
+    """Outcome of one task; ``error`` is None when ``value`` is valid"""
+
+    value: Any
+    error: str = None
+    seconds: float = 0.0
+
+
+class _Slot:
+    """Connection a task is running on, so a timeout can interrupt it"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = None
+        self.abandoned = False
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=config.FANOUT_WORKERS,
+                                               thread_name_prefix="hr-fanout")
+    return _executor
+
+
+def _run(task, slot, timeout):
+    started = time.perf_counter()
+    with get_db().reader(timeout=timeout, fanout=True) as conn:
+        with slot.lock:
+            if slot.abandoned:
+                raise TimeoutError("dibatalkan sebelum dimulai")
+            slot.conn = conn
+        try:
+            return task(conn), time.perf_counter() - started
+        finally:
+            # Detach before the connection goes back to the pool, so a late
+            # interrupt cannot hit another task's query
+            with slot.lock:
+                slot.conn = None
+
+
+def gather(tasks, timeout=None):
+    """Run ``{name: fn(conn)}`` concurrently and return ``{name: Result}``
+
+    ``timeout`` (seconds, default ``config.FANOUT_TIMEOUT_MS``) bounds the
+    whole call, from submitting the first task to the last result.
+    """
+    timeout = config.FANOUT_TIMEOUT_MS / 1000 if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    executor = _get_executor()
+    futures, slots = {}, {}
+    for name, task in tasks.items():
+        slots[name] = _Slot()
+        # One context copy per task; a Context cannot be entered by two threads
+        context = contextvars.copy_context()
+        futures[name] = executor.submit(context.run, _run, task, slots[name], timeout)
+
+    wait(futures.values(), timeout=max(deadline - time.monotonic(), 0))
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            slot = slots[name]
+            with slot.lock:
+                slot.abandoned = True
+                if slot.conn is not None:
+                    slot.conn.interrupt()
+            future.cancel()
+            results[name] = Result(None, f"TimeoutError: lebih dari {timeout:g} detik", timeout)
+            continue
+        try:
+            value, seconds = future.result()
+        except Exception as e:
+            results[name] = Result(None, f"{type(e).__name__}: {e}")
+        else:
+            results[name] = Result(value, None, seconds)
+    return results
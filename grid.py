@@ -0,0 +1,295 @@
+# grid.py
+"""Keyset-paginated data grids
+
+Pages are fetched with ``WHERE (sort, id) > (last_sort, last_id) ORDER BY
+sort, id LIMIT n`` so the cost of a page depends on the page size, never on
+how deep into the table the user has scrolled. Only indexed, NOT NULL
+columns are offered for sorting.
+
+``employee_picker`` is the typeahead used wherever one employee has to be
+chosen. It only ever loads the top matches from the search index.
+"""
+import streamlit as st
+
+import cache
+import search
+import sections
+
+COUNT_CAP = 10000
+
+
+class GridSource:
+    """Describe a table (or join) that can be browsed page by page"""
+
+    def __init__(self, from_sql, id_column, columns, sort_columns, tables,
+                 default_columns=None, default_sort=None, default_descending=False,
+                 filters=None):
+        self.from_sql = from_sql
+        # tables read by from_sql; pages are memoised until one of them changes
+        self.tables = tables
+        self.id_column = id_column
+        # label -> SQL expression
+        self.columns = columns
+        # label -> SQL expression; must be NOT NULL and backed by an index
+        self.sort_columns = sort_columns
+        self.default_columns = default_columns or list(columns)
+        self.default_sort = default_sort or next(iter(sort_columns))
+        self.default_descending = default_descending
+        # label -> (SQL expression, "select", "prefix" or "search", options)
+        # options is a list or a callable taking the connection; a "search"
+        # filter matches the expression (an employee id) against search.py
+        self.filters = filters or {}
+
+
+def _where_clause(source, filters, where):
+    clauses, params = [], []
+    if where:
+        clauses.append(where[0])
+        params.extend(where[1])
+    for label, value in filters.items():
+        if value in (None, ""):
+            continue
+        expr, kind, _options = source.filters[label]
+        if kind == "search":
+            query = search.match_query(value)
+            if query is not None:
+                clauses.append(f"{expr} IN (SELECT rowid FROM {search.TABLE} WHERE {search.TABLE} MATCH ?)")
+                params.append(query)
+        elif kind == "prefix":
+            clauses.append(f"{expr} LIKE ? ESCAPE '\\'")
+            escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(escaped + "%")
+        else:
+            clauses.append(f"{expr} = ?")
+            params.append(value)
+    return clauses, params
+
+
+def fetch_page(conn, source, columns, sort, descending=False, filters=None,
+               after=None, page_size=50, where=None):
+    """Fetch one page of rows
+
+    ``after`` is the (sort value, id) pair of the last row on the previous
+    page. Returns (column labels, rows, cursor of the next page or None).
+    """
+    sort_expr = source.sort_columns[sort]
+    clauses, params = _where_clause(source, filters or {}, where)
+    if after is not None:
+        op = "<" if descending else ">"
+        clauses.append(f"({sort_expr}, {source.id_column}) {op} (?, ?)")
+        params.extend(after)
+    direction = "DESC" if descending else "ASC"
+    select = ", ".join(f"{source.columns[label]} AS \"{label}\"" for label in columns)
+    sql = (
+        f"SELECT {sort_expr}, {source.id_column}, {select} FROM {source.from_sql}"
+        + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+        + f" ORDER BY {sort_expr} {direction}, {source.id_column} {direction} LIMIT ?"
+    )
+    rows = conn.execute(sql, params + [page_size + 1]).fetchall()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = tuple(rows[-1][:2])
+    return list(columns), [row[2:] for row in rows], next_cursor
+
+
+def estimate_count(conn, source, filters=None, where=None, cap=COUNT_CAP):
+    """Count matching rows, stopping at ``cap``
+
+    Returns (count, exact). Past the cap the grid only shows "cap+", which
+    keeps the count query bounded on very large tables.
+    """
+    clauses, params = _where_clause(source, filters or {}, where)
+    sql = (
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM {source.from_sql}"
+        + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+        + " LIMIT ?)"
+    )
+    count = conn.execute(sql, params + [cap + 1]).fetchone()[0]
+    return min(count, cap), count <= cap
+
+
+def _go_next(state_key, cursor):
+    st.session_state[state_key].append(cursor)
+
+
+def _go_prev(state_key):
+    if len(st.session_state[state_key]) > 1:
+        st.session_state[state_key].pop()
+
+
+def paginated_table(key, source, conn, page_size=50, where=None, scope=cache.GLOBAL_SCOPE):
+    """Render a keyset-paginated grid with projection, sorting and filters"""
+    import pandas as pd
+
+    # Full-text search stays visible above the grid; other filters are folded away
+    filters = {}
+    for label, (_expr, kind, _options) in source.filters.items():
+        if kind == "search":
+            filters[label] = st.text_input(f"🔎 {label}", key=f"{key}_f_{label}",
+                                           placeholder="Nama, NIK, jabatan, email atau department").strip()
+    other_filters = {label: spec for label, spec in source.filters.items() if spec[1] != "search"}
+
+    with st.expander("⚙️ Kolom, urutan & filter"):
+        columns = st.multiselect("Kolom", list(source.columns),
+                                 default=source.default_columns, key=f"{key}_columns")
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            sort = st.selectbox("Urutkan", list(source.sort_columns),
+                                index=list(source.sort_columns).index(source.default_sort),
+                                key=f"{key}_sort")
+        with col2:
+            descending = st.toggle("Menurun", value=source.default_descending, key=f"{key}_desc")
+
+        if other_filters:
+            filter_cols = st.columns(len(other_filters))
+            for col, (label, (_expr, kind, options)) in zip(filter_cols, other_filters.items()):
+                with col:
+                    if kind == "prefix":
+                        filters[label] = st.text_input(label, key=f"{key}_f_{label}").strip()
+                    else:
+                        if callable(options):
+                            choices = sections.memo(("grid_options", key, label), source.tables,
+                                                    lambda options=options: options(conn), scope)
+                        else:
+                            choices = options
+                        labels = {value: text for text, value in choices}
+                        filters[label] = st.selectbox(
+                            label, [None] + [value for _, value in choices],
+                            format_func=lambda v, labels=labels: "Semua" if v is None else labels[v],
+                            key=f"{key}_f_{label}",
+                        )
+
+    columns = columns or source.default_columns
+
+    # Start again from the first page whenever the query shape changes
+    state_key = f"{key}_cursors"
+    signature = (tuple(columns), sort, descending, tuple(sorted(filters.items(), key=lambda kv: kv[0])))
+    if st.session_state.get(f"{key}_signature") != signature:
+        st.session_state[f"{key}_signature"] = signature
+        st.session_state[state_key] = [None]
+    cursors = st.session_state[state_key]
+
+    def load_page():
+        page = fetch_page(conn, source, columns, sort, descending,
+                          filters, cursors[-1], page_size, where)
+        return page + estimate_count(conn, source, filters, where)
+
+    memo_key = ("grid", key, signature, cursors[-1], page_size,
+                where and (where[0], tuple(where[1])))
+    labels, rows, next_cursor, total, exact = sections.memo(memo_key, source.tables, load_page, scope)
+    st.dataframe(pd.DataFrame.from_records(rows, columns=labels),
+                 use_container_width=True, hide_index=True)
+
+    first = (len(cursors) - 1) * page_size
+    col1, col2, col3 = st.columns([4, 1, 1])
+    with col1:
+        shown = f"{first + 1}–{first + len(rows)}" if rows else "0"
+        st.caption(f"Menampilkan {shown} dari {total}{'' if exact else '+'} baris")
+    with col2:
+        st.button("‹ Sebelumnya", key=f"{key}_prev", disabled=len(cursors) <= 1,
+                  on_click=_go_prev, args=(state_key,))
+    with col3:
+        st.button("Berikutnya ›", key=f"{key}_next", disabled=next_cursor is None,
+                  on_click=_go_next, args=(state_key, next_cursor))
+
+
+def employee_picker(conn, label, key, dept_id=None, limit=search.DEFAULT_LIMIT, scope=cache.GLOBAL_SCOPE):
+    """Search box plus a select of the best matches; returns the chosen employee id or None"""
+    text = st.text_input(f"Cari {label.lower()}", key=f"{key}_search",
+                         placeholder="Nama, NIK, jabatan, email atau department").strip()
+    if not text:
+        return None
+    matches = sections.memo(("employee_picker", text, dept_id, limit), ("employees", "departments"),
+                            lambda: search.search(conn, text, limit, dept_id), scope)
+    if not matches:
+        st.caption("Tidak ada karyawan yang cocok")
+        return None
+    rows = {row[0]: row for row in matches}
+    return st.selectbox(
+        label, list(rows), key=f"{key}_choice",
+        format_func=lambda emp_id: " · ".join(str(v) for v in rows[emp_id][1:] if v),
+    )
+
+
+def _department_options(conn):
+    return conn.execute("SELECT nama_department, id FROM departments ORDER BY nama_department").fetchall()
+
+
+EMPLOYEES = GridSource(
+    from_sql="employees e LEFT JOIN departments d ON e.department_id = d.id",
+    id_column="e.id",
+    columns={
+        "id": "e.id", "nama_lengkap": "e.nama_lengkap", "nik": "e.nik",
+        "tempat_lahir": "e.tempat_lahir", "tanggal_lahir": "e.tanggal_lahir",
+        "jenis_kelamin": "e.jenis_kelamin", "alamat": "e.alamat", "telepon": "e.telepon",
+        "email": "e.email", "status_pernikahan": "e.status_pernikahan", "agama": "e.agama",
+        "jabatan": "e.jabatan", "department_id": "e.department_id",
+        "nama_department": "d.nama_department", "status_kerja": "e.status_kerja",
+        "tanggal_masuk": "e.tanggal_masuk",
+    },
+    default_columns=["id", "nama_lengkap", "nik", "email", "jabatan",
+                     "nama_department", "status_kerja", "tanggal_masuk"],
+    sort_columns={"nama_lengkap": "e.nama_lengkap", "nik": "e.nik", "id": "e.id"},
+    tables=("employees", "departments"),
+    filters={
+        "Department": ("e.department_id", "select", _department_options),
+        "Status Kerja": ("e.status_kerja", "select",
+                         [("aktif", "aktif"), ("tidak aktif", "tidak aktif"), ("resign", "resign")]),
+        "Cari": ("e.id", "search", None),
+    },
+)
+
+CONTRACTS = GridSource(
+    from_sql="contracts c JOIN employees e ON c.employee_id = e.id",
+    id_column="c.id",
+    columns={
+        "id": "c.id", "employee_id": "c.employee_id", "nama_lengkap": "e.nama_lengkap",
+        "tanggal_mulai": "c.tanggal_mulai", "tanggal_berakhir": "c.tanggal_berakhir",
+        "jenis_kontrak": "c.jenis_kontrak", "status_kontrak": "c.status_kontrak",
+        "keterangan": "c.keterangan", "created_at": "c.created_at",
+    },
+    sort_columns={"tanggal_berakhir": "c.tanggal_berakhir", "tanggal_mulai": "c.tanggal_mulai", "id": "c.id"},
+    tables=("contracts", "employees"),
+    filters={
+        "Status Kontrak": ("c.status_kontrak", "select", [("aktif", "aktif"), ("berakhir", "berakhir")]),
+        "Jenis Kontrak": ("c.jenis_kontrak", "select", [("PKWT", "PKWT"), ("PKWTT", "PKWTT")]),
+    },
+)
+
+LEAVES = GridSource(
+    from_sql="leave_submissions l JOIN employees e ON l.employee_id = e.id",
+    id_column="l.id",
+    columns={
+        "id": "l.id", "employee_id": "l.employee_id", "nama_lengkap": "e.nama_lengkap",
+        "tanggal_mulai": "l.tanggal_mulai", "tanggal_selesai": "l.tanggal_selesai",
+        "jenis_cuti": "l.jenis_cuti", "alasan": "l.alasan", "status": "l.status",
+        "approved_by": "l.approved_by", "approved_date": "l.approved_date",
+        "created_at": "l.created_at",
+    },
+    sort_columns={"created_at": "l.created_at", "id": "l.id"},
+    tables=("leave_submissions", "employees"),
+    default_descending=True,
+    filters={
+        "Status": ("l.status", "select",
+                   [("pending", "pending"), ("approved", "approved"), ("rejected", "rejected")]),
+        "Jenis Cuti": ("l.jenis_cuti", "select",
+                       [(j, j) for j in ["Cuti Tahunan", "Cuti Sakit", "Cuti Melahirkan", "Cuti Lainnya"]]),
+    },
+)
+
+USERS = GridSource(
+    from_sql="users u",
+    id_column="u.id",
+    columns={
+        "id": "u.id", "username": "u.username", "email": "u.email", "role": "u.role",
+        "employee_id": "u.employee_id", "created_at": "u.created_at", "is_active": "u.is_active",
+    },
+    sort_columns={"username": "u.username", "id": "u.id"},
+    tables=("users",),
+    filters={
+        "Role": ("u.role", "select", [("admin", "admin"), ("manager", "manager"), ("employee", "employee")]),
+        "Username": ("u.username", "prefix", None),
+    },
+)
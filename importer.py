@@ -0,0 +1,260 @@
+# importer.py
+"""Bulk import of employees and their user accounts from CSV/XLSX files
+
+The file is read as a stream of chunks and validated against an in-memory
+index of the NIKs, e-mails and usernames already in the database. Valid
+rows become ``employees`` and ``users`` rows inserted with ``executemany``;
+invalid rows are skipped and reported with their line number. The caller
+supplies the writer connection, so the whole import is one transaction.
+
+The username defaults to the NIK. A row without a password gets a random
+one, returned in the report's ``credentials`` so it can be handed out; the
+NIK is printed on badges and must not double as the password.
+
+Usage: python importer.py karyawan.csv [--dry-run]
+"""
+import csv
+import io
+import re
+import secrets
+import time
+from datetime import date, datetime
+
+from auth import hash_password
+
+REQUIRED_COLUMNS = ["nama_lengkap", "nik", "email", "kode_department"]
+OPTIONAL_COLUMNS = [
+    "tempat_lahir", "tanggal_lahir", "jenis_kelamin", "alamat", "telepon",
+    "status_pernikahan", "agama", "jabatan", "status_kerja", "tanggal_masuk",
+    "username", "password", "role",
+]
+JENIS_KELAMIN = {"Laki-laki", "Perempuan"}
+STATUS_KERJA = {"aktif", "tidak aktif", "resign"}
+ROLES = {"employee", "manager"}
+DEFAULT_CHUNKSIZE = 5000
+# Random bytes of a generated password (12 URL-safe characters)
+PASSWORD_BYTES = 9
+
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+_EMPLOYEE_COLUMNS = [
+    "id", "nama_lengkap", "nik", "tempat_lahir", "tanggal_lahir", "jenis_kelamin",
+    "alamat", "telepon", "email", "status_pernikahan", "agama", "jabatan",
+    "department_id", "status_kerja", "tanggal_masuk", "user_id",
+]
+_USER_COLUMNS = ["id", "username", "password", "email", "role", "employee_id"]
+
+
+def _cell(value):
+    """Normalise a spreadsheet cell to a stripped string"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _chunks(rows, header, chunksize):
+    header = [_cell(h).lower() for h in header]
+    chunk = []
+    for row in rows:
+        chunk.append({key: _cell(value) for key, value in zip(header, row)})
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_chunks(fileobj, filename, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield lists of row dicts from a CSV or XLSX file without loading it whole"""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        try:
+            import openpyxl
+        except ImportError:
+            raise ImportError("Import XLSX membutuhkan paket 'openpyxl'") from None
+        workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None) or []
+            yield from _chunks(rows, header, chunksize)
+        finally:
+            workbook.close()
+    else:
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+        try:
+            reader = csv.reader(text)
+            header = next(reader, None) or []
+            yield from _chunks(reader, header, chunksize)
+        finally:
+            # leave the caller's binary file open
+            text.detach()
+
+
+def _valid_date(value):
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+class _Index:
+    """Existing unique keys, extended as rows are accepted"""
+
+    def __init__(self, conn):
+        self.niks = {row[0] for row in conn.execute("SELECT nik FROM employees")}
+        self.emails = {row[0].lower() for row in conn.execute(
+            "SELECT email FROM employees WHERE email IS NOT NULL UNION SELECT email FROM users")}
+        self.usernames = {row[0].lower() for row in conn.execute("SELECT username FROM users")}
+        self.departments = dict(conn.execute("SELECT kode_department, id FROM departments"))
+
+
+def validate_row(row, index):
+    """Return a list of problems with one input row (empty when valid)"""
+    errors = []
+    for column in REQUIRED_COLUMNS:
+        if not row.get(column):
+            errors.append(f"kolom '{column}' wajib diisi")
+    nik = row.get("nik", "")
+    email = row.get("email", "").lower()
+    username = (row.get("username") or nik).lower()
+
+    if nik and nik in index.niks:
+        errors.append(f"NIK {nik} sudah terdaftar")
+    if email:
+        if not _EMAIL_RE.match(email):
+            errors.append(f"email '{email}' tidak valid")
+        elif email in index.emails:
+            errors.append(f"email {email} sudah terdaftar")
+    if username and username in index.usernames:
+        errors.append(f"username {username} sudah dipakai")
+    kode = row.get("kode_department")
+    if kode and kode not in index.departments:
+        errors.append(f"kode department '{kode}' tidak dikenal")
+    for column in ("tanggal_lahir", "tanggal_masuk"):
+        if row.get(column) and not _valid_date(row[column]):
+            errors.append(f"{column} harus berformat YYYY-MM-DD")
+    if row.get("jenis_kelamin") and row["jenis_kelamin"] not in JENIS_KELAMIN:
+        errors.append(f"jenis_kelamin harus salah satu dari {sorted(JENIS_KELAMIN)}")
+    if row.get("status_kerja") and row["status_kerja"] not in STATUS_KERJA:
+        errors.append(f"status_kerja harus salah satu dari {sorted(STATUS_KERJA)}")
+    if row.get("role") and row["role"] not in ROLES:
+        errors.append(f"role harus salah satu dari {sorted(ROLES)}")
+    return errors
+
+
+def _next_id(conn, table):
+    (max_id,) = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    return max(max_id, seq[0] if seq else 0) + 1
+
+
+def import_employees(conn, fileobj, filename, chunksize=DEFAULT_CHUNKSIZE, dry_run=False):
+    """Import employees plus user accounts from ``fileobj``
+
+    ``conn`` must be the writer connection; nothing is committed here so the
+    caller's transaction covers the whole file. With ``dry_run`` the rows are
+    only validated. Returns a report dict with the row, insert and error
+    counts, plus ``credentials``: (nik, username, password) of every account
+    that got a generated password.
+    """
+    started = time.perf_counter()
+    index = _Index(conn)
+    today = date.today().isoformat()
+    next_employee_id = _next_id(conn, "employees")
+    next_user_id = _next_id(conn, "users")
+
+    total = 0
+    inserted = 0
+    errors = []
+    credentials = []
+    for chunk in read_chunks(fileobj, filename, chunksize):
+        employees, users = [], []
+        for row in chunk:
+            total += 1
+            line = total + 1  # header is line 1
+            problems = validate_row(row, index)
+            if problems:
+                errors.append((line, row.get("nik", ""), "; ".join(problems)))
+                continue
+
+            nik = row["nik"]
+            email = row["email"]
+            username = row.get("username") or nik
+            index.niks.add(nik)
+            index.emails.add(email.lower())
+            index.usernames.add(username.lower())
+
+            employee_id, user_id = next_employee_id, next_user_id
+            next_employee_id += 1
+            next_user_id += 1
+            employees.append((
+                employee_id, row["nama_lengkap"], nik, row.get("tempat_lahir") or None,
+                row.get("tanggal_lahir") or None, row.get("jenis_kelamin") or None,
+                row.get("alamat") or None, row.get("telepon") or None, email,
+                row.get("status_pernikahan") or None, row.get("agama") or None,
+                row.get("jabatan") or None, index.departments[row["kode_department"]],
+                row.get("status_kerja") or "aktif", row.get("tanggal_masuk") or today, user_id,
+            ))
+            password = row.get("password")
+            if not password and not dry_run:
+                password = secrets.token_urlsafe(PASSWORD_BYTES)
+                credentials.append((nik, username, password))
+            users.append((
+                user_id, username, hash_password(password or ""), email,
+                row.get("role") or "employee", employee_id,
+            ))
+
+        if employees and not dry_run:
+            conn.executemany(
+                f"INSERT INTO users ({', '.join(_USER_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_USER_COLUMNS))})", users)
+            conn.executemany(
+                f"INSERT INTO employees ({', '.join(_EMPLOYEE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_EMPLOYEE_COLUMNS))})", employees)
+        inserted += len(employees)
+
+    return {
+        "rows": total,
+        "inserted": 0 if dry_run else inserted,
+        "valid": inserted,
+        "errors": errors,
+        "credentials": credentials,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from database import bootstrap, get_db
+
+    parser = argparse.ArgumentParser(description="Import karyawan dari CSV/XLSX")
+    parser.add_argument("path")
+    parser.add_argument("--dry-run", action="store_true", help="hanya validasi, tanpa menyimpan")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--credentials", help="file CSV untuk password acak yang dibuat "
+                                              "(default: <file>_kredensial.csv)")
+    args = parser.parse_args()
+
+    bootstrap()
+    with open(args.path, "rb") as f, get_db().writer("employees", "users") as conn:
+        report = import_employees(conn, f, args.path, args.chunksize, args.dry_run)
+    for line, nik, message in report["errors"]:
+        print(f"baris {line} ({nik}): {message}")
+    print(f"{report['valid']} dari {report['rows']} baris valid, "
+          f"{report['inserted']} diimpor dalam {report['seconds']:.2f} detik")
+    if report["credentials"]:
+        path = args.credentials or f"{os.path.splitext(args.path)[0]}_kredensial.csv"
+        # Only the owner may read the passwords
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["nik", "username", "password"])
+            writer.writerows(report["credentials"])
+        print(f"{len(report['credentials'])} password acak ditulis ke {path}")
@@ -0,0 +1,221 @@
+# ingest.py
+"""Streaming ingestion of clock-device punch logs into daily_attendances
+
+A punch file (CSV or JSONL) holds one punch per line: the employee (``nik``
+or ``employee_id``), a ``timestamp`` and a ``direction`` of in/out. Lines
+are read lazily and folded batch by batch into one row per employee per
+day: the earliest "in" becomes ``jam_masuk`` and the latest "out" becomes
+``jam_pulang``. Each batch is upserted on (employee_id, tanggal) in its own
+transaction, which also records how far into the file it got, so an
+interrupted run resumes after the last committed batch. The merge keeps
+MIN/MAX times, so replaying punches is harmless.
+
+Checkpoints are keyed by the file's path and store a hash of its first
+64 KiB along with how many bytes it covers. A run resumes only when that
+many bytes at the start of the file still hash the same, so a log that
+only grew resumes where it stopped, even one smaller than 64 KiB, while a
+rotated or rewritten file under the same name is read from the start. Punches for a year
+that has been archived (archive.py) are rejected line by line instead of
+failing their batch.
+
+Memory use depends on the batch size, not the file size.
+
+Usage: python ingest.py punches.csv [--batch-size N] [--restart]
+"""
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import archive
+from database import get_db
+
+DEFAULT_BATCH_SIZE = 10000
+MAX_REPORTED_ERRORS = 100
+FINGERPRINT_BYTES = 64 * 1024
+
+DIRECTIONS = {
+    "in": "in", "i": "in", "masuk": "in", "1": "in",
+    "out": "out", "o": "out", "pulang": "out", "keluar": "out", "0": "out",
+}
+
+UPSERT_SQL = """
+    INSERT INTO daily_attendances (employee_id, tanggal, jam_masuk, jam_pulang, status)
+    VALUES (?, ?, ?, ?, 'hadir')
+    ON CONFLICT (employee_id, tanggal) DO UPDATE SET
+        jam_masuk = COALESCE(MIN(jam_masuk, excluded.jam_masuk), jam_masuk, excluded.jam_masuk),
+        jam_pulang = COALESCE(MAX(jam_pulang, excluded.jam_pulang), jam_pulang, excluded.jam_pulang),
+        -- A punch overrides an absence marked by reconcile.py
+        status = CASE WHEN status IS NULL OR status = 'alpha' THEN excluded.status ELSE status END,
+        keterangan = CASE WHEN status = 'alpha' THEN NULL ELSE keterangan END
+"""
+
+
+def read_punches(path, skip=0):
+    """Yield (line, record dict) for every punch in a CSV or JSONL file
+
+    ``line`` is the 1-based data line number; the first ``skip`` lines are
+    read past without being parsed.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line, text in enumerate(f, 1):
+                if line <= skip or not text.strip():
+                    continue
+                try:
+                    yield line, json.loads(text)
+                except ValueError:
+                    yield line, None
+        else:
+            for line, record in enumerate(csv.DictReader(f), 1):
+                if line > skip:
+                    yield line, record
+
+
+def parse_punch(record, employees_by_nik):
+    """Return (employee_id, tanggal, time, direction) or raise ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError("baris tidak dapat dibaca")
+    if record.get("employee_id") not in (None, ""):
+        employee_id = int(record["employee_id"])
+    else:
+        nik = str(record.get("nik") or "").strip()
+        if nik not in employees_by_nik:
+            raise ValueError(f"NIK '{nik}' tidak dikenal")
+        employee_id = employees_by_nik[nik]
+    stamp = datetime.fromisoformat(str(record["timestamp"]).strip())
+    direction = DIRECTIONS.get(str(record.get("direction", "")).strip().lower())
+    if direction is None:
+        raise ValueError(f"direction '{record.get('direction')}' harus in/out")
+    return employee_id, stamp.strftime("%Y-%m-%d"), stamp.strftime("%H:%M:%S"), direction
+
+
+def fold(days, employee_id, tanggal, clock, direction):
+    """Merge one punch into {(employee_id, tanggal): (first in, last out)}"""
+    first_in, last_out = days.get((employee_id, tanggal), (None, None))
+    if direction == "in":
+        first_in = clock if first_in is None else min(first_in, clock)
+    else:
+        last_out = clock if last_out is None else max(last_out, clock)
+    days[(employee_id, tanggal)] = (first_in, last_out)
+
+
+def fingerprint(path, size=FINGERPRINT_BYTES):
+    """Return (hash, bytes hashed) of the first ``size`` bytes of ``path``"""
+    with open(path, "rb") as f:
+        head = f.read(size)
+    return hashlib.sha256(head).hexdigest()[:16], len(head)
+
+
+def get_checkpoint(conn, path):
+    """Return the line to resume ``path`` after, 0 if its start has changed"""
+    row = conn.execute("SELECT line, fingerprint, fingerprint_bytes FROM ingest_checkpoints WHERE source = ?",
+                       (os.path.abspath(path),)).fetchone()
+    if row is None or row[1] is None:
+        return 0
+    line, stored, size = row
+    return line if fingerprint(path, size) == (stored, size) else 0
+
+
+def _save_checkpoint(conn, source, line, mark):
+    conn.execute("""
+        INSERT INTO ingest_checkpoints (source, line, fingerprint, fingerprint_bytes, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (source) DO UPDATE SET
+            line = excluded.line,
+            fingerprint = excluded.fingerprint,
+            fingerprint_bytes = excluded.fingerprint_bytes,
+            updated_at = excluded.updated_at
+    """, (source, line, *mark))
+
+
+def ingest(path, batch_size=DEFAULT_BATCH_SIZE, restart=False, progress=None):
+    """Ingest a punch file, resuming from its checkpoint unless ``restart``
+
+    ``progress`` is called with the running report after every batch.
+    Returns a report dict: lines read, punches applied, attendance rows
+    touched, rejected lines (with the first few errors) and rows/sec.
+    """
+    db = get_db()
+    source = os.path.abspath(path)
+    mark = fingerprint(path)
+    with db.reader() as conn:
+        employees_by_nik = dict(conn.execute("SELECT nik, id FROM employees"))
+        known_ids = set(employees_by_nik.values())
+        closed = archive.closed_years(conn)
+        start = 0 if restart else get_checkpoint(conn, path)
+
+    report = {"source": source, "resumed_from": start, "lines": 0, "punches": 0,
+              "days": 0, "rejected": 0, "errors": [], "seconds": 0.0, "rows_per_sec": 0.0}
+    started = time.perf_counter()
+
+    def reject(line, message):
+        report["rejected"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append((line, message))
+
+    def flush(days, line):
+        with db.writer("daily_attendances") as conn:
+            # A year archived while the file was being read would abort the batch
+            closed.update(archive.closed_years(conn))
+            for emp, day in [key for key in days if int(key[1][:4]) in closed]:
+                del days[(emp, day)]
+                reject(line, f"absensi {emp} {day}: tahun sudah diarsipkan (batch sampai baris {line})")
+            conn.executemany(UPSERT_SQL, [(emp, day, first_in, last_out)
+                                          for (emp, day), (first_in, last_out) in days.items()])
+            _save_checkpoint(conn, source, line, mark)
+        report["days"] += len(days)
+        report["seconds"] = time.perf_counter() - started
+        report["rows_per_sec"] = report["lines"] / report["seconds"] if report["seconds"] else 0.0
+        if progress:
+            progress(report)
+
+    days = {}
+    pending = 0
+    line = start
+    for line, record in read_punches(path, skip=start):
+        report["lines"] += 1
+        pending += 1
+        try:
+            employee_id, tanggal, clock, direction = parse_punch(record, employees_by_nik)
+            if employee_id not in known_ids:
+                raise ValueError(f"employee_id {employee_id} tidak dikenal")
+            if int(tanggal[:4]) in closed:
+                raise ValueError(f"tahun {tanggal[:4]} sudah diarsipkan")
+        except (KeyError, TypeError, ValueError) as e:
+            reject(line, str(e))
+        else:
+            report["punches"] += 1
+            fold(days, employee_id, tanggal, clock, direction)
+        if pending >= batch_size:
+            flush(days, line)
+            days, pending = {}, 0
+
+    if pending or restart:
+        flush(days, line)
+    report["seconds"] = time.perf_counter() - started
+    report["rows_per_sec"] = report["lines"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import bootstrap
+
+    parser = argparse.ArgumentParser(description="Ingest log absensi mesin presensi (CSV/JSONL)")
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="abaikan checkpoint, mulai dari awal file")
+    args = parser.parse_args()
+
+    bootstrap()
+    report = ingest(args.path, args.batch_size, args.restart,
+                    progress=lambda r: print(f"  {r['lines']} baris, {r['rows_per_sec']:.0f} baris/detik"))
+    for line, message in report["errors"]:
+        print(f"baris {line}: {message}")
+    print(f"{report['lines']} baris dibaca (mulai setelah baris {report['resumed_from']}), "
+          f"{report['punches']} punch, {report['days']} baris absensi, {report['rejected']} ditolak, "
+          f"{report['rows_per_sec']:.0f} baris/detik")
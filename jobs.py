@@ -0,0 +1,220 @@
+# jobs.py
+"""Background jobs run on a schedule inside the app process
+
+A single daemon thread runs each registered job every ``interval`` seconds,
+starting right after ``start()``. Jobs write through the shared writer
+connection, whose lock is only held for the job's own short transaction,
+so user reruns keep reading from the reader pool meanwhile. Every finished
+run is recorded in ``job_runs`` (watermark, time, rows affected, seconds).
+
+Built-in jobs:
+
+* ``contracts.expire`` - moves active contracts whose ``tanggal_berakhir``
+  has passed to ``berakhir`` with one range UPDATE on
+  (status_kontrak, tanggal_berakhir), and refreshes ``expiring_contracts``,
+  the contracts ending within ``config.CONTRACT_EXPIRY_WARNING_DAYS``
+* ``reconcile`` - reconcile.py, when ``HR_JOB_RECONCILE_INTERVAL`` is set
+* ``snapshot.build`` - rebuilds the analytics snapshot (snapshot.py) from a
+  reader connection, so it never holds the writer lock
+* ``archive.attendance`` - moves closed attendance years into their archive
+  files (archive.py), when ``HR_JOB_ARCHIVE_INTERVAL`` is set
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import config
+import tracing
+from database import get_db
+
+EXPIRED = "berakhir"
+
+logger = logging.getLogger(__name__)
+
+
+def get_watermark(conn, job):
+    """Return the watermark saved by the last run of ``job``, or None"""
+    row = conn.execute("SELECT watermark FROM job_runs WHERE job = ?", (job,)).fetchone()
+    return row[0] if row else None
+
+
+def save_run(conn, job, watermark, rows, seconds):
+    """Record a finished run of ``job`` and its new watermark"""
+    conn.execute("""
+        INSERT INTO job_runs (job, watermark, last_run, last_rows, last_seconds)
+        VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?)
+        ON CONFLICT (job) DO UPDATE SET
+            watermark = excluded.watermark, last_run = excluded.last_run,
+            last_rows = excluded.last_rows, last_seconds = excluded.last_seconds
+    """, (job, watermark, rows, seconds))
+
+
+def expire_contracts(today=None):
+    """Expire contracts past their end date and refresh the expiring list
+
+    Returns the number of contracts moved to ``berakhir``.
+    """
+    started = time.perf_counter()
+    today = today or date.today()
+    horizon = today + timedelta(days=config.CONTRACT_EXPIRY_WARNING_DAYS)
+    with get_db().writer("contracts", "expiring_contracts", "job_runs") as conn:
+        expired = conn.execute("""
+            UPDATE contracts SET status_kontrak = ?
+            WHERE status_kontrak = 'aktif' AND tanggal_berakhir < ?
+        """, (EXPIRED, today.isoformat())).rowcount
+        conn.execute("DELETE FROM expiring_contracts")
+        conn.execute("""
+            INSERT INTO expiring_contracts
+                (contract_id, department_id, employee_id, nama_lengkap, jenis_kontrak, tanggal_berakhir)
+            SELECT c.id, e.department_id, c.employee_id, e.nama_lengkap, c.jenis_kontrak, c.tanggal_berakhir
+            FROM contracts c
+            JOIN employees e ON e.id = c.employee_id
+            WHERE c.status_kontrak = 'aktif' AND c.tanggal_berakhir BETWEEN ? AND ?
+        """, (today.isoformat(), horizon.isoformat()))
+        save_run(conn, "contracts.expire", today.isoformat(), expired, time.perf_counter() - started)
+    return expired
+
+
+def _reconcile():
+    import reconcile
+
+    return reconcile.reconcile()
+
+
+def _snapshot():
+    import snapshot
+
+    return snapshot.build_current()["rows"]
+
+
+def _archive():
+    import archive
+
+    return sum(report["rows"] for report in archive.archive_closed())
+
+
+class Scheduler:
+    """Run jobs periodically on one daemon thread"""
+
+    def __init__(self):
+        # name -> {"fn", "interval", "next", "last_error", "last_finished"}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def register(self, name, interval, fn):
+        """Run ``fn()`` every ``interval`` seconds, the first time right away"""
+        with self._lock:
+            self._jobs[name] = {"fn": fn, "interval": interval, "next": time.monotonic(),
+                                "last_error": None, "last_finished": None}
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="hr-jobs", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_now(self, name):
+        """Make ``name`` due immediately; False if no such job is registered"""
+        with self._lock:
+            if name not in self._jobs:
+                return False
+            self._jobs[name]["next"] = time.monotonic()
+        self._wake.set()
+        return True
+
+    def status(self):
+        """Return {name: {interval, last_finished, last_error}}"""
+        with self._lock:
+            return {name: {"interval": job["interval"], "last_finished": job["last_finished"],
+                           "last_error": job["last_error"]}
+                    for name, job in self._jobs.items()}
+
+    def _loop(self):
+        while not self._stopped:
+            with self._lock:
+                now = time.monotonic()
+                due = [(name, job) for name, job in self._jobs.items() if job["next"] <= now]
+                for _name, job in due:
+                    job["next"] = now + job["interval"]
+                wait = min((job["next"] for job in self._jobs.values()), default=now + 60) - now
+            for name, job in due:
+                self._run(name, job)
+            if not due:
+                self._wake.wait(max(wait, 0))
+                self._wake.clear()
+
+    def _run(self, name, job):
+        error = None
+        try:
+            with tracing.section(f"job {name}"):
+                job["fn"]()
+        except Exception as e:
+            logger.exception("Job %s gagal", name)
+            error = f"{type(e).__name__}: {e}"
+        with self._lock:
+            job["last_error"] = error
+            job["last_finished"] = datetime.now()
+
+
+_JOBS = {"contracts.expire": expire_contracts, "reconcile": _reconcile, "snapshot.build": _snapshot,
+         "archive.attendance": _archive}
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler with the built-in jobs registered"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                scheduler = Scheduler()
+                if config.JOB_CONTRACT_EXPIRY_INTERVAL > 0:
+                    scheduler.register("contracts.expire", config.JOB_CONTRACT_EXPIRY_INTERVAL, expire_contracts)
+                if config.JOB_RECONCILE_INTERVAL > 0:
+                    scheduler.register("reconcile", config.JOB_RECONCILE_INTERVAL, _reconcile)
+                if config.JOB_SNAPSHOT_INTERVAL > 0:
+                    scheduler.register("snapshot.build", config.JOB_SNAPSHOT_INTERVAL, _snapshot)
+                if config.JOB_ARCHIVE_INTERVAL > 0:
+                    scheduler.register("archive.attendance", config.JOB_ARCHIVE_INTERVAL, _archive)
+                _scheduler = scheduler
+    return _scheduler
+
+
+def start():
+    """Start the background jobs once per process unless HR_JOBS is off"""
+    if config.JOBS_ENABLED:
+        get_scheduler().start()
+
+
+def last_runs(conn):
+    """Return {job: (watermark, last_run, last_rows, last_seconds)} from job_runs"""
+    rows = conn.execute("SELECT job, watermark, last_run, last_rows, last_seconds FROM job_runs").fetchall()
+    return {job: tuple(rest) for job, *rest in rows}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import bootstrap
+
+    parser = argparse.ArgumentParser(description="Jalankan job latar sekali")
+    parser.add_argument("job", choices=list(_JOBS))
+    args = parser.parse_args()
+
+    bootstrap(seed=False)
+    started = time.perf_counter()
+    result = _JOBS[args.job]()
+    print(f"{args.job}: {result} ({time.perf_counter() - started:.2f} detik)")
@@ -0,0 +1,144 @@
+# leave_balance.py
+"""Working days taken by leave requests and annual leave balances
+
+Working days are counted with NumPy business-day arithmetic: weekdays from
+``config.LEAVE_WEEKMASK`` minus the dates in the ``holidays`` table. A
+request spanning New Year is split between the two years.
+
+``balances`` computes every employee's figures for a year in one
+vectorised pass over all annual leave requests and keeps the result in the
+shared query cache until leave requests, employees or holidays change.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import cache
+import config
+
+ANNUAL_LEAVE = "Cuti Tahunan"
+TABLES = ("leave_submissions", "employees", "holidays")
+
+
+def holidays(conn):
+    """Return the holiday calendar as a sorted datetime64[D] array"""
+    rows = conn.execute("SELECT tanggal FROM holidays ORDER BY tanggal").fetchall()
+    return np.array([r[0] for r in rows], dtype="datetime64[D]")
+
+
+def _calendar(conn):
+    return np.busdaycalendar(weekmask=config.LEAVE_WEEKMASK, holidays=holidays(conn))
+
+
+def working_days(conn, start, end):
+    """Number of working days from ``start`` to ``end``, both inclusive"""
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    if end < start:
+        return 0
+    return int(np.busday_count(start, end + 1, busdaycal=_calendar(conn)))
+
+
+def _days_in_year(starts, ends, year, calendar):
+    """Working days of each [start, end] range that fall inside ``year``"""
+    first = np.datetime64(f"{year}-01-01", "D")
+    after = np.datetime64(f"{year + 1}-01-01", "D")
+    starts = np.maximum(starts, first)
+    ends = np.minimum(ends + 1, after)
+    days = np.zeros(len(starts), dtype=np.int64)
+    inside = starts < ends
+    days[inside] = np.busday_count(starts[inside], ends[inside], busdaycal=calendar)
+    return days
+
+
+def _compute(conn, year):
+    leaves = pd.read_sql("""
+        SELECT employee_id, tanggal_mulai, tanggal_selesai, status
+        FROM leave_submissions
+        WHERE jenis_cuti = ? AND status IN ('approved', 'pending')
+          AND tanggal_mulai <= ? AND tanggal_selesai >= ?
+    """, conn, params=(ANNUAL_LEAVE, f"{year}-12-31", f"{year}-01-01"))
+    employee_ids = pd.read_sql("SELECT id FROM employees ORDER BY id", conn)["id"]
+
+    starts = pd.to_datetime(leaves["tanggal_mulai"], errors="coerce").to_numpy("datetime64[D]")
+    ends = pd.to_datetime(leaves["tanggal_selesai"], errors="coerce").to_numpy("datetime64[D]")
+    valid = ~(np.isnat(starts) | np.isnat(ends))
+    days = np.zeros(len(leaves), dtype=np.int64)
+    days[valid] = _days_in_year(starts[valid], ends[valid], year, _calendar(conn))
+
+    leaves = leaves.assign(days=days)
+    per_status = leaves.pivot_table(index="employee_id", columns="status", values="days",
+                                    aggfunc="sum", fill_value=0)
+    result = pd.DataFrame(index=pd.Index(employee_ids, name="employee_id"))
+    result["entitlement"] = config.ANNUAL_LEAVE_DAYS
+    result["used"] = per_status.get("approved", pd.Series(dtype=np.int64)).reindex(result.index, fill_value=0)
+    result["pending"] = per_status.get("pending", pd.Series(dtype=np.int64)).reindex(result.index, fill_value=0)
+    result["remaining"] = result["entitlement"] - result["used"]
+    return result.astype(np.int64)
+
+
+def balances(conn, year=None):
+    """Return a DataFrame of every employee's annual leave for ``year``
+
+    Indexed by employee_id with columns entitlement, used (approved working
+    days), pending (working days awaiting approval) and remaining
+    (entitlement minus used).
+    """
+    year = date.today().year if year is None else int(year)
+    return cache.get_cache().get_or_load(("leave_balances", year), TABLES, lambda: _compute(conn, year))
+
+
+def balance(conn, employee_id, year=None):
+    """Return one employee's balance as a dict, see ``balances``"""
+    table = balances(conn, year)
+    if employee_id not in table.index:
+        return {"entitlement": config.ANNUAL_LEAVE_DAYS, "used": 0, "pending": 0,
+                "remaining": config.ANNUAL_LEAVE_DAYS}
+    return {column: int(value) for column, value in table.loc[employee_id].items()}
+
+
+def check_request(conn, employee_id, jenis_cuti, start, end):
+    """Validate a new leave request; returns (working days, error message or None)"""
+    if end < start:
+        return 0, "Tanggal selesai tidak boleh sebelum tanggal mulai"
+    days = working_days(conn, start, end)
+    if days == 0:
+        return 0, "Periode cuti tidak mencakup hari kerja"
+    if jenis_cuti != ANNUAL_LEAVE:
+        return days, None
+
+    starts = np.array([start], dtype="datetime64[D]")
+    ends = np.array([end], dtype="datetime64[D]")
+    calendar = _calendar(conn)
+    for year in range(start.year, end.year + 1):
+        needed = int(_days_in_year(starts, ends, year, calendar)[0])
+        current = balance(conn, employee_id, year)
+        available = current["remaining"] - current["pending"]
+        if needed > available:
+            return days, (f"Sisa cuti tahunan {year} tidak cukup: butuh {needed} hari kerja, "
+                          f"tersedia {max(available, 0)} hari (termasuk pengajuan pending)")
+    return days, None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import bootstrap, get_db
+
+    parser = argparse.ArgumentParser(description="Kalender libur dan saldo cuti tahunan")
+    parser.add_argument("--year", type=int, default=date.today().year)
+    parser.add_argument("--add-holiday", nargs="+", metavar=("TANGGAL", "KETERANGAN"),
+                        help="tambah hari libur, mis. --add-holiday 2026-12-25 Natal")
+    args = parser.parse_args()
+
+    bootstrap(seed=False)
+    db = get_db()
+    if args.add_holiday:
+        day = date.fromisoformat(args.add_holiday[0]).isoformat()
+        with db.writer("holidays") as conn:
+            conn.execute("INSERT OR REPLACE INTO holidays (tanggal, keterangan) VALUES (?, ?)",
+                         (day, " ".join(args.add_holiday[1:]) or None))
+    with db.reader() as conn:
+        table = balances(conn, args.year)
+    print(f"{len(table)} karyawan, tahun {args.year}")
+    print(table.describe().loc[["mean", "min", "max"]].round(1).to_string())
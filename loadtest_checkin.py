@@ -0,0 +1,149 @@
+# loadtest_checkin.py
+"""Load test for checkin_server.py: sustained punches/sec and latency percentiles
+
+Simulates the morning rush: ``--concurrency`` terminals, each on its own
+keep-alive connection, send clock-ins for distinct employees as fast as the
+server answers. ``--repeat`` makes that fraction of taps repeat an earlier
+employee, to exercise the duplicate path.
+
+Usage:
+    python checkin_server.py &
+    python loadtest_checkin.py --punches 20000 --concurrency 64
+
+    # or start the server inside this process
+    HR_DB_PATH=load.db python loadtest_checkin.py --serve
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+import numpy as np
+
+import config
+
+
+def _employee_ids(limit):
+    from database import bootstrap, get_db
+
+    bootstrap(seed=False)
+    with get_db().reader() as conn:
+        return [row[0] for row in conn.execute("SELECT id FROM employees ORDER BY id LIMIT ?", (limit,))]
+
+
+def run(url, employee_ids, punches, concurrency, day, repeat=0.0, seed=0):
+    """Send ``punches`` clock-ins and return a report dict"""
+    parts = urlsplit(url)
+    rng = random.Random(seed)
+    # Clock-ins spread over 07:30-08:30, each employee once unless repeated
+    rush = datetime.combine(day, datetime.min.time()) + timedelta(hours=7, minutes=30)
+    plan = []
+    for i in range(punches):
+        if plan and rng.random() < repeat:
+            employee_id = plan[rng.randrange(len(plan))][0]
+        else:
+            employee_id = employee_ids[i % len(employee_ids)]
+        stamp = rush + timedelta(seconds=rng.randrange(3600))
+        plan.append((employee_id, stamp.isoformat(timespec="seconds")))
+
+    latencies = np.zeros(punches)
+    statuses = Counter()
+    lock = threading.Lock()
+    cursor = iter(range(punches))
+
+    def terminal():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        local = Counter()
+        while True:
+            with lock:
+                i = next(cursor, None)
+            if i is None:
+                break
+            employee_id, stamp = plan[i]
+            body = json.dumps({"employee_id": employee_id, "direction": "in", "timestamp": stamp})
+            started = time.perf_counter()
+            try:
+                conn.request("POST", "/punch", body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                payload = json.loads(response.read() or b"{}")
+                local[f"{response.status} {payload.get('status', payload.get('error', ''))}"] += 1
+            except (OSError, http.client.HTTPException) as e:
+                local[type(e).__name__] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            latencies[i] = time.perf_counter() - started
+        conn.close()
+        with lock:
+            statuses.update(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=terminal) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    ms = latencies * 1000
+    return {
+        "punches": punches, "concurrency": concurrency, "seconds": round(seconds, 3),
+        "punches_per_sec": round(punches / seconds, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2), "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2), "max_ms": round(float(ms.max()), 2),
+        "statuses": dict(statuses),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Uji beban layanan presensi (checkin_server.py)")
+    parser.add_argument("--url", default=f"http://{config.CHECKIN_HOST}:{config.CHECKIN_PORT}")
+    parser.add_argument("--punches", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--employees", type=int, default=100000, help="jumlah karyawan yang dipakai (dari database)")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--repeat", type=float, default=0.05, help="porsi tap berulang (duplikat)")
+    parser.add_argument("--serve", action="store_true", help="jalankan server di proses ini")
+    parser.add_argument("--output", help="simpan laporan sebagai JSON")
+    args = parser.parse_args(argv)
+
+    employee_ids = _employee_ids(args.employees)
+    if not employee_ids:
+        parser.error("database tidak memiliki karyawan; isi dulu dengan datagen.py")
+
+    server = None
+    if args.serve:
+        import checkin_server
+
+        parts = urlsplit(args.url)
+        server = checkin_server.CheckinServer((parts.hostname, parts.port))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        report = run(args.url, employee_ids, args.punches, args.concurrency, args.date, args.repeat)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.queue.stop()
+            server.server_close()
+    if server is not None:
+        report["server"] = server.queue.snapshot()
+
+    print(f"{report['punches']} punch, {report['concurrency']} koneksi, {report['seconds']:.1f} detik")
+    print(f"{report['punches_per_sec']:.0f} punch/detik; latensi p50 {report['p50_ms']:.1f} ms, "
+          f"p95 {report['p95_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms, maks {report['max_ms']:.1f} ms")
+    for status, count in sorted(report["statuses"].items()):
+        print(f"  {status}: {count}")
+    if "server" in report:
+        server_stats = report["server"]
+        print(f"  {server_stats['batches']} batch commit, {server_stats['rows']} baris absensi")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# migrations.py
+"""Ordered schema migrations tracked through PRAGMA user_version"""
+import archive
+import rollups
+import search
+import stats
+
+
+def _dedupe_attendance(conn):
+    """Keep only the latest attendance row per employee per day"""
+    conn.execute("""
+        DELETE FROM daily_attendances
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM daily_attendances GROUP BY employee_id, tanggal
+        )
+    """)
+
+
+def _checkpoint_fingerprints(conn):
+    """Add the file fingerprint to the ingest checkpoints
+
+    Older checkpoints cannot be matched to their file's content, so they are
+    dropped and those files are read again; replaying punches is harmless.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ingest_checkpoints)")}
+    if "fingerprint" not in columns:
+        conn.execute("ALTER TABLE ingest_checkpoints ADD COLUMN fingerprint TEXT")
+    if "fingerprint_bytes" not in columns:
+        conn.execute("ALTER TABLE ingest_checkpoints ADD COLUMN fingerprint_bytes INTEGER")
+    conn.execute("DELETE FROM ingest_checkpoints WHERE fingerprint IS NULL")
+
+
+# Each step is (version, description, actions). An action is either an SQL
+# string or a callable taking the connection. Steps must be idempotent so a
+# database that was partially upgraded by hand can still be migrated.
+MIGRATIONS = [
+    (1, "Indexes for dashboard filters", [
+        "CREATE INDEX IF NOT EXISTS idx_employees_department_status "
+        "ON employees (department_id, status_kerja)",
+        "CREATE INDEX IF NOT EXISTS idx_leave_submissions_status_created "
+        "ON leave_submissions (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_leave_submissions_employee_status "
+        "ON leave_submissions (employee_id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_leave_submissions_created "
+        "ON leave_submissions (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_contracts_status_end "
+        "ON contracts (status_kontrak, tanggal_berakhir)",
+        "CREATE INDEX IF NOT EXISTS idx_contracts_employee_status "
+        "ON contracts (employee_id, status_kontrak)",
+        "CREATE INDEX IF NOT EXISTS idx_educations_employee "
+        "ON educations (employee_id)",
+        "CREATE INDEX IF NOT EXISTS idx_certifications_employee "
+        "ON certifications (employee_id)",
+    ]),
+    (2, "One attendance row per employee per day", [
+        _dedupe_attendance,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_daily_attendances_employee_tanggal "
+        "ON daily_attendances (employee_id, tanggal)",
+        "CREATE INDEX IF NOT EXISTS idx_daily_attendances_tanggal "
+        "ON daily_attendances (tanggal)",
+    ]),
+    (3, "Trigger-maintained dashboard counters", [
+        stats.install,
+    ]),
+    (4, "Indexes for data grid sort keys", [
+        "CREATE INDEX IF NOT EXISTS idx_employees_nama "
+        "ON employees (nama_lengkap)",
+        "CREATE INDEX IF NOT EXISTS idx_employees_department_nama "
+        "ON employees (department_id, nama_lengkap)",
+        "CREATE INDEX IF NOT EXISTS idx_contracts_tanggal_berakhir "
+        "ON contracts (tanggal_berakhir)",
+        "CREATE INDEX IF NOT EXISTS idx_contracts_tanggal_mulai "
+        "ON contracts (tanggal_mulai)",
+    ]),
+    (5, "Checkpoints for resumable punch log ingestion", [
+        """
+        CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+            source TEXT PRIMARY KEY,
+            line INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (6, "Trigger-maintained attendance rollups", [
+        rollups.install,
+    ]),
+    (7, "Holiday calendar for working-day leave counts", [
+        """
+        CREATE TABLE IF NOT EXISTS holidays (
+            tanggal DATE PRIMARY KEY,
+            keterangan TEXT
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (8, "Watermarks of background jobs", [
+        """
+        CREATE TABLE IF NOT EXISTS job_runs (
+            job TEXT PRIMARY KEY,
+            watermark TEXT,
+            last_run TIMESTAMP,
+            last_rows INTEGER,
+            last_seconds REAL
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_leave_submissions_status_approved "
+        "ON leave_submissions (status, approved_date)",
+    ]),
+    (9, "Contracts ending soon, refreshed by the expiry job", [
+        """
+        CREATE TABLE IF NOT EXISTS expiring_contracts (
+            contract_id INTEGER PRIMARY KEY,
+            department_id INTEGER,
+            employee_id INTEGER NOT NULL,
+            nama_lengkap TEXT,
+            jenis_kontrak TEXT,
+            tanggal_berakhir DATE NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_expiring_contracts_department "
+        "ON expiring_contracts (department_id, tanggal_berakhir)",
+    ]),
+    (10, "Full-text employee search index", [
+        search.install,
+    ]),
+    (11, "Yearly attendance archive registry", [
+        archive.install,
+    ]),
+    (12, "Content fingerprints for ingest checkpoints", [
+        _checkpoint_fingerprints,
+    ]),
+]
+
+
+def current_version(conn):
+    """Return the schema version stored in the database header"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, migrations=None):
+    """Apply every pending migration, one transaction per step
+
+    Returns the list of versions that were applied.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    if conn.in_transaction:
+        conn.commit()
+
+    applied = []
+    version = current_version(conn)
+    for step_version, _description, actions in sorted(migrations, key=lambda m: m[0]):
+        if step_version <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for action in actions:
+                if callable(action):
+                    action(conn)
+                else:
+                    conn.execute(action)
+            conn.execute(f"PRAGMA user_version = {int(step_version)}")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        version = step_version
+        applied.append(step_version)
+
+    if applied:
+        # The archives attached to the connection are read-only and never change
+        conn.execute("ANALYZE main")
+    return applied
@@ -0,0 +1,141 @@
+# profiling.py
+"""Opt-in timing of named dashboard sections and cProfile capture
+
+``section(name)`` marks a block of a dashboard: it always tags the block's
+queries for tracing, and while profiling is enabled it also times the block.
+Timings of a completed rerun are added to process-wide samples, so the
+p50/p95 per page and section cover every session. A rerun can additionally
+be wrapped in cProfile. Its stats are written to ``config.PROFILE_DIR`` as
+a ``.prof`` file (pstats format, readable by snakeviz, flameprof or
+gprof2dot) plus a plain-text summary.
+
+Reruns cut short by ``st.rerun()`` are not sampled, since they only ran
+part of the page.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+import config
+import tracing
+
+MAX_SAMPLES = 500
+
+_enabled = config.PROFILE_ENABLED
+_timings = ContextVar("profile_timings", default=None)
+_path = ContextVar("profile_path", default=())
+
+_lock = threading.Lock()
+# section name -> recent durations in ms
+_samples = {}
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    """Switch section timing on or off for the whole process"""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+@contextmanager
+def section(name):
+    """Mark a named dashboard section for tracing and, if enabled, timing"""
+    with tracing.section(name):
+        timings = _timings.get()
+        if timings is None:
+            yield
+            return
+        path = _path.get() + (name,)
+        token = _path.set(path)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings.append((" / ".join(path), (time.perf_counter() - started) * 1000))
+            _path.reset(token)
+
+
+@contextmanager
+def run(profile=False):
+    """Time the sections of one rerun, optionally under cProfile
+
+    Yields a dict that receives ``timings`` (list of (section, ms)) and,
+    when profiled, ``profile_path``.
+    """
+    result = {"timings": []}
+    if not (_enabled or profile):
+        yield result
+        return
+
+    token = _timings.set(result["timings"])
+    profiler = cProfile.Profile() if profile else None
+    completed = False
+    try:
+        if profiler:
+            profiler.enable()
+        yield result
+        completed = True
+    finally:
+        if profiler:
+            profiler.disable()
+        _timings.reset(token)
+        if profiler:
+            result["profile_path"] = _save_profile(profiler, result["timings"])
+        if completed and _enabled:
+            with _lock:
+                for name, ms in result["timings"]:
+                    _samples.setdefault(name, deque(maxlen=MAX_SAMPLES)).append(ms)
+
+
+def _save_profile(profiler, timings):
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    page = next((name for name, _ms in reversed(timings) if " / " not in name), "rerun")
+    slug = re.sub(r"[^A-Za-z0-9_]+", "_", page).strip("_") or "rerun"
+    base = os.path.join(config.PROFILE_DIR, f"{datetime.now():%Y%m%d_%H%M%S_%f}_{slug}")
+    profiler.dump_stats(base + ".prof")
+
+    summary = io.StringIO()
+    summary.write("".join(f"{ms:10.1f} ms  {name}\n" for name, ms in timings) + "\n")
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(60)
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(summary.getvalue())
+    return base + ".prof"
+
+
+def _percentile(ordered, q):
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary():
+    """Return [{section, samples, p50_ms, p95_ms, max_ms}] sorted by section"""
+    with _lock:
+        items = [(name, sorted(values)) for name, values in _samples.items()]
+    return [{"section": name, "samples": len(ordered), "p50_ms": _percentile(ordered, 0.5),
+             "p95_ms": _percentile(ordered, 0.95), "max_ms": ordered[-1]}
+            for name, ordered in sorted(items)]
+
+
+def saved_profiles(limit=10):
+    """Return the paths of the most recent .prof files"""
+    if not os.path.isdir(config.PROFILE_DIR):
+        return []
+    names = sorted((n for n in os.listdir(config.PROFILE_DIR) if n.endswith(".prof")), reverse=True)
+    return [os.path.join(config.PROFILE_DIR, n) for n in names[:limit]]
+
+
+def reset():
+    """Forget all collected samples"""
+    with _lock:
+        _samples.clear()
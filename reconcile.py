@@ -0,0 +1,147 @@
+# reconcile.py
+"""Reconciliation of approved leave and missing punches into attendance
+
+Two set-based statements, each an INSERT over a recursive CTE that expands
+dates inside SQLite, so the rows are produced and written in one pass:
+
+* every working day of an approved leave becomes a ``cuti`` row linked
+  through ``leave_submission_id`` (the earliest request when approved
+  requests overlap). A day the employee did punch in keeps its punches.
+* every working day without any attendance row becomes an ``alpha`` row
+  (unexplained absence) for each active employee.
+
+Working days follow ``config.LEAVE_WEEKMASK`` and the ``holidays`` table,
+as in leave_balance.py. Both steps are incremental. Leave is expanded for
+requests approved since the previous run. Absences are marked for the days
+after the last reconciled day up to yesterday, since today's punches may
+still arrive. Progress is kept in ``job_runs`` in the same transaction as
+the rows.
+
+Usage: python reconcile.py [--since YYYY-MM-DD] [--until YYYY-MM-DD]
+"""
+import time
+from datetime import date, timedelta
+
+import config
+import jobs
+
+LEAVE = "cuti"
+ABSENT = "alpha"
+
+LEAVE_JOB = "reconcile.leave"
+ABSENCE_JOB = "reconcile.absence"
+
+# Longest leave range expanded, guarding against a mistyped end date
+MAX_LEAVE_DAYS = 366
+
+_WORKING_DAY = """
+    substr(:weekmask, (CAST(strftime('%w', {d}) AS INTEGER) + 6) % 7 + 1, 1) = '1'
+    AND {d} NOT IN (SELECT tanggal FROM holidays)
+"""
+
+_LEAVE_SQL = f"""
+    INSERT INTO daily_attendances (employee_id, tanggal, status, leave_submission_id)
+    WITH RECURSIVE days (leave_id, employee_id, tanggal, selesai) AS (
+        SELECT id, employee_id, date(tanggal_mulai),
+               MIN(date(tanggal_selesai), date(tanggal_mulai, '+{MAX_LEAVE_DAYS - 1} days'))
+        FROM leave_submissions
+        WHERE status = 'approved' AND (:since IS NULL OR approved_date >= :since)
+        UNION ALL
+        SELECT leave_id, employee_id, date(tanggal, '+1 day'), selesai
+        FROM days
+        WHERE tanggal < selesai
+    )
+    SELECT employee_id, tanggal, '{LEAVE}', leave_id
+    FROM days
+    WHERE {_WORKING_DAY.format(d="tanggal")}
+    ON CONFLICT (employee_id, tanggal) DO UPDATE SET
+        status = excluded.status,
+        leave_submission_id = excluded.leave_submission_id,
+        keterangan = NULL
+    WHERE daily_attendances.jam_masuk IS NULL AND daily_attendances.jam_pulang IS NULL
+      AND (daily_attendances.leave_submission_id IS NULL
+           OR excluded.leave_submission_id < daily_attendances.leave_submission_id)
+"""
+
+_ABSENCE_SQL = f"""
+    INSERT INTO daily_attendances (employee_id, tanggal, status, keterangan)
+    WITH RECURSIVE days (tanggal) AS (
+        SELECT date(:start)
+        UNION ALL
+        SELECT date(tanggal, '+1 day') FROM days WHERE tanggal < :end
+    )
+    SELECT e.id, d.tanggal, '{ABSENT}', 'Tidak ada presensi'
+    FROM days d
+    JOIN employees e ON e.status_kerja = 'aktif' AND (e.tanggal_masuk IS NULL OR e.tanggal_masuk <= d.tanggal)
+    WHERE {_WORKING_DAY.format(d="d.tanggal")}
+    ON CONFLICT (employee_id, tanggal) DO NOTHING
+"""
+
+
+def expand_leave(conn):
+    """Insert the working days of leave approved since the last run
+
+    Returns the number of attendance rows inserted or converted.
+    """
+    started = time.perf_counter()
+    since = jobs.get_watermark(conn, LEAVE_JOB)
+    rows = conn.execute(_LEAVE_SQL, {"since": since, "weekmask": config.LEAVE_WEEKMASK}).rowcount
+    # Approvals later on the same day are picked up again next time
+    latest = conn.execute("""
+        SELECT MAX(approved_date) FROM leave_submissions
+        WHERE status = 'approved' AND (? IS NULL OR approved_date >= ?)
+    """, (since, since)).fetchone()[0]
+    jobs.save_run(conn, LEAVE_JOB, latest or since, rows, time.perf_counter() - started)
+    return rows
+
+
+def mark_absences(conn, since=None, until=None):
+    """Mark working days without attendance as absent, from ``since`` to ``until``
+
+    ``since`` defaults to the day after the last reconciled day (yesterday
+    on the first run), ``until`` to yesterday. Returns (rows, start, end)
+    with start/end as ISO dates, both None when there was nothing to do.
+    """
+    started = time.perf_counter()
+    end = until or date.today() - timedelta(days=1)
+    if since is None:
+        last = jobs.get_watermark(conn, ABSENCE_JOB)
+        since = date.fromisoformat(last) + timedelta(days=1) if last else end
+    if since > end:
+        return 0, None, None
+    rows = conn.execute(_ABSENCE_SQL, {"start": since.isoformat(), "end": end.isoformat(),
+                                       "weekmask": config.LEAVE_WEEKMASK}).rowcount
+    last = jobs.get_watermark(conn, ABSENCE_JOB)
+    watermark = max(last, end.isoformat()) if last else end.isoformat()
+    jobs.save_run(conn, ABSENCE_JOB, watermark, rows, time.perf_counter() - started)
+    return rows, since.isoformat(), end.isoformat()
+
+
+def reconcile(since=None, until=None):
+    """Run both steps in one write transaction and return a report dict"""
+    from database import get_db
+
+    started = time.perf_counter()
+    with get_db().writer("daily_attendances", "job_runs") as conn:
+        leave_rows = expand_leave(conn)
+        absences, start, end = mark_absences(conn, since, until)
+    return {"leave_days": leave_rows, "absences": absences, "start": start, "end": end,
+            "seconds": time.perf_counter() - started}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import bootstrap
+
+    parser = argparse.ArgumentParser(description="Rekonsiliasi cuti dan ketidakhadiran ke daily_attendances")
+    parser.add_argument("--since", type=date.fromisoformat, default=None,
+                        help="tandai ketidakhadiran mulai tanggal ini (default: sejak run terakhir)")
+    parser.add_argument("--until", type=date.fromisoformat, default=None,
+                        help="tandai ketidakhadiran sampai tanggal ini (default: kemarin)")
+    args = parser.parse_args()
+
+    bootstrap(seed=False)
+    report = reconcile(args.since, args.until)
+    print(f"{report['leave_days']} hari cuti, {report['absences']} ketidakhadiran "
+          f"({report['start'] or '-'} s/d {report['end'] or '-'}) dalam {report['seconds']:.1f} detik")
@@ -0,0 +1,251 @@
+# rollups.py
+"""Trigger-maintained attendance rollups for charts and reports
+
+Two tables summarise ``daily_attendances`` keyed by
+(scope, scope_key, period, status):
+
+* ``attendance_daily``   - ``department`` / dept id, period ``YYYY-MM-DD``
+* ``attendance_monthly`` - ``employee`` / employee id and ``department`` /
+  dept id, period ``YYYY-MM``
+
+Each row holds the number of attendance days, late arrivals (``jam_masuk``
+after ``config.ATTENDANCE_LATE_AFTER``) and minutes worked. A per-employee
+daily rollup would be a copy of ``daily_attendances`` itself, whose unique
+(employee_id, tanggal) index already serves that grain.
+
+Like the counters in stats.py, triggers add and subtract each attendance row
+as it is written, and the department rollups follow an employee who moves to
+another department. The late threshold is compiled into the triggers, so
+after changing it run ``python rollups.py --rebuild``.
+
+Rollups of archived years (archive.py) are frozen: the move triggers only
+see the hot table, and the rebuild keeps the archived years' rows as they
+were and recomputes the rest.
+"""
+import config
+
+EMPLOYEE = "employee"
+DEPARTMENT = "department"
+
+TABLES = ("attendance_daily", "attendance_monthly")
+# Tables the rollups are derived from, for cache invalidation
+SOURCES = ("daily_attendances", "employees")
+
+_EMPLOYEE_DEPT = "(SELECT department_id FROM employees WHERE id = {r}.employee_id)"
+
+# table -> (period expression, [(scope, key expression), ...])
+# ``{r}`` is replaced with NEW/OLD inside triggers and with the table alias
+# when the rollups are rebuilt from scratch.
+ROLLUPS = {
+    "attendance_daily": ("{r}.tanggal", [
+        (DEPARTMENT, _EMPLOYEE_DEPT),
+    ]),
+    "attendance_monthly": ("substr({r}.tanggal, 1, 7)", [
+        (EMPLOYEE, "{r}.employee_id"),
+        (DEPARTMENT, _EMPLOYEE_DEPT),
+    ]),
+}
+
+_WATCHED_COLUMNS = "employee_id, tanggal, status, jam_masuk, jam_pulang"
+
+
+def _measures(row):
+    """SQL for (status, late, minutes) of one attendance row"""
+    late_after = config.ATTENDANCE_LATE_AFTER.replace("'", "")
+    return (
+        f"COALESCE({row}.status, '')",
+        f"COALESCE({row}.jam_masuk > '{late_after}', 0)",
+        f"COALESCE(MAX(0, CAST(ROUND((julianday({row}.jam_pulang) - julianday({row}.jam_masuk)) * 1440)"
+        f" AS INTEGER)), 0)",
+    )
+
+
+def _upsert(table, select):
+    return f"""
+        INSERT INTO {table} (scope, scope_key, period, status, days, late, minutes)
+        {select}
+        ON CONFLICT (scope, scope_key, period, status) DO UPDATE SET
+            days = days + excluded.days,
+            late = late + excluded.late,
+            minutes = minutes + excluded.minutes;"""
+
+
+def _row_deltas(row, sign):
+    status, late, minutes = _measures(row)
+    statements = []
+    for table, (period, scopes) in ROLLUPS.items():
+        for scope, key in scopes:
+            key = key.format(r=row)
+            statements.append(_upsert(table, f"""
+        SELECT '{scope}', {key}, {period.format(r=row)}, {status}, {sign}, {sign} * {late}, {sign} * {minutes}
+        WHERE ({key}) IS NOT NULL"""))
+    return statements
+
+
+def _follow_deltas(row, sign):
+    """Move an employee's hot attendance into or out of a department"""
+    status, late, minutes = _measures("a")
+    statements = []
+    for table, (period, scopes) in ROLLUPS.items():
+        if not any(scope == DEPARTMENT for scope, _key in scopes):
+            continue
+        period = period.format(r="a")
+        statements.append(_upsert(table, f"""
+        SELECT '{DEPARTMENT}', {row}.department_id, {period}, {status},
+               {sign} * COUNT(*), {sign} * SUM({late}), {sign} * SUM({minutes})
+        FROM daily_attendances a
+        WHERE a.employee_id = {row}.id AND {row}.department_id IS NOT NULL
+        GROUP BY {period}, {status}"""))
+    return statements
+
+
+def _trigger_sql():
+    triggers = {
+        "trg_rollups_attendance_insert": ("AFTER INSERT ON daily_attendances", _row_deltas("NEW", "1")),
+        "trg_rollups_attendance_delete": ("AFTER DELETE ON daily_attendances", _row_deltas("OLD", "-1")),
+        "trg_rollups_attendance_update": (
+            f"AFTER UPDATE OF {_WATCHED_COLUMNS} ON daily_attendances",
+            _row_deltas("OLD", "-1") + _row_deltas("NEW", "1"),
+        ),
+        "trg_rollups_employees_move": (
+            "AFTER UPDATE OF department_id ON employees "
+            "WHEN OLD.department_id IS NOT NEW.department_id",
+            _follow_deltas("OLD", "-1") + _follow_deltas("NEW", "1"),
+        ),
+        "trg_rollups_employees_delete": ("AFTER DELETE ON employees", _follow_deltas("OLD", "-1")),
+    }
+    return {
+        name: f"CREATE TRIGGER {name} {event} BEGIN{''.join(body)}\nEND"
+        for name, (event, body) in triggers.items()
+    }
+
+
+def _outside(column, frozen):
+    """SQL condition: ``column`` is a period outside the ``frozen`` years"""
+    if not frozen:
+        return "1"
+    years = ", ".join(f"'{int(year):04d}'" for year in frozen)
+    return f"substr({column}, 1, 4) NOT IN ({years})"
+
+
+def rebuild_rollups(conn, frozen=()):
+    """Recompute the rollups from ``daily_attendances``
+
+    Rows for the ``frozen`` years are kept as they are; pass the archived
+    years, whose attendance is no longer in the table. Takes two passes
+    over the attendance table; the department months are summed from the
+    employee months instead of a third pass.
+    """
+    status, late, minutes = _measures("r")
+    for table in ROLLUPS:
+        conn.execute(f"DELETE FROM {table} WHERE {_outside('period', frozen)}")
+    conn.execute(f"""
+        INSERT INTO attendance_monthly (scope, scope_key, period, status, days, late, minutes)
+        SELECT '{EMPLOYEE}', r.employee_id, substr(r.tanggal, 1, 7), {status},
+               COUNT(*), SUM({late}), SUM({minutes})
+        FROM daily_attendances r
+        GROUP BY r.employee_id, substr(r.tanggal, 1, 7), {status}
+    """)
+    conn.execute(f"""
+        INSERT INTO attendance_daily (scope, scope_key, period, status, days, late, minutes)
+        SELECT '{DEPARTMENT}', e.department_id, r.tanggal, {status},
+               COUNT(*), SUM({late}), SUM({minutes})
+        FROM daily_attendances r
+        JOIN employees e ON e.id = r.employee_id
+        WHERE e.department_id IS NOT NULL
+        GROUP BY e.department_id, r.tanggal, {status}
+    """)
+    conn.execute(f"""
+        INSERT INTO attendance_monthly (scope, scope_key, period, status, days, late, minutes)
+        SELECT '{DEPARTMENT}', e.department_id, m.period, m.status,
+               SUM(m.days), SUM(m.late), SUM(m.minutes)
+        FROM attendance_monthly m
+        JOIN employees e ON m.scope_key = CAST(e.id AS TEXT)
+        WHERE m.scope = '{EMPLOYEE}' AND e.department_id IS NOT NULL AND {_outside('m.period', frozen)}
+        GROUP BY e.department_id, m.period, m.status
+    """)
+
+
+def install(conn, frozen=()):
+    """Create the rollup tables and triggers, then backfill the rollups
+
+    ``frozen`` is passed on to ``rebuild_rollups``.
+    """
+    for table in ROLLUPS:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                scope TEXT NOT NULL,
+                scope_key TEXT NOT NULL,
+                period TEXT NOT NULL,
+                status TEXT NOT NULL,
+                days INTEGER NOT NULL DEFAULT 0,
+                late INTEGER NOT NULL DEFAULT 0,
+                minutes INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, scope_key, period, status)
+            ) WITHOUT ROWID
+        """)
+    # Company-wide daily trends filter on the day across all departments
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_daily_period ON attendance_daily (period)")
+    for name, sql in _trigger_sql().items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(sql)
+    rebuild_rollups(conn, frozen)
+
+
+def forget_year(conn, year):
+    """Delete every rollup row of ``year``, e.g. before its rows are counted again"""
+    first, after = f"{int(year):04d}", f"{int(year) + 1:04d}"
+    for table in ROLLUPS:
+        conn.execute(f"DELETE FROM {table} WHERE period >= ? AND period < ?", (first, after))
+
+
+def month_totals(conn, scope, scope_key, period):
+    """Return {status: {days, late, minutes}} of one scope for a month"""
+    rows = conn.execute(
+        "SELECT status, days, late, minutes FROM attendance_monthly "
+        "WHERE scope = ? AND scope_key = ? AND period = ? AND days > 0",
+        (scope, str(scope_key), period),
+    ).fetchall()
+    return {status: {"days": days, "late": late, "minutes": minutes} for status, days, late, minutes in rows}
+
+
+def recent_cutoff(conn, dept_id, limit):
+    """Return the latest day from which a department has at least ``limit`` attendance rows
+
+    Bounds "latest N rows" queries to a short date range instead of sorting
+    the department's whole history. Returns '' when it has fewer rows.
+    """
+    row = conn.execute("""
+        SELECT period FROM (
+            SELECT period, SUM(SUM(days)) OVER (ORDER BY period DESC) AS running
+            FROM attendance_daily
+            WHERE scope = ? AND scope_key = ?
+            GROUP BY period
+        )
+        WHERE running >= ?
+        ORDER BY period DESC
+        LIMIT 1
+    """, (DEPARTMENT, str(dept_id), limit)).fetchone()
+    return row[0] if row else ""
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import archive
+    from database import bootstrap, get_db
+
+    parser = argparse.ArgumentParser(description="Rollup absensi harian dan bulanan")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="pasang ulang trigger dan hitung ulang rollup dari daily_attendances "
+                             "(rollup tahun yang diarsipkan tidak diubah)")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("tidak ada perintah; gunakan --rebuild")
+
+    bootstrap(seed=False)
+    with get_db().writer(*TABLES) as conn:
+        install(conn, [year for year, _file in archive.archived(conn)])
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+    for table, count in counts.items():
+        print(f"{table:>20}: {count}")
@@ -0,0 +1,251 @@
+# schema.py
+"""Base table definitions, database initialisation and demo data"""
+from datetime import datetime, timedelta
+
+from auth import hash_password
+from migrations import migrate
+
+
+def init_database(conn):
+    """Initialize SQLite database with all tables"""
+    create_tables(conn)
+    migrate(conn)
+
+
+def create_tables(conn):
+    """Create every table that does not exist yet"""
+    c = conn.cursor()
+    
+    # Table users (with roles)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            role TEXT NOT NULL,
+            employee_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )
+    ''')
+    
+    # Table departments
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kode_department TEXT UNIQUE NOT NULL,
+            nama_department TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Table employees
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS employees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nama_lengkap TEXT NOT NULL,
+            nik TEXT UNIQUE NOT NULL,
+            tempat_lahir TEXT,
+            tanggal_lahir DATE,
+            jenis_kelamin TEXT,
+            alamat TEXT,
+            telepon TEXT,
+            email TEXT UNIQUE,
+            status_pernikahan TEXT,
+            agama TEXT,
+            jabatan TEXT,
+            department_id INTEGER,
+            status_kerja TEXT,
+            foto_path TEXT,
+            tanggal_masuk DATE,
+            user_id INTEGER,
+            FOREIGN KEY (department_id) REFERENCES departments(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    
+    # Table educations
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS educations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            jenjang TEXT NOT NULL,
+            nama_institusi TEXT NOT NULL,
+            jurusan TEXT,
+            tahun_masuk INTEGER,
+            tahun_lulus INTEGER,
+            file_ijazah_path TEXT,
+            FOREIGN KEY (employee_id) REFERENCES employees(id)
+        )
+    ''')
+    
+    # Table certifications
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS certifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            nama_sertifikat TEXT NOT NULL,
+            penerbit TEXT,
+            tahun INTEGER,
+            file_sertifikat_path TEXT,
+            FOREIGN KEY (employee_id) REFERENCES employees(id)
+        )
+    ''')
+    
+    # Table contracts
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS contracts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            tanggal_mulai DATE NOT NULL,
+            tanggal_berakhir DATE NOT NULL,
+            jenis_kontrak TEXT NOT NULL,
+            status_kontrak TEXT,
+            keterangan TEXT,
+            file_kontrak_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees(id)
+        )
+    ''')
+    
+    # Table leave_submissions
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS leave_submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            tanggal_mulai DATE NOT NULL,
+            tanggal_selesai DATE NOT NULL,
+            jenis_cuti TEXT NOT NULL,
+            alasan TEXT,
+            file_pendukung_path TEXT,
+            status TEXT DEFAULT 'pending',
+            approved_by INTEGER,
+            approved_date DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees(id),
+            FOREIGN KEY (approved_by) REFERENCES employees(id)
+        )
+    ''')
+    
+    # Table daily_attendances
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS daily_attendances (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            tanggal DATE NOT NULL,
+            jam_masuk TIME,
+            jam_pulang TIME,
+            status TEXT,
+            keterangan TEXT,
+            leave_submission_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees(id),
+            FOREIGN KEY (leave_submission_id) REFERENCES leave_submissions(id)
+        )
+    ''')
+
+
+def create_dummy_data(conn):
+    """Create dummy data for the system"""
+    c = conn.cursor()
+    
+    # Check if data already exists
+    c.execute("SELECT COUNT(*) FROM users")
+    if c.fetchone()[0] > 0:
+        return
+    
+    # Create departments
+    departments = [
+        ('DEPT001', 'HR Department'),
+        ('DEPT002', 'IT Department'),
+        ('DEPT003', 'Finance Department'),
+        ('DEPT004', 'Marketing Department'),
+        ('DEPT005', 'Operations Department')
+    ]
+    
+    c.executemany("INSERT INTO departments (kode_department, nama_department) VALUES (?, ?)", departments)
+    
+    # Create admin user
+    admin_password = hash_password("admin123")
+    c.execute("INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)",
+              ("admin", admin_password, "admin@hrsystem.com", "admin"))
+    
+    # Create manager users
+    managers = [
+        ("manager_hr", "manager123", "hr_manager@hrsystem.com", "manager", 1),
+        ("manager_it", "manager123", "it_manager@hrsystem.com", "manager", 2),
+        ("manager_fin", "manager123", "fin_manager@hrsystem.com", "manager", 3)
+    ]
+    
+    for manager in managers:
+        hashed_pwd = hash_password(manager[1])
+        c.execute("INSERT INTO users (username, password, email, role, employee_id) VALUES (?, ?, ?, ?, ?)",
+                  (manager[0], hashed_pwd, manager[2], manager[3], manager[4]))
+    
+    # Create employee users and employees
+    employee_data = []
+    for i in range(1, 21):
+        nama = f"Employee {i}"
+        nik = f"NIK{i:03d}"
+        dept_id = (i % 5) + 1  # Distribute across 5 departments
+        
+        # Insert employee
+        c.execute('''
+            INSERT INTO employees (
+                nama_lengkap, nik, tempat_lahir, tanggal_lahir, jenis_kelamin,
+                alamat, telepon, email, status_pernikahan, agama, jabatan,
+                department_id, status_kerja, tanggal_masuk
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            nama, nik, "Jakarta", "1990-01-01", "Laki-laki" if i % 2 == 0 else "Perempuan",
+            f"Jl. Example No.{i}", f"0812345678{i:02d}", f"employee{i}@company.com",
+            "Menikah" if i % 3 == 0 else "Belum Menikah", "Islam",
+            f"Staff {['IT', 'Finance', 'Marketing', 'HR', 'Operations'][dept_id-1]}",
+            dept_id, "aktif", "2023-01-01"
+        ))
+        
+        employee_id = c.lastrowid
+        
+        # Create user for employee
+        username = f"emp{i:03d}"
+        password = hash_password("employee123")
+        c.execute("INSERT INTO users (username, password, email, role, employee_id) VALUES (?, ?, ?, ?, ?)",
+                  (username, password, f"emp{i}@company.com", "employee", employee_id))
+        
+        # Add education data
+        if i % 2 == 0:
+            c.execute('''
+                INSERT INTO educations (employee_id, jenjang, nama_institusi, jurusan, tahun_masuk, tahun_lulus)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (employee_id, "S1", "Universitas Indonesia", "Teknik Informatika", 2010, 2014))
+        
+        # Add contract data
+        start_date = datetime(2023, 1, 1) + timedelta(days=i*30)
+        end_date = start_date + timedelta(days=365)
+        c.execute('''
+            INSERT INTO contracts (employee_id, tanggal_mulai, tanggal_berakhir, jenis_kontrak, status_kontrak)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (employee_id, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), "PKWT", "aktif"))
+    
+    # Add some leave submissions
+    for i in range(1, 6):
+        start_date = datetime.now() + timedelta(days=i)
+        end_date = start_date + timedelta(days=2)
+        c.execute('''
+            INSERT INTO leave_submissions (employee_id, tanggal_mulai, tanggal_selesai, jenis_cuti, alasan, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (i, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), 
+              "Cuti Tahunan", f"Liburan keluarga {i}", "pending"))
+    
+    # Add attendance data for last 7 days
+    for emp_id in range(1, 6):
+        for day in range(7):
+            date = datetime.now() - timedelta(days=day)
+            if date.weekday() < 5:  # Weekdays only
+                c.execute('''
+                    INSERT INTO daily_attendances (employee_id, tanggal, jam_masuk, jam_pulang, status)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (emp_id, date.strftime("%Y-%m-%d"), "08:00:00", "17:00:00", "hadir"))
+    
+    conn.commit()
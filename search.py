@@ -0,0 +1,157 @@
+# search.py
+"""FTS5 full-text index over employees for search and typeahead
+
+``employee_search`` holds nama_lengkap, nik, jabatan, email and the
+department name of every employee. The FTS rowid is the employee id.
+Triggers on ``employees`` and ``departments`` keep it in step with every
+write, the same way the counters in stats.py are kept. The department name
+comes from a join, so the index stores its own copy of the text rather than
+reading it from an external content table. That copy is small next to the
+employees table.
+
+Every word typed becomes a prefix term, and all of them must match. A
+search for "bud 3201" finds Budi Santoso with NIK 3201.... Prefix indexes
+on 2 and 3 characters keep short typeahead prefixes fast. Results are
+ranked with bm25, weighting name and NIK matches above jabatan, email and
+department. A very broad prefix only ranks the first ``MAX_CANDIDATES``
+matches, which keeps every keystroke in the millisecond range.
+
+Usage: python search.py "budi santoso" [--rebuild]
+"""
+import re
+
+TABLE = "employee_search"
+COLUMNS = ("nama_lengkap", "nik", "jabatan", "email", "nama_department")
+# bm25 weight per column, in COLUMNS order
+WEIGHTS = (10.0, 8.0, 3.0, 2.0, 1.0)
+DEFAULT_LIMIT = 20
+MAX_CANDIDATES = 1000
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_DEPARTMENT_NAME = "(SELECT nama_department FROM departments WHERE id = NEW.department_id)"
+_INDEX_NEW = f"""
+    INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)})
+    VALUES (NEW.id, NEW.nama_lengkap, NEW.nik, NEW.jabatan, NEW.email, {_DEPARTMENT_NAME});
+"""
+
+_TRIGGERS = {
+    "trg_employee_search_insert": f"""
+        CREATE TRIGGER trg_employee_search_insert AFTER INSERT ON employees
+        BEGIN
+            {_INDEX_NEW}
+        END
+    """,
+    "trg_employee_search_update": f"""
+        CREATE TRIGGER trg_employee_search_update
+        AFTER UPDATE OF nama_lengkap, nik, jabatan, email, department_id ON employees
+        BEGIN
+            DELETE FROM {TABLE} WHERE rowid = OLD.id;
+            {_INDEX_NEW}
+        END
+    """,
+    "trg_employee_search_delete": f"""
+        CREATE TRIGGER trg_employee_search_delete AFTER DELETE ON employees
+        BEGIN
+            DELETE FROM {TABLE} WHERE rowid = OLD.id;
+        END
+    """,
+    "trg_employee_search_department": f"""
+        CREATE TRIGGER trg_employee_search_department
+        AFTER UPDATE OF nama_department ON departments
+        BEGIN
+            UPDATE {TABLE} SET nama_department = NEW.nama_department
+            WHERE rowid IN (SELECT id FROM employees WHERE department_id = NEW.id);
+        END
+    """,
+}
+
+
+def rebuild_index(conn):
+    """Refill the index from the employees table"""
+    conn.execute(f"DELETE FROM {TABLE}")
+    conn.execute(f"""
+        INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)})
+        SELECT e.id, e.nama_lengkap, e.nik, e.jabatan, e.email, d.nama_department
+        FROM employees e
+        LEFT JOIN departments d ON e.department_id = d.id
+    """)
+    conn.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def install(conn):
+    """Create the index and its triggers, then fill it"""
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+            {', '.join(COLUMNS)},
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    # Persist the column weights so ORDER BY rank uses them
+    weights = ", ".join(str(w) for w in WEIGHTS)
+    conn.execute(f"INSERT INTO {TABLE} ({TABLE}, rank) VALUES ('rank', 'bm25({weights})')")
+    for name, sql in _TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(sql)
+    rebuild_index(conn)
+
+
+def match_query(text):
+    """Turn free text into an FTS5 query of prefix terms, or None if it has no words"""
+    words = _WORD.findall(text or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search(conn, text, limit=DEFAULT_LIMIT, dept_id=None):
+    """Return the best matches for ``text``
+
+    Rows are (id, nama_lengkap, nik, jabatan, nama_department), best first.
+    ``dept_id`` restricts the results to one department.
+    """
+    query = match_query(text)
+    if query is None:
+        return []
+    where, params = f"{TABLE} MATCH ?", [query]
+    if dept_id is not None:
+        # The unary + keeps the IN list from being handed to FTS5 as a rowid
+        # constraint, which would rerun the MATCH once per employee
+        where += " AND +s.rowid IN (SELECT id FROM employees WHERE department_id = ?)"
+        params.append(dept_id)
+    # bm25 has to score every match before ORDER BY rank can pick the best, which
+    # for a one- or two-letter prefix is most of the table. Only the first
+    # MAX_CANDIDATES matches are ranked; typing more letters narrows the set.
+    return conn.execute(f"""
+        SELECT id, nama_lengkap, nik, jabatan, nama_department FROM (
+            SELECT s.rowid AS id, s.nama_lengkap, s.nik, s.jabatan, s.nama_department, s.rank
+            FROM {TABLE} s WHERE {where} LIMIT ?
+        )
+        ORDER BY rank LIMIT ?
+    """, params + [MAX_CANDIDATES, limit]).fetchall()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from database import bootstrap, get_db
+
+    parser = argparse.ArgumentParser(description="Cari karyawan lewat indeks full-text")
+    parser.add_argument("text", nargs="?", default="")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--rebuild", action="store_true", help="isi ulang indeks dari tabel employees")
+    args = parser.parse_args()
+
+    bootstrap(seed=False)
+    if args.rebuild:
+        with get_db().writer(TABLE) as conn:
+            rebuild_index(conn)
+    with get_db().reader() as conn:
+        started = time.perf_counter()
+        rows = search(conn, args.text, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+    for row in rows:
+        print(" | ".join("-" if value is None else str(value) for value in row))
+    print(f"{len(rows)} hasil dalam {elapsed:.1f} ms")
@@ -0,0 +1,46 @@
+# sections.py
+"""Lazily rendered dashboard tabs and memoisation of their data"""
+import streamlit as st
+
+import cache
+import fanout
+import profiling
+
+
+def render_tabs(key, sections):
+    """Render tabs, running only the body of the selected one
+
+    ``sections`` is a list of (label, render) pairs. Switching tabs triggers
+    a rerun, so the queries of tabs nobody is looking at never execute.
+    """
+    tabs = st.tabs([label for label, _ in sections], key=key, on_change="rerun")
+    for tab, (label, render) in zip(tabs, sections):
+        if tab.open:
+            with tab, profiling.section(label):
+                render()
+
+
+def memo(key, tables, loader, scope=cache.GLOBAL_SCOPE):
+    """Return ``loader()`` from the shared cache until ``tables`` change
+
+    The result is shared with every session using the same ``scope``, so
+    ``key`` must capture everything the loader depends on.
+    """
+    return cache.get_cache().get_or_load(("section",) + tuple(key), tables, loader, scope)
+
+
+def gather(loaders, defaults=None):
+    """Run ``{name: fn(conn)}`` in parallel (fanout.py) and return ``{name: value}``
+
+    A loader that fails or times out gets its entry in ``defaults`` (None if
+    missing) and a warning on the page; the other results are still shown.
+    """
+    defaults = defaults or {}
+    values = {}
+    for name, result in fanout.gather(loaders).items():
+        if result.error is not None:
+            st.warning(f"Data '{name}' gagal dimuat: {result.error}")
+            values[name] = defaults.get(name)
+        else:
+            values[name] = result.value
+    return values
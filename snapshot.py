@@ -0,0 +1,330 @@
+# snapshot.py
+"""Columnar analytics snapshot in memory-mapped NumPy files
+
+``build`` copies the columns the reports need out of SQLite into one
+``.npy`` file per column, inside a single read transaction so the snapshot
+is consistent. Rows are streamed in chunks into preallocated memmaps, so
+building needs little memory. Text columns such as department, status and
+jenis_cuti are stored as int16 category codes. The labels go into
+``manifest.json`` and -1 stands for NULL. Dates are datetime64[D], with
+NaT for NULL.
+
+Each build goes into a new directory under ``config.SNAPSHOT_DIR``. The
+``CURRENT`` file is then switched atomically, so readers never see a half
+written snapshot. ``load`` maps the arrays read-only, so reports work on
+the page cache without copying and without touching the OLTP database.
+Attendance is read from ``attendance_history`` (archive.py), so archived
+years stay in the reports.
+
+Usage: python snapshot.py
+"""
+import json
+import os
+import shutil
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import archive
+import config
+
+CHUNKSIZE = 200000
+KEEP_SNAPSHOTS = 2
+
+# table -> (SQL, [(column, kind)]); kind is "id", "date", "category" or a
+# category name shared between tables (e.g. "department"). The
+# "employee_department" column is not selected; it is looked up from
+# employee_id in the employees snapshot.
+TABLES = {
+    "employees": ("""
+        SELECT id, department_id, status_kerja, jenis_kelamin, tanggal_masuk
+        FROM employees ORDER BY id
+    """, [("id", "id"), ("department", "department"), ("status_kerja", "category"),
+          ("jenis_kelamin", "category"), ("tanggal_masuk", "date")]),
+    "contracts": ("""
+        SELECT employee_id, jenis_kontrak, status_kontrak, tanggal_mulai, tanggal_berakhir
+        FROM contracts ORDER BY id
+    """, [("employee_id", "id"), ("department", "employee_department"), ("jenis_kontrak", "category"),
+          ("status_kontrak", "category"), ("tanggal_mulai", "date"), ("tanggal_berakhir", "date")]),
+    "leave_submissions": ("""
+        SELECT employee_id, jenis_cuti, status, tanggal_mulai, tanggal_selesai
+        FROM leave_submissions ORDER BY id
+    """, [("employee_id", "id"), ("department", "employee_department"), ("jenis_cuti", "category"),
+          ("status", "category"), ("tanggal_mulai", "date"), ("tanggal_selesai", "date")]),
+    "daily_attendances": ("""
+        SELECT employee_id, status, tanggal
+        FROM {attendances}
+    """, [("employee_id", "id"), ("department", "employee_department"), ("status", "attendance_status"),
+          ("tanggal", "date")]),
+}
+
+_DTYPES = {"id": np.int32, "date": "datetime64[D]"}
+
+
+def _dates(values):
+    # exact=False accepts timestamps as well as plain dates
+    return pd.to_datetime(pd.Series(values, dtype=object), format="%Y-%m-%d", exact=False,
+                          errors="coerce").to_numpy("datetime64[D]")
+
+
+class _Categories:
+    """Text -> int16 code dictionaries, grown while streaming"""
+
+    def __init__(self, departments):
+        # Department codes follow departments.id; employees map to them by id
+        self.labels = {"department": [name for _id, name in departments]}
+        self._codes = {"department": {dept_id: code for code, (dept_id, _name) in enumerate(departments)}}
+        self.employee_department = None
+
+    def encode(self, name, values):
+        codes = self._codes.setdefault(name, {})
+        labels = self.labels.setdefault(name, [])
+        values = pd.Series(values, dtype=object)
+        for value in values.dropna().unique():
+            if value not in codes:
+                codes[value] = len(labels)
+                labels.append(str(value))
+        return values.map(codes).fillna(-1).to_numpy(np.int16)
+
+
+def _ids(values):
+    return pd.Series(values, dtype="float64").fillna(-1).to_numpy(np.int64)
+
+
+def _departments_of(ids, lookup):
+    inside = (ids >= 0) & (ids < len(lookup))
+    return np.where(inside, lookup[np.clip(ids, 0, max(len(lookup) - 1, 0))], -1).astype(np.int16)
+
+
+def _encode(kind, column, values, categories):
+    if kind == "id":
+        return _ids(values).astype(np.int32)
+    if kind == "date":
+        return _dates(values)
+    return categories.encode(column if kind == "category" else kind, values)
+
+
+def build(conn, directory=None, chunksize=CHUNKSIZE):
+    """Write a new snapshot from ``conn`` and make it current; returns its manifest"""
+    directory = directory or config.SNAPSHOT_DIR
+    started = time.perf_counter()
+    name = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    target = os.path.join(directory, name)
+    os.makedirs(target)
+
+    manifest = {"name": name, "built_at": datetime.now().isoformat(timespec="seconds"), "rows": {}}
+    began = not conn.in_transaction
+    if began:
+        conn.execute("BEGIN")
+    try:
+        departments = conn.execute("SELECT id, nama_department FROM departments ORDER BY id").fetchall()
+        categories = _Categories(departments)
+        attendances = archive.history(conn)
+        for table, (sql, columns) in TABLES.items():
+            source = attendances if table == archive.SOURCE else table
+            sql = sql.format(attendances=attendances)
+            count = conn.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+            arrays = {
+                column: np.lib.format.open_memmap(
+                    os.path.join(target, f"{table}.{column}.npy"), mode="w+",
+                    dtype=_DTYPES.get(kind, np.int16), shape=(count,))
+                for column, kind in columns
+            }
+            selected = [(c, kind) for c, kind in columns if kind != "employee_department"]
+            derived = len(selected) < len(columns)
+            filled = 0
+            cursor = conn.execute(sql)
+            while filled < count:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                rows = rows[:count - filled]
+                chunk = slice(filled, filled + len(rows))
+                for (column, kind), values in zip(selected, zip(*rows)):
+                    arrays[column][chunk] = _encode(kind, column, values, categories)
+                if derived:
+                    arrays["department"][chunk] = _departments_of(
+                        np.asarray(arrays["employee_id"][chunk]), categories.employee_department)
+                filled += len(rows)
+            cursor.close()
+            for array in arrays.values():
+                array.flush()
+            manifest["rows"][table] = filled
+
+            if table == "employees":
+                # id -> department code lookup for the tables that follow
+                ids = np.asarray(arrays["id"])
+                lookup = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int16)
+                lookup[ids] = arrays["department"]
+                categories.employee_department = lookup
+            del arrays
+    finally:
+        if began:
+            conn.rollback()
+
+    manifest["categories"] = categories.labels
+    manifest["seconds"] = round(time.perf_counter() - started, 3)
+    with open(os.path.join(target, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    pointer = os.path.join(directory, "CURRENT")
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(pointer + ".tmp", pointer)
+    _prune(directory, keep=name)
+    return manifest
+
+
+def _prune(directory, keep):
+    builds = sorted(n for n in os.listdir(directory) if os.path.isdir(os.path.join(directory, n)))
+    # Older snapshots may still be mapped by other sessions; POSIX keeps
+    # deleted files readable until they are unmapped
+    for old in builds[:-KEEP_SNAPSHOTS]:
+        if old != keep:
+            shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+
+class Snapshot:
+    """Read-only view of one built snapshot"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.categories = self.manifest["categories"]
+        self._arrays = {}
+
+    @property
+    def built_at(self):
+        return self.manifest["built_at"]
+
+    def column(self, table, column):
+        """Return a column as a read-only memmap"""
+        key = (table, column)
+        if key not in self._arrays:
+            self._arrays[key] = np.load(os.path.join(self.path, f"{table}.{column}.npy"), mmap_mode="r")
+        return self._arrays[key]
+
+    def labels(self, category):
+        return self.categories.get(category, [])
+
+
+_loaded = {}
+
+
+def load(directory=None):
+    """Return the current Snapshot, or None when none has been built"""
+    directory = directory or config.SNAPSHOT_DIR
+    try:
+        with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(directory, name)
+    snap = _loaded.get(directory)
+    if snap is None or snap.path != path:
+        snap = _loaded[directory] = Snapshot(path)
+    return snap
+
+
+def _month_ends(months, today=None):
+    today = np.datetime64(today or date.today(), "D")
+    current = today.astype("datetime64[M]")
+    starts = np.arange(current - months + 1, current + 1)
+    ends = (starts + 1).astype("datetime64[D]") - 1
+    return starts, np.minimum(ends, today)
+
+
+def _by_department(snap, codes, weights=None):
+    labels = snap.labels("department")
+    counts = np.bincount(codes[codes >= 0], weights=None if weights is None else weights[codes >= 0],
+                         minlength=len(labels))
+    return pd.Series(counts, index=labels)
+
+
+def headcount_by_month(snap, months=12, today=None):
+    """Employees under contract at each month end, per department"""
+    starts, ends = _month_ends(months, today)
+    employee = snap.column("contracts", "employee_id")
+    department = snap.column("contracts", "department")
+    begin = snap.column("contracts", "tanggal_mulai")
+    finish = snap.column("contracts", "tanggal_berakhir")
+    rows = {}
+    for month, end in zip(starts, ends):
+        covering = (begin <= end) & (finish >= end)
+        # An employee with overlapping contracts counts once
+        _ids, first = np.unique(employee[covering], return_index=True)
+        rows[str(month)] = _by_department(snap, department[covering][first])
+    return pd.DataFrame(rows).T.astype(np.int64)
+
+
+def contract_mix(snap):
+    """Contracts per department by jenis_kontrak and status_kontrak"""
+    department = snap.column("contracts", "department")
+    kinds = snap.labels("jenis_kontrak")
+    statuses = snap.labels("status_kontrak")
+    jenis = snap.column("contracts", "jenis_kontrak")
+    status = snap.column("contracts", "status_kontrak")
+    valid = (department >= 0) & (jenis >= 0) & (status >= 0)
+    shape = (len(snap.labels("department")), len(kinds), len(statuses))
+    flat = np.ravel_multi_index((department[valid], jenis[valid], status[valid]), shape)
+    counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+    index = pd.MultiIndex.from_product([kinds, statuses], names=["jenis_kontrak", "status_kontrak"])
+    return pd.DataFrame(counts.reshape(shape[0], -1), index=snap.labels("department"), columns=index)
+
+
+def attendance_rate(snap, months=6, today=None, present="hadir"):
+    """Share of recorded attendance days with status ``present``, per department per month"""
+    starts, _ends = _month_ends(months, today)
+    labels = snap.labels("attendance_status")
+    department = snap.column("daily_attendances", "department")
+    month = snap.column("daily_attendances", "tanggal").astype("datetime64[M]")
+    status = snap.column("daily_attendances", "status")
+    index = (month - starts[0]).astype(np.int64)
+    valid = (index >= 0) & (index < months) & (department >= 0)
+    n_departments = len(snap.labels("department"))
+    flat = index[valid] * n_departments + department[valid]
+    total = np.bincount(flat, minlength=months * n_departments)
+    hit = np.zeros_like(total)
+    if present in labels:
+        is_present = status[valid] == labels.index(present)
+        hit = np.bincount(flat[is_present], minlength=months * n_departments)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(total > 0, hit / np.maximum(total, 1), np.nan)
+    return pd.DataFrame(rate.reshape(months, n_departments), index=[str(m) for m in starts],
+                        columns=snap.labels("department"))
+
+
+def leave_by_type(snap, year=None):
+    """Leave requests starting in ``year`` per department by jenis_cuti"""
+    year = year or date.today().year
+    start = snap.column("leave_submissions", "tanggal_mulai")
+    in_year = start.astype("datetime64[Y]") == np.datetime64(str(year), "Y")
+    department = snap.column("leave_submissions", "department")[in_year]
+    jenis = snap.column("leave_submissions", "jenis_cuti")[in_year]
+    kinds = snap.labels("jenis_cuti")
+    valid = (department >= 0) & (jenis >= 0)
+    shape = (len(snap.labels("department")), len(kinds))
+    counts = np.bincount(np.ravel_multi_index((department[valid], jenis[valid]), shape),
+                         minlength=int(np.prod(shape))).reshape(shape)
+    return pd.DataFrame(counts, index=snap.labels("department"), columns=kinds)
+
+
+def build_current():
+    """Build a snapshot from a pooled reader connection (used by the job)"""
+    from database import get_db
+
+    with get_db().reader() as conn:
+        return build(conn)
+
+
+if __name__ == "__main__":
+    from database import bootstrap
+
+    bootstrap(seed=False)
+    manifest = build_current()
+    for table, rows in manifest["rows"].items():
+        print(f"{table:>20}: {rows}")
+    print(f"snapshot {manifest['name']} selesai dalam {manifest['seconds']:.1f} detik")
@@ -0,0 +1,158 @@
+# stats.py
+"""Trigger-maintained KPI counters for the dashboards
+
+Every counter lives in ``dashboard_stats`` keyed by (scope, scope_key, metric):
+
+* ``global`` / ``''``          - whole company
+* ``department`` / dept id     - per department
+* ``day`` / ``YYYY-MM-DD``     - per calendar day of ``created_at``
+
+Triggers on the source tables add or subtract one whenever a row enters or
+leaves a counter, so reading a KPI is a primary-key lookup instead of a
+COUNT(*) over the table.
+"""
+
+GLOBAL = "global"
+DEPARTMENT = "department"
+DAY = "day"
+
+_EMPLOYEE_DEPT = "(SELECT department_id FROM employees WHERE id = {r}.employee_id)"
+
+# metric -> (table, condition, [(scope, key expression), ...])
+# ``{r}`` is replaced with NEW/OLD inside triggers and with the table alias
+# when the counters are rebuilt from scratch.
+COUNTERS = {
+    "employees": ("employees", "1", [
+        (GLOBAL, "''"),
+        (DEPARTMENT, "{r}.department_id"),
+    ]),
+    "active_employees": ("employees", "{r}.status_kerja = 'aktif'", [
+        (GLOBAL, "''"),
+        (DEPARTMENT, "{r}.department_id"),
+    ]),
+    "departments": ("departments", "1", [
+        (GLOBAL, "''"),
+    ]),
+    "pending_leaves": ("leave_submissions", "{r}.status = 'pending'", [
+        (GLOBAL, "''"),
+        (DEPARTMENT, _EMPLOYEE_DEPT),
+    ]),
+    "submissions": ("leave_submissions", "1", [
+        (DAY, "date({r}.created_at)"),
+    ]),
+    "active_contracts": ("contracts", "{r}.status_kontrak = 'aktif'", [
+        (GLOBAL, "''"),
+        (DEPARTMENT, _EMPLOYEE_DEPT),
+    ]),
+}
+
+# Columns whose update can move a row between counters (None: never)
+_WATCHED_COLUMNS = {
+    "employees": "department_id, status_kerja",
+    "departments": None,
+    "leave_submissions": "employee_id, status, created_at",
+    "contracts": "employee_id, status_kontrak",
+}
+
+# Counters that follow an employee when they change department
+_FOLLOW_EMPLOYEE = {
+    "pending_leaves": ("leave_submissions", "status = 'pending'"),
+    "active_contracts": ("contracts", "status_kontrak = 'aktif'"),
+}
+
+
+def _bump(metric, scope, key, cond, delta):
+    return f"""
+        INSERT INTO dashboard_stats (scope, scope_key, metric, value)
+        SELECT '{scope}', {key}, '{metric}', {delta}
+        WHERE ({cond}) AND ({key}) IS NOT NULL
+        ON CONFLICT (scope, scope_key, metric) DO UPDATE SET value = value + excluded.value;"""
+
+
+def _row_deltas(table, row, sign):
+    statements = []
+    for metric, (source, cond, scopes) in COUNTERS.items():
+        if source != table:
+            continue
+        for scope, key in scopes:
+            statements.append(_bump(metric, scope, key.format(r=row), cond.format(r=row), sign))
+    return statements
+
+
+def _follow_deltas(row, sign):
+    """Move an employee's leave/contract counts into or out of a department"""
+    statements = []
+    for metric, (table, cond) in _FOLLOW_EMPLOYEE.items():
+        count = f"(SELECT COUNT(*) FROM {table} WHERE employee_id = {row}.id AND {cond})"
+        statements.append(_bump(metric, DEPARTMENT, f"{row}.department_id", "1", f"{sign} * {count}"))
+    return statements
+
+
+def _trigger_sql():
+    triggers = {}
+    for table, columns in _WATCHED_COLUMNS.items():
+        inserts = _row_deltas(table, "NEW", "1")
+        deletes = _row_deltas(table, "OLD", "-1")
+        if table == "employees":
+            deletes += _follow_deltas("OLD", "-1")
+        triggers[f"trg_stats_{table}_insert"] = f"AFTER INSERT ON {table}", inserts
+        triggers[f"trg_stats_{table}_delete"] = f"AFTER DELETE ON {table}", deletes
+        if columns is None:
+            continue
+        triggers[f"trg_stats_{table}_update"] = (
+            f"AFTER UPDATE OF {columns} ON {table}",
+            _row_deltas(table, "OLD", "-1") + _row_deltas(table, "NEW", "1"),
+        )
+
+    triggers["trg_stats_employees_move"] = (
+        "AFTER UPDATE OF department_id ON employees "
+        "WHEN OLD.department_id IS NOT NEW.department_id",
+        _follow_deltas("OLD", "-1") + _follow_deltas("NEW", "1"),
+    )
+    return {
+        name: f"CREATE TRIGGER {name} {event} BEGIN{''.join(body)}\nEND"
+        for name, (event, body) in triggers.items()
+    }
+
+
+def rebuild_stats(conn):
+    """Recompute every counter from the source tables"""
+    conn.execute("DELETE FROM dashboard_stats")
+    for metric, (table, cond, scopes) in COUNTERS.items():
+        for scope, key in scopes:
+            key_sql = key.format(r="r")
+            conn.execute(f"""
+                INSERT INTO dashboard_stats (scope, scope_key, metric, value)
+                SELECT '{scope}', {key_sql}, '{metric}', COUNT(*)
+                FROM {table} r
+                WHERE ({cond.format(r="r")}) AND ({key_sql}) IS NOT NULL
+                GROUP BY {key_sql}
+            """)
+
+
+def install(conn):
+    """Create the counters table and triggers, then backfill the counters"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_stats (
+            scope TEXT NOT NULL,
+            scope_key TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, scope_key, metric)
+        ) WITHOUT ROWID
+    """)
+    for name, sql in _trigger_sql().items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(sql)
+    rebuild_stats(conn)
+
+
+def get_counters(conn, scope, scope_key=""):
+    """Return {metric: value} for one scope, e.g. a department"""
+    rows = conn.execute(
+        "SELECT metric, value FROM dashboard_stats WHERE scope = ? AND scope_key = ?",
+        (scope, str(scope_key)),
+    ).fetchall()
+    counters = dict.fromkeys(COUNTERS, 0)
+    counters.update(rows)
+    return counters
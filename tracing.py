@@ -0,0 +1,330 @@
+# tracing.py
+"""Per-statement query tracing and a rolling slow-query log
+
+Connections are opened with ``TracedConnection`` (see database.get_db), whose
+cursors time every statement from ``execute`` until its rows are consumed
+and count the rows returned. SQLite's own hooks add what Python cannot see:
+``set_trace_callback`` counts every statement the engine starts, including
+trigger programs fired by a write, and ``set_progress_handler`` counts
+virtual machine steps as a measure of work done.
+
+Each statement is attributed to the current section (dashboard and tab, see
+``section``) and to the current Streamlit rerun (see ``run``). Statements
+slower than ``config.TRACE_SLOW_QUERY_MS`` go to a bounded slow-query log
+together with their EXPLAIN QUERY PLAN. Only SQL text with placeholders is
+kept, never bound parameter values.
+"""
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+import config
+
+# Progress handler granularity in VM instructions
+PROGRESS_STEPS = 1000
+MAX_DISTINCT_STATEMENTS = 1000
+
+_section = ContextVar("trace_section", default=None)
+_run = ContextVar("trace_run", default=None)
+
+_lock = threading.Lock()
+_slow_log = deque(maxlen=config.TRACE_SLOW_LOG_SIZE)
+_recent_runs = deque(maxlen=50)
+# SQL text -> [calls, total ms, max ms, rows, vm steps]
+_statements = {}
+_plans = {}
+
+
+@contextmanager
+def section(name):
+    """Attribute the queries of a block to ``name`` (nested sections join with ' / ')"""
+    parent = _section.get()
+    token = _section.set(f"{parent} / {name}" if parent else name)
+    try:
+        yield
+    finally:
+        _section.reset(token)
+
+
+class Run:
+    """Query totals of one Streamlit script run"""
+
+    def __init__(self):
+        self.started = datetime.now()
+        self.queries = 0
+        self.rows = 0
+        self.ms = 0.0
+        self.statements = 0
+        # section -> [queries, rows, ms]
+        self.sections = {}
+        self.open = set()
+        # Queries of one run may execute on several threads (fanout.py)
+        self.lock = threading.Lock()
+
+    def track(self, record):
+        with self.lock:
+            self.open.add(record)
+
+    def add(self, record):
+        with self.lock:
+            self.open.discard(record)
+            self._add(record)
+
+    def _add(self, record):
+        self.queries += 1
+        self.rows += record.rows
+        self.ms += record.ms
+        self.statements += record.statements
+        totals = self.sections.setdefault(record.section or "-", [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += record.rows
+        totals[2] += record.ms
+
+
+@contextmanager
+def run():
+    """Collect the queries of one script run; the totals are kept afterwards"""
+    current = Run()
+    token = _run.set(current)
+    try:
+        yield current
+    finally:
+        # Statements whose rows were never read to the end; their connection
+        # may already serve another thread, so no EXPLAIN for them
+        with current.lock:
+            unfinished = list(current.open)
+        for record in unfinished:
+            record.finish(explain=False)
+        _run.reset(token)
+        with _lock:
+            _recent_runs.append(current)
+
+
+def current_run():
+    return _run.get()
+
+
+def recent_runs():
+    with _lock:
+        return list(_recent_runs)
+
+
+def slow_queries():
+    """Return slow-query log entries, newest first"""
+    with _lock:
+        return list(reversed(_slow_log))
+
+
+def top_statements(n=10):
+    """Return the ``n`` statements with the highest total time
+
+    Each item is a dict with the SQL, call count, total/max/avg ms, rows and
+    VM steps.
+    """
+    with _lock:
+        items = [(sql, *totals) for sql, totals in _statements.items()]
+    items.sort(key=lambda item: item[2], reverse=True)
+    return [{"sql": sql, "calls": calls, "total_ms": total, "max_ms": worst,
+             "avg_ms": total / calls, "rows": rows, "vm_steps": steps}
+            for sql, calls, total, worst, rows, steps in items[:n]]
+
+
+def reset():
+    """Forget all collected statistics"""
+    with _lock:
+        _slow_log.clear()
+        _recent_runs.clear()
+        _statements.clear()
+        _plans.clear()
+
+
+def _is_plannable(sql):
+    return sql.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH"))
+
+
+class _Record:
+    """One execution of one statement"""
+
+    __slots__ = ("conn", "sql", "params", "section", "run", "rows", "ms", "statements", "steps", "done")
+
+    def __init__(self, conn, sql, params):
+        self.conn = conn
+        self.sql = sql
+        self.params = params
+        self.section = _section.get()
+        self.run = _run.get()
+        self.rows = 0
+        self.ms = 0.0
+        self.statements = 0
+        self.steps = conn._steps
+        self.done = False
+        if self.run is not None:
+            self.run.track(self)
+
+    def finish(self, explain=True):
+        if self.done:
+            return
+        self.done = True
+        self.steps = (self.conn._steps - self.steps) * PROGRESS_STEPS
+        if self.run is not None:
+            self.run.add(self)
+
+        slow = self.ms >= config.TRACE_SLOW_QUERY_MS
+        plan = self.conn._explain(self.sql, self.params) if slow and explain else None
+        self.params = None
+        with _lock:
+            totals = _statements.get(self.sql)
+            if totals is None and len(_statements) < MAX_DISTINCT_STATEMENTS:
+                totals = _statements[self.sql] = [0, 0.0, 0.0, 0, 0]
+            if totals is not None:
+                totals[0] += 1
+                totals[1] += self.ms
+                totals[2] = max(totals[2], self.ms)
+                totals[3] += self.rows
+                totals[4] += self.steps
+            if slow:
+                _slow_log.append({
+                    "time": datetime.now(), "sql": self.sql, "ms": self.ms, "rows": self.rows,
+                    "vm_steps": self.steps, "statements": self.statements,
+                    "section": self.section, "plan": plan,
+                })
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times its statement until the rows are consumed"""
+
+    _record = None
+
+    def _finish(self):
+        if self._record is not None:
+            self._record.finish()
+            self._record = None
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._record.ms += (time.perf_counter() - started) * 1000
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._record = _Record(self.connection, sql, parameters)
+        self.connection._active = self._record
+        try:
+            self._timed(super().execute, sql, parameters)
+        except BaseException:
+            self._finish()
+            raise
+        finally:
+            self.connection._active = None
+        if self.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._record = _Record(self.connection, sql, None)
+        self.connection._active = self._record
+        try:
+            self._timed(super().executemany, sql, seq_of_parameters)
+        finally:
+            self.connection._active = None
+            self._finish()
+        return self
+
+    def fetchone(self):
+        if self._record is None:
+            return super().fetchone()
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._record.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        if self._record is None:
+            return super().fetchmany(size)
+        rows = self._timed(super().fetchmany, size)
+        self._record.rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        if self._record is None:
+            return super().fetchall()
+        rows = self._timed(super().fetchall)
+        self._record.rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        if self._record is None:
+            return super().__next__()
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._record.rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection that traces every statement run through its cursors"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._steps = 0
+        self._active = None
+        self._explaining = False
+        self.set_trace_callback(self._on_statement)
+        self.set_progress_handler(self._on_progress, PROGRESS_STEPS)
+
+    def _on_statement(self, _sql):
+        # Called for every statement the engine starts, trigger programs included
+        if self._active is not None and not self._explaining:
+            self._active.statements += 1
+
+    def _on_progress(self):
+        self._steps += 1
+        return 0
+
+    def _explain(self, sql, params):
+        if params is None or not _is_plannable(sql):
+            return None
+        with _lock:
+            if sql in _plans:
+                return _plans[sql]
+        self._explaining = True
+        try:
+            rows = sqlite3.Connection.execute(self, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            plan = "\n".join(detail for _id, _parent, _unused, detail in rows)
+        except sqlite3.Error as e:
+            plan = f"(EXPLAIN gagal: {e})"
+        finally:
+            self._explaining = False
+        with _lock:
+            if len(_plans) < MAX_DISTINCT_STATEMENTS:
+                _plans[sql] = plan
+        return plan
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,180 @@
+# writequeue.py
+"""Single writer thread for the app's interactive writes
+
+Form submissions from every session are sent to one thread as commands,
+each a ``fn(conn)`` plus the tables it modifies. The thread collects the
+commands that arrive within ``HR_WRITE_COALESCE_MS`` of the first one and
+runs them on the writer connection in a single ``BEGIN IMMEDIATE``
+transaction, so a burst of submissions costs one commit. Each command runs
+inside its own SAVEPOINT, so a failing command is rolled back alone. Its
+error goes back to the session that sent it, and the rest of the batch
+still commits.
+
+Sessions therefore never compete for the write lock among themselves, and
+readers keep working from their WAL snapshots while a batch is written.
+Bulk writers (imports, jobs, check-in batches) still go through
+``get_db().writer()`` directly. They share its lock with this thread, so
+writes inside the process stay serialised either way.
+
+A command must not commit, roll back or send another command itself. It
+runs in a copy of the sender's context, so its queries are attributed to
+the sender's run in tracing.py.
+"""
+import atexit
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import config
+from database import get_db
+
+_SAVEPOINT = "hr_write_command"
+
+logger = logging.getLogger(__name__)
+
+
+class _Command:
+    __slots__ = ("fn", "tables", "context", "future")
+
+    def __init__(self, fn, tables):
+        self.fn = fn
+        self.tables = tables
+        self.context = contextvars.copy_context()
+        self.future = Future()
+
+
+class WriteQueue:
+    """Run write commands on one thread, a coalesced batch per transaction"""
+
+    def __init__(self, coalesce_ms=None, max_batch=None):
+        self.coalesce = (config.WRITE_COALESCE_MS if coalesce_ms is None else coalesce_ms) / 1000
+        self.max_batch = max_batch or config.WRITE_MAX_BATCH
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {"commands": 0, "batches": 0, "errors": 0, "last_batch_ms": 0.0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="hr-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Finish the queued commands and stop the thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def submit(self, fn, *tables):
+        """Queue ``fn(conn)``, which modifies ``tables``; returns a Future"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("perintah tulis tidak boleh mengirim perintah tulis lain")
+        self.start()
+        command = _Command(fn, tables)
+        self._queue.put(command)
+        return command.future
+
+    def run(self, fn, *tables, timeout=None):
+        """Queue ``fn(conn)`` and return its result once committed
+
+        Raises the command's own error if it failed, or TimeoutError if it
+        has not been written within ``timeout`` seconds (default
+        ``config.WRITE_TIMEOUT_MS``). A command that times out while still
+        queued is dropped.
+        """
+        timeout = config.WRITE_TIMEOUT_MS / 1000 if timeout is None else timeout
+        future = self.submit(fn, *tables)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def _loop(self):
+        while True:
+            command = self._queue.get()
+            if command is None:
+                return
+            batch = [command]
+            # Let commands sent meanwhile join the same transaction
+            deadline = time.monotonic() + self.coalesce
+            while len(batch) < self.max_batch:
+                try:
+                    command = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if command is None:
+                    self._write(batch)
+                    return
+                batch.append(command)
+            self._write(batch)
+
+    def _write(self, batch):
+        batch = [c for c in batch if c.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        tables = sorted({table for c in batch for table in c.tables})
+        outcomes = []
+        try:
+            with get_db().writer(*tables) as conn:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                for c in batch:
+                    conn.execute(f"SAVEPOINT {_SAVEPOINT}")
+                    try:
+                        value = c.context.run(c.fn, conn)
+                    except Exception as e:
+                        conn.execute(f"ROLLBACK TO {_SAVEPOINT}")
+                        conn.execute(f"RELEASE {_SAVEPOINT}")
+                        outcomes.append((c, None, e))
+                    else:
+                        conn.execute(f"RELEASE {_SAVEPOINT}")
+                        outcomes.append((c, value, None))
+        except Exception as e:
+            # The transaction itself failed (busy, disk full): nothing was written
+            logger.exception("Batch tulis (%d perintah) gagal", len(batch))
+            outcomes = [(c, None, e) for c in batch]
+
+        errors = 0
+        for c, value, error in outcomes:
+            if error is None:
+                c.future.set_result(value)
+            else:
+                errors += 1
+                c.future.set_exception(error)
+        with self._lock:
+            self.stats["commands"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["errors"] += errors
+            self.stats["last_batch_ms"] = (time.perf_counter() - started) * 1000
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the process-wide write queue, creating it once"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteQueue()
+                atexit.register(_queue.stop)
+    return _queue
+
+
+def run(fn, *tables, timeout=None):
+    """Run ``fn(conn)`` on the writer thread; see ``WriteQueue.run``"""
+    return get_queue().run(fn, *tables, timeout=timeout)